@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from utils.threads_client import async_threads_client, ThreadsAPIError
+
+router = APIRouter()
+
+@router.get("/threads-posts")
+async def list_threads_posts(limit: int = 10, after: str = None):
+    """列出自己的貼文，以 paging.cursors.after 取得下一頁"""
+    try:
+        return await async_threads_client.posts(limit=limit, after=after)
+    except ThreadsAPIError as e:
+        return {"error": f"獲取貼文列表失敗: {e}"}
+
+@router.get("/threads-post/{post_id}")
+async def get_threads_post(post_id: str):
+    """查看特定貼文的詳細資訊"""
+    try:
+        return await async_threads_client.post_details(post_id)
+    except ThreadsAPIError as e:
+        return {"error": f"獲取貼文詳細資訊失敗: {e}"}
@@ -1,11 +1,21 @@
 from fastapi import FastAPI, Request
 from fastapi.responses import PlainTextResponse
 import os
-import json
-from utils.openai_client import generate_classical_reply
-from utils.threads_api import create_reply_with_two_steps, get_threads_user_id
+from utils.threads_api import process_webhook_events, webhook_admission
+from utils.webhook_capture import capture_webhook_payload
+from utils.webhook_guard import read_verified_body, reject_malformed
+from utils.webhook_events import parse_webhook_body
+from utils.profiling import install_profiling_middleware
+from utils.warmup import install_warmup
+from utils.structured_log import get_logger
+
+logger = get_logger("webhook")
 
 app = FastAPI()
+# 設定 PROFILE_SAMPLE_RATE 後抽樣分析 /api/* 請求
+install_profiling_middleware(app)
+# 啟動時預先建立連線與快取，/api/ready 在暖機完成後才回報就緒
+install_warmup(app)
 
 VERIFY_TOKEN = os.getenv("VERIFY_TOKEN")
 @app.get("/api/webhook")
@@ -17,55 +27,23 @@ async def verify(request: Request):
 
 @app.post("/api/webhook")
 async def handle_event(request: Request):
-    body = await request.json()
-    print(f"接收到 webhook: {json.dumps(body, ensure_ascii=False)}")
-    
-    # 處理傳統 entry/changes 結構
-    if "entry" in body:
-        for entry in body.get("entry", []):
-            for change in entry.get("changes", []):
-                value = change.get("value", {})
-                message = value.get("text", "")
-                reply_id = value.get("id", "")
-                if message and reply_id:
-                    # 使用 OpenAI 生成古風回覆文本
-                    reply_text = generate_classical_reply(message)
-                    
-                    # 獲取自己的 Threads 使用者 ID
-                    my_user_id = get_threads_user_id()
-                    if my_user_id:
-                        # 使用標準兩步驟流程進行回覆
-                        result = create_reply_with_two_steps(
-                            threads_user_id=my_user_id,
-                            reply_to_id=reply_id,
-                            text=reply_text
-                        )
-                        print(f"回覆結果: {result}")
+    # 一次判斷 entry/changes/value、value.replies 與 values/value 三種結構
+    # 先驗證大小與簽章，未通過的請求不會解析 JSON，也不會觸發生成或發布
+    raw_body, error_response = await read_verified_body(request)
+    if error_response:
+        return error_response
+    try:
+        body, events = parse_webhook_body(raw_body)
+    except ValueError:
+        return reject_malformed(request)
+    capture_webhook_payload(request.url.path, body)
+    # 完整內容只在 DEBUG 等級記錄，序列化也在背景執行緒進行
+    logger.debug("收到 webhook 內容", extra={"body": body})
     
-    # 處理 values/value 結構 (新結構)
-    elif "values" in body and "value" in body.get("values", {}):
-        value = body.get("values", {}).get("value", {})
-        message = value.get("text", "")
-        reply_id = value.get("id", "")
-        username = value.get("username", "未知用戶")
-        timestamp = value.get("timestamp", "未知時間")
-        
-        print(f"接收到來自 @{username} 的留言: {message}")
-        print(f"留言時間: {timestamp}")
-        
-        if message and reply_id:
-            # 使用 OpenAI 生成古風回覆文本
-            reply_text = generate_classical_reply(message)
-            
-            # 獲取自己的 Threads 使用者 ID
-            my_user_id = get_threads_user_id()
-            if my_user_id:
-                # 使用標準兩步驟流程進行回覆
-                result = create_reply_with_two_steps(
-                    threads_user_id=my_user_id,
-                    reply_to_id=reply_id,
-                    text=reply_text
-                )
-                print(f"回覆結果: {result}")
-    
-    return {"status": "ok"}
\ No newline at end of file
+    # 超過同時處理與排隊上限的留言會依 ADMISSION_POLICY 丟棄、略過或降級
+    return {"status": "ok", "results": await process_webhook_events(events)}
+
+@app.get("/api/webhook-stats")
+async def webhook_stats():
+    """webhook 留言處理的准入控制統計（處理中、排隊、丟棄與降級數量）"""
+    return webhook_admission.stats()
@@ -1,40 +1,45 @@
 #!/usr/bin/env python3
 import argparse
+from contextlib import nullcontext, ExitStack
 import time
 import json
-import requests
-from datetime import datetime, timedelta
-from utils.list_threads_posts import get_user_threads_posts, get_thread_post_details, get_threads_user_id
+from datetime import datetime
+from utils.list_threads_posts import get_user_threads_posts, get_thread_post_details, get_threads_user_id, get_post_replies, iter_pages
+from openai import OpenAIError
 from utils.openai_client import generate_classical_reply
-from utils.threads_api import create_reply_with_two_steps
+from utils.resilience import UpstreamUnavailable
+from utils.threads_api import create_reply_with_retries, get_publishing_limit
+from utils.reply_planner import plan_replies, remaining_reply_quota
+from utils.dead_letter import record_failed_reply, load_dead_letters, save_dead_letters, queued_reply_ids
+from utils.reply_ledger import is_handled, mark_handled
+from utils.leases import hold_post, claim_comment, release_comment
+from utils.reply_records import ReplyRecord, scan_replies, format_epoch, UNKNOWN_NAME, UNKNOWN_USERNAME
+from utils.conversation_context import remember_thread, context_for
+from utils.reply_batch import (
+    BATCH_INPUT_FILE, BATCH_POLL_INTERVAL, FINAL_STATUSES, load_batch_state, save_batch_state, clear_batch_state,
+    write_batch_input, upload_batch_input, create_batch, wait_for_batch, download_batch_results
+)
+from utils.mentions import process_mentions
+from utils.profiling import profile_run, PROFILE_DIR
 
 def fetch_post_replies(post_id):
     """
-    獲取指定貼文下的所有回覆
+    獲取指定貼文下的所有回覆，依分頁游標讀完所有頁
     
     Args:
         post_id: 貼文 ID
     
     Returns:
-        回覆列表或失敗時返回 None
+        回覆列表或失敗時返回包含 error 的字典
     """
-    from dotenv import load_dotenv
-    import os
-    load_dotenv()
-    
-    THREADS_ACCESS_TOKEN = os.getenv("THREADS_ACCESS_TOKEN")
-    url = f"https://graph.threads.net/v1.0/{post_id}/replies"
-    params = {
-        "access_token": THREADS_ACCESS_TOKEN,
-        "limit": 50,  # 最多獲取 50 條回覆
-        "fields": "id,text,timestamp,from{id,username,name}"
-    }
-    
-    response = requests.get(url, params=params)
-    if not response.ok:
-        return {"error": f"獲取回覆列表失敗: {response.text}"}
-    
-    return response.json()
+    data = []
+    try:
+        # 每頁 50 條回覆
+        for _, page in iter_pages(get_post_replies, post_id=post_id, limit=50):
+            data.extend(page)
+    except RuntimeError as e:
+        return {"error": str(e)}
+    return {"data": data}
 
 def format_timestamp(timestamp_str):
     """將 ISO 格式的時間戳轉換為易讀格式"""
@@ -44,193 +49,155 @@ def format_timestamp(timestamp_str):
     except:
         return timestamp_str
 
-def parse_timestamp(timestamp_str):
-    """將 ISO 格式的時間戳轉換為 datetime 對象"""
-    try:
-        return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-    except:
-        return None
-
-def check_if_replied_by_me(replies_data, my_user_id, verbose=True):
+def show_replied_users(scan, verbose=True):
     """
-    檢查留言者是否已被我回覆過
+    顯示貼文下我的回覆與被視為已回覆的用戶
     
     Args:
-        replies_data: 回覆數據
-        my_user_id: 我的用戶 ID
+        scan: scan_replies 的結果
         verbose: 是否顯示詳細日誌
     
     Returns:
         已回覆的用戶 ID 集合
     """
-    replied_users = set()
-    my_replies = []
-    
-    # 先獲取所有留言者
-    all_commenters = {}
-    
-    if "data" in replies_data:
-        for reply in replies_data["data"]:
-            user_info = reply.get("from", {})
-            user_id = user_info.get("id")
-            if user_id:
-                all_commenters[user_id] = {
-                    "username": user_info.get("username", "未知用戶"),
-                    "name": user_info.get("name", "未知名稱"),
-                    "text": reply.get("text", "[無文字內容]"),
-                    "timestamp": reply.get("timestamp", "")
-                }
-    
-    # 找出我的所有回覆
-    if "data" in replies_data:
-        for reply in replies_data["data"]:
-            # 如果是我發的回覆
-            if reply.get("from", {}).get("id") == my_user_id:
-                my_replies.append({
-                    "id": reply.get("id"),
-                    "text": reply.get("text", "[無文字內容]"),
-                    "timestamp": reply.get("timestamp", "")
-                })
-    
-    if verbose and my_replies:
-        print(f"\n🔍 在此貼文下找到你的 {len(my_replies)} 條回覆:")
-        for idx, reply in enumerate(my_replies, 1):
-            timestamp = format_timestamp(reply["timestamp"])
-            print(f"  {idx}. 時間: {timestamp}")
-            print(f"     內容: {reply['text'][:50]}{'...' if len(reply['text']) > 50 else ''}")
-    
-    # 簡化處理：假設所有其他用戶都被回覆過
-    if my_replies:
-        for user_id, user_info in all_commenters.items():
-            if user_id != my_user_id:
-                replied_users.add(user_id)
+    replied_users = scan.replied_user_ids
+    
+    if verbose and scan.my_replies:
+        print(f"\n🔍 在此貼文下找到你的 {len(scan.my_replies)} 條回覆:")
+        for idx, reply in enumerate(scan.my_replies, 1):
+            print(f"  {idx}. 時間: {reply.display_time}")
+            print(f"     內容: {reply.text[:50]}{'...' if len(reply.text) > 50 else ''}")
     
     if verbose and replied_users:
         print(f"\n✅ 被視為已回覆的用戶: {len(replied_users)} 位")
         for user_id in replied_users:
-            user_info = all_commenters.get(user_id, {})
-            username = user_info.get("username", "未知用戶")
-            name = user_info.get("name", "未知名稱")
+            name, username = scan.commenter_names.get(user_id, (UNKNOWN_NAME, UNKNOWN_USERNAME))
             print(f"  - {name} (@{username})")
     
     return replied_users
 
-def auto_reply_to_post(post_id, max_replies=None, days=None, dry_run=False, verbose=True):
+def collect_pending_replies(post_id, my_user_id, days=None, verbose=True):
     """
-    自動回覆指定貼文下尚未回覆的留言
+    找出指定貼文下尚未回覆的留言
     
     Args:
         post_id: 貼文 ID
-        max_replies: 最多回覆幾條留言 (None 表示不限制)
+        my_user_id: 我的用戶 ID
         days: 只回覆最近幾天內的留言 (None 表示不限制)
-        dry_run: 是否只模擬執行，不實際發送回覆
         verbose: 是否顯示詳細日誌
-    """
-    print(f"正在處理貼文 ID: {post_id}")
-    
-    # 獲取我的用戶 ID
-    my_user_id = get_threads_user_id()
-    if not my_user_id:
-        print("❌ 無法獲取你的 Threads 用戶 ID")
-        return
-    
-    # 獲取貼文詳細資訊
-    post_details = get_thread_post_details(post_id)
-    if "error" in post_details:
-        print(f"❌ 獲取貼文詳細資訊失敗: {post_details['error']}")
-        return
-    
-    post_text = post_details.get("text", "[無文字內容]")
-    print(f"📝 貼文內容: {post_text}")
     
+    Returns:
+        需要回覆的 ReplyRecord 列表，失敗或貼文下沒有回覆時返回 None
+    """
     # 獲取貼文下的所有回覆
     replies = fetch_post_replies(post_id)
     if "error" in replies:
         print(f"❌ 獲取回覆列表失敗: {replies['error']}")
-        return
+        return None
     
     if "data" not in replies or not replies["data"]:
         print("ℹ️ 該貼文下沒有任何回覆")
-        return
+        return None
     
     print(f"🔍 找到 {len(replies['data'])} 條回覆")
     
-    # 檢查哪些用戶已被回覆過
-    replied_users = check_if_replied_by_me(replies, my_user_id, verbose)
+    # 計算日期限制（時間戳已在建立留言紀錄時轉為 Unix 秒數）
+    since_epoch = None
+    if days is not None:
+        since_epoch = int(time.time() - days * 86400)
+        print(f"📅 只回覆 {format_epoch(since_epoch)} 之後的留言")
+    
+    # 一次走訪所有回覆：分出我的回覆，並略過 webhook 或提及處理已回覆的留言、待重送佇列中的留言與較早的留言
+    queued = queued_reply_ids()
+    scan = scan_replies(
+        replies["data"], post_id, my_user_id, since_epoch,
+        lambda reply_id: is_handled(reply_id) or reply_id in queued, collect_names=verbose
+    )
+    replied_users = show_replied_users(scan, verbose)
     print(f"✓ 已回覆過 {len(replied_users)} 位用戶")
+    if verbose and scan.too_old:
+        print(f"⏱️ 跳過 {scan.too_old} 條較早的留言")
     
-    # 計算日期限制
-    date_limit = None
-    if days is not None:
-        date_limit = datetime.now() - timedelta(days=days)
-        print(f"📅 只回覆 {format_timestamp(date_limit.isoformat())} 之後的留言")
+    # 已讀到的留言順便記入前文快取，之後的 webhook 回覆可直接使用
+    for record in scan.my_replies:
+        remember_thread(record.reply_id, record.text, record.username, post_id, True)
+    for record in scan.candidates:
+        remember_thread(record.reply_id, record.text, record.username, post_id)
     
-    # 遍歷所有回覆，找出尚未回覆的留言
-    replies_to_answer = []
+    return scan.pending
+
+def answer_pending_replies(replies_to_answer, my_user_id, dry_run=False, generated=None, post_leases=None):
+    """
+    依序為留言生成文言文回覆並發送
     
-    for reply in replies["data"]:
-        user_info = reply.get("from", {})
-        user_id = user_info.get("id")
+    Args:
+        replies_to_answer: collect_pending_replies 找出的留言列表
+        my_user_id: 我的用戶 ID
+        dry_run: 是否只模擬執行，不實際發送回覆
+        generated: 已生成的回覆 {留言 ID: 回覆文字}（例如 Batch 的結果），有的留言不再呼叫 OpenAI
+        post_leases: 持有中的貼文租約 {貼文 ID: HeldLease}；續約失敗的貼文不再處理其下的留言
+    """
+    generated = generated or {}
+    post_leases = post_leases or {}
+    for idx, reply_info in enumerate(replies_to_answer, 1):
+        print(f"\n--- 正在處理第 {idx}/{len(replies_to_answer)} 條留言 ---")
         
-        # 跳過自己的留言和已回覆過的用戶
-        if user_id == my_user_id or user_id in replied_users:
+        # 貼文租約續約失敗時可能已由其他執行個體接手，停止處理這篇貼文的留言
+        lease = post_leases.get(reply_info.post_id)
+        if lease is not None and lease.is_lost():
+            print("⚠️ 貼文租約已遺失，略過這篇貼文其餘的留言")
             continue
+        print(f"👤 用戶: {reply_info.name} (@{reply_info.username})")
+        print(f"💬 內容: {reply_info.text}")
+        print(f"⏰ 時間: {reply_info.display_time}")
         
-        # 檢查日期限制
-        if date_limit:
-            reply_time = parse_timestamp(reply.get("timestamp", ""))
-            if reply_time and reply_time < date_limit:
-                if verbose:
-                    print(f"⏱️ 跳過較早的留言: {reply.get('text', '')[:30]}... ({format_timestamp(reply.get('timestamp', ''))})")
-                continue
-        
-        username = user_info.get("username", "未知用戶")
-        name = user_info.get("name", "未知名稱")
-        text = reply.get("text", "[無文字內容]")
-        reply_id = reply.get("id")
-        timestamp = format_timestamp(reply.get("timestamp", ""))
-        
-        replies_to_answer.append({
-            "reply_id": reply_id,
-            "user_id": user_id,
-            "username": username,
-            "name": name,
-            "text": text,
-            "timestamp": timestamp
-        })
-    
-    # 限制回覆數量
-    if max_replies is not None and len(replies_to_answer) > max_replies:
-        print(f"⚠️ 符合條件的留言有 {len(replies_to_answer)} 條，根據設置將只回覆前 {max_replies} 條")
-        replies_to_answer = replies_to_answer[:max_replies]
-    
-    print(f"📨 找到 {len(replies_to_answer)} 條需要回覆的留言")
-    
-    # 處理需要回覆的留言
-    for idx, reply_info in enumerate(replies_to_answer, 1):
-        print(f"\n--- 正在處理第 {idx}/{len(replies_to_answer)} 條留言 ---")
-        print(f"👤 用戶: {reply_info['name']} (@{reply_info['username']})")
-        print(f"💬 內容: {reply_info['text']}")
-        print(f"⏰ 時間: {reply_info['timestamp']}")
+        # 取得留言租約，避免與 webhook 或其他執行個體重複回覆（也省下重複的生成費用）
+        if not dry_run and not claim_comment(reply_info.reply_id):
+            print("⏭️ 這條留言已由其他執行個體處理，略過")
+            continue
         
-        # 使用 OpenAI 生成文言文回覆
-        print("🤖 正在生成古風回覆...")
-        reply_text = generate_classical_reply(reply_info['text'])
+        reply_text = generated.get(reply_info.reply_id)
+        if reply_text is None:
+            # 使用 OpenAI 生成文言文回覆
+            print("🤖 正在生成古風回覆...")
+            try:
+                reply_text = generate_classical_reply(reply_info.text, context_for(reply_info.post_id))
+            except (UpstreamUnavailable, OpenAIError) as e:
+                # OpenAI 暫時無法使用時只略過這一條，留言尚未回覆，下一輪掃描會再處理
+                print(f"⚠️ 生成回覆失敗，略過這條留言: {e}")
+                if not dry_run:
+                    release_comment(reply_info.reply_id)
+                continue
         print(f"✍️ 生成的回覆: {reply_text}")
         
         if not dry_run:
             # 發送回覆
             print("📤 正在發送回覆...")
-            result = create_reply_with_two_steps(
+            result, attempts, error, creation_id = create_reply_with_retries(
                 threads_user_id=my_user_id,
-                reply_to_id=reply_info['reply_id'],
+                reply_to_id=reply_info.reply_id,
                 text=reply_text
             )
             
             if result:
+                mark_handled(reply_info.reply_id, "sweep", result.get("id"))
                 print("✅ 回覆成功發送!")
             else:
-                print("❌ 回覆發送失敗")
+                # 保留已生成的回覆，之後可用 replay 子命令直接重送
+                record_failed_reply(
+                    reply_to_id=reply_info.reply_id,
+                    reply_text=reply_text,
+                    source="sweep",
+                    attempts=attempts,
+                    error=error,
+                    post_id=reply_info.post_id,
+                    username=reply_info.username,
+                    original_text=reply_info.text,
+                    creation_id=creation_id
+                )
+                # 已存入待重送佇列，其他流程不會再處理，釋放租約讓 replay 可以立即重送
+                release_comment(reply_info.reply_id)
+                print(f"❌ 回覆發送失敗（已嘗試 {attempts} 次），已存入待重送佇列")
             
             # 為避免 API 限制，等待數秒再繼續
             if idx < len(replies_to_answer):
@@ -238,8 +205,57 @@ def auto_reply_to_post(post_id, max_replies=None, days=None, dry_run=False, verb
                 time.sleep(10)
         else:
             print("🔄 模擬模式: 未實際發送回覆")
+
+def auto_reply_to_post(post_id, max_replies=None, days=None, dry_run=False, verbose=True):
+    """
+    自動回覆指定貼文下尚未回覆的留言
     
-    print("\n✅ 所有留言處理完成!")
+    Args:
+        post_id: 貼文 ID
+        max_replies: 最多回覆幾條留言 (None 表示不限制)
+        days: 只回覆最近幾天內的留言 (None 表示不限制)
+        dry_run: 是否只模擬執行，不實際發送回覆
+        verbose: 是否顯示詳細日誌
+    """
+    print(f"正在處理貼文 ID: {post_id}")
+    
+    # 獲取我的用戶 ID
+    my_user_id = get_threads_user_id()
+    if not my_user_id:
+        print("❌ 無法獲取你的 Threads 用戶 ID")
+        return
+    
+    # 多個執行個體同時執行時，依貼文租約分工，已被其他執行個體處理中的貼文直接略過
+    with hold_post(post_id) if not dry_run else nullcontext(True) as acquired:
+        if not acquired:
+            print("⏭️ 另一個執行個體正在處理這篇貼文，略過")
+            return
+        
+        # 獲取貼文詳細資訊
+        post_details = get_thread_post_details(post_id)
+        if "error" in post_details:
+            print(f"❌ 獲取貼文詳細資訊失敗: {post_details['error']}")
+            return
+        
+        post_text = post_details.get("text", "[無文字內容]")
+        print(f"📝 貼文內容: {post_text}")
+        remember_thread(post_id, post_details.get("text"), is_mine=True)
+        
+        replies_to_answer = collect_pending_replies(post_id, my_user_id, days, verbose)
+        if replies_to_answer is None:
+            return
+        
+        # 限制回覆數量
+        if max_replies is not None and len(replies_to_answer) > max_replies:
+            print(f"⚠️ 符合條件的留言有 {len(replies_to_answer)} 條，根據設置將只回覆前 {max_replies} 條")
+            replies_to_answer = replies_to_answer[:max_replies]
+        
+        print(f"📨 找到 {len(replies_to_answer)} 條需要回覆的留言")
+        
+        # 處理需要回覆的留言
+        answer_pending_replies(replies_to_answer, my_user_id, dry_run, post_leases=None if dry_run else {post_id: acquired})
+        
+        print("\n✅ 所有留言處理完成!")
 
 def auto_reply_all_posts(count=5, max_replies=None, days=None, dry_run=False, verbose=True):
     """
@@ -288,9 +304,316 @@ def auto_reply_all_posts(count=5, max_replies=None, days=None, dry_run=False, ve
     
     print("\n🎉 所有貼文處理完成!")
 
+def auto_reply_planned(count=5, max_replies=None, days=None, dry_run=False, verbose=True, window_minutes=None):
+    """
+    先規劃再回覆：讀取剩餘回覆額度，為所有貼文下的待回覆留言評分，
+    依分數挑出額度與時間窗口內最值得回覆的留言
+    
+    收集留言前先取得各篇貼文的租約，直到回覆完成才釋放；其他執行個體處理中的貼文直接略過。
+    
+    Args:
+        count: 處理的貼文數量
+        max_replies: 每篇貼文最多回覆幾條留言 (None 表示不限制)
+        days: 只回覆最近幾天內的留言 (None 表示不限制)
+        dry_run: 是否只模擬執行，不實際發送回覆
+        verbose: 是否顯示詳細日誌
+        window_minutes: 本次執行可用的分鐘數 (None 表示不限制)
+    """
+    my_user_id = get_threads_user_id()
+    if not my_user_id:
+        print("❌ 無法獲取你的 Threads 用戶 ID")
+        return
+    
+    print(f"🔍 正在獲取最近 {count} 篇貼文...")
+    posts_result = get_user_threads_posts(limit=count)
+    if "error" in posts_result:
+        print(f"❌ 獲取貼文列表失敗: {posts_result['error']}")
+        return
+    
+    if "data" not in posts_result or not posts_result["data"]:
+        print("❌ 沒有找到任何貼文")
+        return
+    
+    posts = posts_result["data"]
+    print(f"✓ 找到 {len(posts)} 篇貼文")
+    
+    with ExitStack() as leases:
+        # 收集所有貼文下的待回覆留言（只讀取，不需要等待間隔）
+        candidates = []
+        post_leases = {}
+        for idx, post in enumerate(posts, 1):
+            post_id = post.get("id", "未知")
+            print(f"\n==== 收集第 {idx}/{len(posts)} 篇貼文的留言 ({post_id}) ====")
+            # 與逐篇處理相同，依貼文租約和其他執行個體分工
+            if not dry_run:
+                post_leases[post_id] = leases.enter_context(hold_post(post_id))
+                if not post_leases[post_id]:
+                    print("⏭️ 另一個執行個體正在處理這篇貼文，略過")
+                    continue
+            # 貼文列表已包含內容，直接作為生成回覆時的前文
+            remember_thread(post_id, post.get("text"), is_mine=True)
+            pending = collect_pending_replies(post_id, my_user_id, days, verbose)
+            if pending:
+                candidates.extend(pending)
+        
+        if not candidates:
+            print("\nℹ️ 沒有需要回覆的留言")
+            return
+        
+        # 讀取剩餘回覆額度
+        quota = remaining_reply_quota(get_publishing_limit())
+        if quota is None:
+            print("⚠️ 無法獲取剩餘回覆額度，僅依時間窗口規劃")
+        else:
+            print(f"📊 剩餘回覆額度: {quota} 則")
+        
+        window_seconds = window_minutes * 60 if window_minutes is not None else None
+        plan, deferred = plan_replies(candidates, quota, window_seconds, per_post=max_replies)
+        
+        print(f"\n🗂️ 共 {len(candidates)} 條待回覆留言，排程回覆 {len(plan)} 條，延後 {deferred} 條")
+        for idx, comment in enumerate(plan, 1):
+            print(f"  {idx}. [{comment.score:.2f}] @{comment.username}: {comment.text[:30]}{'...' if len(comment.text) > 30 else ''}")
+        
+        answer_pending_replies(plan, my_user_id, dry_run, post_leases=post_leases)
+    
+    print("\n🎉 排程的留言處理完成!")
+
+def auto_reply_backlog(count=100, days=None, dry_run=False, verbose=False, poll_interval=BATCH_POLL_INTERVAL, wait_minutes=None, restart=False):
+    """
+    以 OpenAI Batch 生成大量積壓留言的回覆，再依一般流程逐條發送
+    
+    收集留言、建立 Batch、下載結果、發送回覆每個階段完成後都寫入檢查點，中斷後重新執行
+    會從上次的階段繼續；已發送或已存入待重送佇列的留言不會重複發送。
+    
+    Args:
+        count: 處理的貼文數量
+        days: 只回覆最近幾天內的留言 (None 表示不限制)
+        dry_run: 是否只模擬執行：只收集留言並寫出輸入檔，不建立（收費的）Batch，也不發送回覆
+        verbose: 是否顯示詳細日誌
+        poll_interval: 輪詢 Batch 狀態的間隔秒數
+        wait_minutes: 本次最多等待 Batch 幾分鐘 (None 表示等到完成)
+        restart: 捨棄進行中的檢查點，重新收集留言
+    """
+    my_user_id = get_threads_user_id()
+    if not my_user_id:
+        print("❌ 無法獲取你的 Threads 用戶 ID")
+        return
+    
+    state = load_batch_state()
+    if state and restart:
+        print(f"🗑️ 捨棄進行中的批次 ({state.get('batch_id') or '尚未送出'})")
+        clear_batch_state()
+        state = None
+    
+    if state is None:
+        print(f"🔍 正在獲取最近 {count} 篇貼文...")
+        posts_result = get_user_threads_posts(limit=count)
+        if "error" in posts_result:
+            print(f"❌ 獲取貼文列表失敗: {posts_result['error']}")
+            return
+        
+        posts = posts_result.get("data") or []
+        comments = []
+        for idx, post in enumerate(posts, 1):
+            post_id = post.get("id", "未知")
+            remember_thread(post_id, post.get("text"), is_mine=True)
+            print(f"\n==== 收集第 {idx}/{len(posts)} 篇貼文的留言 ({post_id}) ====")
+            comments.extend(collect_pending_replies(post_id, my_user_id, days, verbose) or [])
+        
+        if not comments:
+            print("\nℹ️ 沒有需要回覆的留言")
+            return
+        
+        write_batch_input([
+            {"reply_id": comment.reply_id, "text": comment.text, "context": context_for(comment.post_id)}
+            for comment in comments
+        ])
+        print(f"\n📝 已將 {len(comments)} 條留言寫入 Batch 輸入檔 {BATCH_INPUT_FILE}")
+        if dry_run:
+            print("🔄 模擬模式: 未建立 Batch，也未保存檢查點")
+            return
+        state = {"phase": "collected", "comments": [comment.to_dict() for comment in comments]}
+        save_batch_state(state)
+    
+    if state["phase"] in ("collected", "submitting"):
+        if dry_run:
+            print(f"🔄 模擬模式: 未建立 Batch（{len(state['comments'])} 條請求已在 {BATCH_INPUT_FILE}）")
+            return
+        if state["phase"] == "collected":
+            # 先記下上傳的檔案與送出識別碼，建立 Batch 後中斷也能找回，不會重複送出
+            input_file_id, submission_id = upload_batch_input()
+            state.update(phase="submitting", input_file_id=input_file_id, submission_id=submission_id)
+            save_batch_state(state)
+        batch_id = create_batch(state["input_file_id"], state["submission_id"])
+        state.update(phase="submitted", batch_id=batch_id)
+        save_batch_state(state)
+        print(f"🚀 已送出 Batch {batch_id}")
+    
+    if state["phase"] == "submitted":
+        print(f"⏳ 等待 Batch {state['batch_id']} 完成（每 {poll_interval:g} 秒查詢一次）...")
+        
+        def show_progress(batch):
+            counts = batch.request_counts
+            done = f"{counts.completed}/{counts.total}" if counts else "?"
+            print(f"  ⌛ 狀態: {batch.status}，已完成 {done}")
+        
+        batch = wait_for_batch(
+            state["batch_id"], poll_interval,
+            timeout=wait_minutes * 60 if wait_minutes is not None else None,
+            on_poll=show_progress
+        )
+        if batch.status not in FINAL_STATUSES:
+            print("⏸️ Batch 尚未完成，稍後再次執行 backlog 子命令會繼續等待")
+            return
+        
+        replies, errors = download_batch_results(batch)
+        if batch.status != "completed":
+            print(f"⚠️ Batch 狀態為 {batch.status}，只取得 {len(replies)} 條回覆")
+        state.update(phase="publishing", replies=replies, errors=errors)
+        save_batch_state(state)
+        print(f"📥 取得 {len(replies)} 條回覆，{len(errors)} 條生成失敗")
+    
+    # 發送階段：略過已回覆或已存入待重送佇列的留言，依剩餘回覆額度排程
+    dead_letters = queued_reply_ids()
+    pending = []
+    for comment in map(ReplyRecord.from_dict, state["comments"]):
+        reply_id = comment.reply_id
+        if reply_id in state["replies"] and not is_handled(reply_id) and reply_id not in dead_letters:
+            pending.append(comment)
+    
+    quota = remaining_reply_quota(get_publishing_limit())
+    plan, deferred = plan_replies(pending, quota)
+    print(f"\n📨 共 {len(pending)} 條待發送，本次發送 {len(plan)} 條，額度不足延後 {deferred} 條")
+    answer_pending_replies(plan, my_user_id, dry_run, generated=state["replies"])
+    
+    if dry_run:
+        print("\n🔄 模擬模式: 已保留檢查點，不加 --dry-run 再次執行即會發送")
+        return
+    if deferred:
+        print(f"\n⏸️ 還有 {deferred} 條待回覆額度恢復後，再次執行 backlog 子命令發送")
+        return
+    
+    clear_batch_state()
+    print("\n🎉 積壓留言處理完成!")
+    if state.get("errors"):
+        print(f"⚠️ {len(state['errors'])} 條留言生成失敗，下次執行 backlog 子命令會重新收集")
+
+def replay_failed_replies(limit=None, dry_run=False, list_only=False):
+    """
+    重送待重送佇列中的回覆，直接使用已生成的文字，不再呼叫 OpenAI
+    
+    Args:
+        limit: 最多重送幾條 (None 表示全部)
+        dry_run: 是否只模擬執行，不實際發送回覆
+        list_only: 只列出佇列內容
+    """
+    entries = load_dead_letters()
+    if not entries:
+        print("ℹ️ 待重送佇列是空的")
+        return
+    
+    print(f"📦 待重送佇列中有 {len(entries)} 條回覆")
+    if list_only:
+        for idx, entry in enumerate(entries, 1):
+            print(f"  {idx}. 回覆 {entry['reply_to_id']} (@{entry.get('username') or '未知用戶'})，已嘗試 {entry.get('attempts', 0)} 次")
+            print(f"     回覆內容: {entry['reply_text'][:50]}{'...' if len(entry['reply_text']) > 50 else ''}")
+            print(f"     失敗原因: {entry.get('error') or '未知'}")
+        return
+    
+    to_replay = entries if limit is None else entries[:limit]
+    remaining = entries[len(to_replay):]
+    
+    my_user_id = None
+    if not dry_run:
+        my_user_id = get_threads_user_id()
+        if not my_user_id:
+            print("❌ 無法獲取你的 Threads 用戶 ID")
+            return
+    
+    succeeded = 0
+    for idx, entry in enumerate(to_replay, 1):
+        print(f"\n--- 正在重送第 {idx}/{len(to_replay)} 條回覆 ---")
+        print(f"↩️ 回覆對象: {entry['reply_to_id']}")
+        print(f"✍️ 回覆內容: {entry['reply_text']}")
+        
+        # 掃描、webhook 或提及處理可能已在佇列之外回覆過這條留言
+        if is_handled(entry['reply_to_id']):
+            print("⏭️ 這條留言已回覆過，從佇列移除")
+            continue
+        
+        if dry_run:
+            print("🔄 模擬模式: 未實際發送回覆")
+            remaining.append(entry)
+            continue
+        
+        # 取得留言租約，避免與其他執行個體的重送同時發佈
+        if not claim_comment(entry['reply_to_id']):
+            print("⏭️ 這條留言正由其他執行個體處理，保留在佇列中")
+            remaining.append(entry)
+            continue
+        
+        # 有先前的容器 ID 時先確認是否其實已發佈，仍可發佈就直接發佈同一個容器
+        result, attempts, error, creation_id = create_reply_with_retries(
+            threads_user_id=my_user_id,
+            reply_to_id=entry['reply_to_id'],
+            text=entry['reply_text'],
+            creation_id=entry.get('creation_id')
+        )
+        if result:
+            succeeded += 1
+            mark_handled(entry['reply_to_id'], "replay", result.get("id"))
+            print("✅ 回覆成功發送!")
+        else:
+            entry["attempts"] = entry.get("attempts", 0) + attempts
+            entry["error"] = error
+            entry["creation_id"] = creation_id
+            remaining.append(entry)
+            release_comment(entry['reply_to_id'])
+            print(f"❌ 回覆仍然發送失敗: {error}")
+        
+        # 為避免 API 限制，等待數秒再繼續
+        if idx < len(to_replay):
+            print("⏳ 等待 10 秒後處理下一條...")
+            time.sleep(10)
+    
+    if not dry_run:
+        # 重送期間可能有新的失敗紀錄被追加，一併保留
+        remaining.extend(load_dead_letters()[len(entries):])
+        save_dead_letters(remaining)
+    
+    print(f"\n✅ 重送完成: 成功 {succeeded} 條，剩餘 {len(remaining)} 條")
+
+def reply_to_mentions(limit=None, days=None, dry_run=False):
+    """
+    回覆提及我的新貼文，只處理上次執行之後的提及
+    
+    Args:
+        limit: 本次最多回覆幾則 (None 表示全部)
+        days: 第一次執行時只處理最近幾天內的提及
+        dry_run: 是否只模擬執行，不實際發送回覆
+    """
+    print("🔍 正在獲取新的提及...")
+    result = process_mentions(limit=limit, days=days, dry_run=dry_run)
+    if "error" in result:
+        print(f"❌ 處理提及失敗: {result['error']}")
+        return
+    
+    if not result.get("fetched"):
+        print("ℹ️ 沒有新的提及")
+        return
+    
+    print(f"\n✅ 提及處理完成: 取得 {result.get('fetched', 0)} 則，"
+          f"回覆 {result.get('answered', 0)} 則，失敗 {result.get('failed', 0)} 則，"
+          f"已回覆過或待重送 {result.get('ignored', 0)} 則")
+    if result.get("deferred"):
+        print(f"⏸️ 超過本次上限的 {result['deferred']} 則較新提及留到下次執行")
+
 def main():
     parser = argparse.ArgumentParser(description="自動回覆 Threads 貼文下的留言")
     
+    parser.add_argument("--profile", action="store_true", help="記錄 cProfile 與火焰圖效能分析")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, metavar="DIR", help=f"效能分析的輸出目錄 (預設: {PROFILE_DIR})")
+    
     # 建立子命令
     subparsers = parser.add_subparsers(dest="command", help="命令")
     
@@ -311,13 +634,50 @@ def main():
     posts_parser.add_argument("-v", "--verbose", action="store_true", default=True, help="顯示詳細的檢測資訊")
     posts_parser.add_argument("-q", "--quiet", action="store_false", dest="verbose", help="不顯示詳細的檢測資訊")
     posts_parser.add_argument("--days", type=int, help="只回覆最近幾天內的留言")
+    posts_parser.add_argument("--plan", action="store_true", help="依剩餘回覆額度為所有留言評分，優先回覆最重要的留言")
+    posts_parser.add_argument("--window", type=float, help="搭配 --plan 使用，本次執行可用的分鐘數")
+    
+    # 重送失敗回覆的子命令
+    replay_parser = subparsers.add_parser("replay", help="重送待重送佇列中的失敗回覆（不重新生成）")
+    replay_parser.add_argument("-n", "--num", type=int, help="最多重送幾條回覆")
+    replay_parser.add_argument("-d", "--dry-run", action="store_true", help="僅模擬執行，不實際發送回覆")
+    replay_parser.add_argument("-l", "--list", action="store_true", help="只列出佇列中的回覆")
+    
+    # 回覆提及的子命令
+    mentions_parser = subparsers.add_parser("mentions", help="回覆提及我的新貼文")
+    mentions_parser.add_argument("-n", "--num", type=int, help="本次最多回覆幾則提及")
+    mentions_parser.add_argument("-d", "--dry-run", action="store_true", help="僅模擬執行，不實際發送回覆")
+    mentions_parser.add_argument("--days", type=int, help="第一次執行時只處理最近幾天內的提及")
+    
+    # 以 OpenAI Batch 處理大量積壓留言的子命令
+    backlog_parser = subparsers.add_parser("backlog", help="以 OpenAI Batch 生成大量積壓留言的回覆，可中斷後續傳")
+    backlog_parser.add_argument("-c", "--count", type=int, default=100, help="要處理的貼文數量 (預設: 100)")
+    backlog_parser.add_argument("-d", "--dry-run", action="store_true", help="僅模擬發送，生成結果保留到下次執行")
+    backlog_parser.add_argument("-v", "--verbose", action="store_true", default=False, help="顯示詳細的檢測資訊")
+    backlog_parser.add_argument("--days", type=int, help="只回覆最近幾天內的留言")
+    backlog_parser.add_argument("--poll", type=float, default=BATCH_POLL_INTERVAL, help=f"查詢 Batch 狀態的間隔秒數 (預設: {BATCH_POLL_INTERVAL:g})")
+    backlog_parser.add_argument("--wait", type=float, help="本次最多等待 Batch 幾分鐘，未完成時保留檢查點")
+    backlog_parser.add_argument("--restart", action="store_true", help="捨棄進行中的批次，重新收集留言")
     
     args = parser.parse_args()
     
+    with profile_run(args.command or "help", args.profile_dir) if args.profile else nullcontext():
+        run_command(parser, args)
+
+def run_command(parser, args):
+    """執行指定的子命令"""
     if args.command == "post":
         auto_reply_to_post(args.post_id, args.num, args.days, args.dry_run, args.verbose)
+    elif args.command == "posts" and args.plan:
+        auto_reply_planned(args.count, args.num, args.days, args.dry_run, args.verbose, args.window)
     elif args.command == "posts":
         auto_reply_all_posts(args.count, args.num, args.days, args.dry_run, args.verbose)
+    elif args.command == "replay":
+        replay_failed_replies(args.num, args.dry_run, args.list)
+    elif args.command == "mentions":
+        reply_to_mentions(args.num, args.days, args.dry_run)
+    elif args.command == "backlog":
+        auto_reply_backlog(args.count, args.days, args.dry_run, args.verbose, args.poll, args.wait, args.restart)
     else:
         parser.print_help()
 
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+留言篩選的記憶體與吞吐量基準測試
+
+以合成的大量回覆（預設 100,000 則）比較：
+    - 舊做法：check_if_replied_by_me 與 collect_pending_replies 的多個字典
+      （all_commenters、my_replies、replies_to_answer，每則保留格式化時間字串與 datetime）
+    - utils.reply_records.scan_replies：單次走訪，留言以 __slots__ 的 ReplyRecord 保存，時間只解析一次
+
+分別測量「貼文下沒有我的回覆」（大部分留言都待回覆）與「已有我的回覆」兩種情況。
+"""
+
+import os
+import sys
+import gc
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.reply_records import scan_replies
+
+MY_USER_ID = "1000"
+POST_ID = "17890000000000000"
+SAMPLE_TEXTS = ["請問礦藝的紅石電路該從何學起？", "好玩", "此版本之村民交易甚是奇妙，不知閣下以為如何", "哈哈哈哈", "求種子碼"]
+
+
+def synthetic_replies(count, my_replies=0, seed=42):
+    """產生與 Graph API /replies 回應相同結構的合成留言"""
+    rng = random.Random(seed)
+    start = datetime(2025, 4, 1, tzinfo=timezone.utc)
+    replies = []
+    for idx in range(count):
+        user_id = MY_USER_ID if idx < my_replies else str(2000 + rng.randrange(count // 3 + 1))
+        timestamp = (start + timedelta(seconds=rng.randrange(30 * 86400))).strftime("%Y-%m-%dT%H:%M:%S+0000")
+        replies.append({
+            "id": str(17900000000000000 + idx),
+            "text": rng.choice(SAMPLE_TEXTS),
+            "timestamp": timestamp,
+            "has_replies": rng.random() < 0.1,
+            "from": {"id": user_id, "username": f"user{user_id}", "name": f"用戶{user_id}"},
+        })
+    rng.shuffle(replies)
+    return replies
+
+
+def _format_timestamp(timestamp_str):
+    try:
+        return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return timestamp_str
+
+
+def _parse_timestamp(timestamp_str):
+    try:
+        return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def legacy_collect(replies, my_user_id, date_limit):
+    """原本 check_if_replied_by_me + collect_pending_replies 的資料處理（不含輸出）"""
+    all_commenters = {}
+    for reply in replies:
+        user_info = reply.get("from", {})
+        user_id = user_info.get("id")
+        if user_id:
+            all_commenters[user_id] = {
+                "username": user_info.get("username", "未知用戶"),
+                "name": user_info.get("name", "未知名稱"),
+                "text": reply.get("text", "[無文字內容]"),
+                "timestamp": reply.get("timestamp", "")
+            }
+    my_replies = []
+    for reply in replies:
+        if reply.get("from", {}).get("id") == my_user_id:
+            my_replies.append({
+                "id": reply.get("id"),
+                "text": reply.get("text", "[無文字內容]"),
+                "timestamp": reply.get("timestamp", "")
+            })
+    replied_users = set()
+    if my_replies:
+        for user_id in all_commenters:
+            if user_id != my_user_id:
+                replied_users.add(user_id)
+
+    replies_to_answer = []
+    for reply in replies:
+        user_info = reply.get("from", {})
+        user_id = user_info.get("id")
+        if user_id == my_user_id or user_id in replied_users:
+            continue
+        if date_limit:
+            reply_time = _parse_timestamp(reply.get("timestamp", ""))
+            if reply_time and reply_time < date_limit:
+                continue
+        replies_to_answer.append({
+            "reply_id": reply.get("id"),
+            "post_id": POST_ID,
+            "user_id": user_id,
+            "username": user_info.get("username", "未知用戶"),
+            "name": user_info.get("name", "未知名稱"),
+            "text": reply.get("text", "[無文字內容]"),
+            "timestamp": _format_timestamp(reply.get("timestamp", "")),
+            "created_at": _parse_timestamp(reply.get("timestamp", "")),
+            "has_replies": reply.get("has_replies", False)
+        })
+    return replied_users, my_replies, all_commenters, replies_to_answer
+
+
+def compact_collect(replies, my_user_id, date_limit):
+    """utils.reply_records.scan_replies（與 collect_pending_replies 的 -q 模式相同）"""
+    since_epoch = int(date_limit.timestamp()) if date_limit else None
+    scan = scan_replies(replies, POST_ID, my_user_id, since_epoch)
+    return scan, scan.pending
+
+
+def measure(fn, replies, date_limit, repeat):
+    """
+    Returns:
+        (最快一次的秒數, 保留結果所佔的位元組, 執行期間的峰值位元組, 待回覆留言數)
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn(replies, MY_USER_ID, date_limit)
+        best = min(best, time.perf_counter() - start)
+        del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = fn(replies, MY_USER_ID, date_limit)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, retained, peak, len(result[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="留言篩選的記憶體與吞吐量基準測試")
+    parser.add_argument("-n", "--count", type=int, default=100000, help="每篇貼文的合成回覆數 (預設: 100000)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="計時重複次數，取最快一次 (預設: 3)")
+    parser.add_argument("--days", type=int, default=14, help="日期限制，模擬 --days (預設: 14)")
+    args = parser.parse_args()
+
+    date_limit = datetime(2025, 5, 1, tzinfo=timezone.utc) - timedelta(days=args.days) if args.days else None
+    scenarios = {
+        "沒有我的回覆": synthetic_replies(args.count),
+        "已有我的回覆": synthetic_replies(args.count, my_replies=20),
+    }
+
+    print(f"每篇貼文 {args.count:,} 則合成回覆，日期限制 {args.days} 天\n")
+    print(f"{'情境':<10} {'做法':<8} {'耗時 (ms)':>10} {'萬則/秒':>9} {'保留 (MB)':>10} {'峰值 (MB)':>10} {'待回覆':>8}")
+    for name, replies in scenarios.items():
+        results = {}
+        for label, fn in (("舊做法", legacy_collect), ("精簡紀錄", compact_collect)):
+            seconds, retained, peak, pending = measure(fn, replies, date_limit, args.repeat)
+            results[label] = (seconds, retained)
+            print(f"{name:<10} {label:<8} {seconds * 1000:>12.1f} {len(replies) / seconds / 10000:>11.1f} "
+                  f"{retained / 1e6:>12.2f} {peak / 1e6:>12.2f} {pending:>10,}")
+        (old_s, old_mem), (new_s, new_mem) = results["舊做法"], results["精簡紀錄"]
+        print(f"{'':<10} {'→ 加速':<8} {old_s / new_s:>11.2f}x {'':>9} {old_mem / max(new_mem, 1):>11.2f}x\n")
+
+
+if __name__ == "__main__":
+    main()
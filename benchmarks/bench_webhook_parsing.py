@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Webhook 內容解析的微基準測試
+
+分別以三種 webhook 結構比較：
+    - 舊做法：json.loads 後以多層 .get() 走訪（與原本 handle_event 相同）
+    - utils.webhook_events.parse_webhook_body（orjson + 一次判斷結構）
+"""
+
+import os
+import sys
+import json
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import webhook_events
+from utils.webhook_events import parse_webhook_body
+
+SAMPLE_TEXT = "請問礦藝的紅石電路該從何學起？" * 3
+
+PAYLOADS = {
+    webhook_events.SHAPE_ENTRY_VALUE: {
+        "object": "threads",
+        "entry": [{"id": "1", "time": 1700000000, "changes": [{
+            "field": "threads",
+            "value": {"id": "17890000000000001", "text": SAMPLE_TEXT, "username": "reader",
+                      "timestamp": "2025-04-20T08:00:00+0000", "from": {"id": "111", "username": "reader"}}
+        }]}]
+    },
+    webhook_events.SHAPE_ENTRY_REPLIES: {
+        "object": "threads",
+        "entry": [{"id": "1", "time": 1700000000, "changes": [{
+            "field": "threads",
+            "value": {"replies": {"id": "17890000000000002", "thread_id": "17890000000000000", "text": SAMPLE_TEXT,
+                                  "timestamp": "2025-04-20T08:00:00+0000", "from": {"id": "111", "username": "reader"}}}
+        }]}]
+    },
+    webhook_events.SHAPE_VALUES_VALUE: {
+        "field": "replies",
+        "values": {"value": {"id": "17890000000000003", "text": SAMPLE_TEXT, "username": "reader",
+                             "timestamp": "2025-04-20T08:00:00+0000",
+                             "root_post": {"id": "17890000000000000", "owner_id": "222", "username": "bot"}}}
+    },
+}
+
+
+def legacy_parse(raw):
+    """原本兩個 handle_event 的走訪方式（合併後的版本）"""
+    body = json.loads(raw)
+    events = []
+    if "entry" in body:
+        for entry in body.get("entry", []):
+            for change in entry.get("changes", []):
+                value = change.get("value", {})
+                if "replies" in value:
+                    reply_data = value.get("replies", {})
+                    thread_id = reply_data.get("thread_id")
+                    text = reply_data.get("text", "")
+                    from_user = reply_data.get("from", {})
+                    if text and thread_id and from_user.get("id"):
+                        events.append((thread_id, text, from_user.get("id"), from_user.get("username")))
+                else:
+                    message = value.get("text", "")
+                    reply_id = value.get("id", "")
+                    if message and reply_id:
+                        events.append((reply_id, message, None, value.get("username", "未知用戶")))
+    elif "values" in body and "value" in body.get("values", {}):
+        value = body.get("values", {}).get("value", {})
+        message = value.get("text", "")
+        reply_id = value.get("id", "")
+        if message and reply_id:
+            events.append((reply_id, message, None, value.get("username", "未知用戶")))
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook 內容解析的微基準測試")
+    parser.add_argument("-n", "--number", type=int, default=100000, help="每種結構的解析次數 (預設: 100000)")
+    args = parser.parse_args()
+
+    decoder = "orjson" if "orjson" in sys.modules else "json"
+    print(f"解碼器: {decoder}，每種結構解析 {args.number} 次\n")
+    print(f"{'結構':<30} {'舊做法 (µs)':>12} {'新做法 (µs)':>12} {'加速':>8}")
+
+    for shape, payload in PAYLOADS.items():
+        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        _, events = parse_webhook_body(raw)
+        assert len(events) == 1 and events[0].shape == shape, shape
+
+        legacy = min(timeit.repeat(lambda: legacy_parse(raw), number=args.number, repeat=3)) / args.number
+        fast = min(timeit.repeat(lambda: parse_webhook_body(raw), number=args.number, repeat=3)) / args.number
+        print(f"{shape:<30} {legacy * 1e6:>14.2f} {fast * 1e6:>14.2f} {legacy / fast:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
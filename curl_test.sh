@@ -110,10 +110,9 @@ else
 fi
 
 # 測試 Webhook (模擬 Threads 發送的回覆事件)
+# webhook 需要 X-Hub-Signature-256 簽章，請先設定 THREADS_APP_SECRET
 echo -e "\n==== 測試 Webhook 回調（包含 OpenAI 古風回覆生成） ===="
-curl -s -X POST \
-  -H "Content-Type: application/json" \
-  -d '{
+WEBHOOK_BODY='{
     "entry": [{
       "changes": [{
         "field": "threads",
@@ -131,7 +130,12 @@ curl -s -X POST \
         }
       }]
     }]
-  }' \
+  }'
+WEBHOOK_SIGNATURE=$(printf '%s' "$WEBHOOK_BODY" | openssl dgst -sha256 -hmac "${THREADS_APP_SECRET}" | sed 's/^.* //')
+curl -s -X POST \
+  -H "Content-Type: application/json" \
+  -H "X-Hub-Signature-256: sha256=${WEBHOOK_SIGNATURE}" \
+  --data-raw "$WEBHOOK_BODY" \
   "${API_URL}/api/webhook" | jq .
 
 # 測試模擬發送回覆
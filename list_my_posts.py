@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 import argparse
+from contextlib import nullcontext
 import json
 from datetime import datetime
 from utils.list_threads_posts import get_user_threads_posts, get_thread_post_details
+from utils.post_export import export_posts, checkpoint_path, EXPORT_FORMATS
+from utils.analytics import load_columns, analyze_history
+from utils.profiling import profile_run, PROFILE_DIR
 
 def format_timestamp(timestamp_str):
     """將 ISO 格式的時間戳轉換為易讀格式"""
@@ -69,9 +73,92 @@ def show_post_details(post_id, format_json=False):
     print(f"內容: {text}")
     print(f"媒體類型: {media_type}")
 
+def export_all_posts(output, export_format="jsonl", resume=False, append=False, page_size=25):
+    """串流匯出所有貼文與回覆"""
+    if resume:
+        print(f"正在從檢查點繼續匯出至 {output}...\n")
+    elif append:
+        print(f"正在追加上次匯出之後的新貼文至 {output}...\n")
+    else:
+        print(f"正在匯出所有貼文與回覆至 {output}...\n")
+    
+    def progress(post_id, records):
+        print(f"✓ 貼文 {post_id} 已匯出，累計 {records} 筆紀錄")
+    
+    result = export_posts(output, export_format, resume, append, page_size, progress)
+    if "error" in result:
+        print(f"錯誤: {result['error']}")
+        if "records" in result:
+            print(f"已匯出的進度保存在 {checkpoint_path(output)}，可使用 --resume 繼續")
+        return
+    
+    print(f"\n匯出完成: 本次 {result['posts']} 篇貼文，檔案共 {result['records']} 筆紀錄")
+
+def format_duration(seconds):
+    """將秒數轉換為易讀格式"""
+    if seconds < 60:
+        return f"{seconds:.0f} 秒"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} 分鐘"
+    return f"{seconds / 3600:.1f} 小時"
+
+def show_analytics(path, top=10, utc_offset=0, format_json=False):
+    """分析 export 子命令匯出的貼文與回覆"""
+    print(f"正在載入 {path}...\n")
+    
+    try:
+        report = analyze_history(load_columns(path), top, utc_offset)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"錯誤: {e}")
+        return
+    
+    if format_json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+    
+    totals = report["totals"]
+    print(f"貼文 {totals['posts']} 篇，他人留言 {totals['comments']} 則，我的回覆 {totals['my_replies']} 則\n")
+    
+    latency = report["reply_latency_seconds"]
+    print("---- 回覆延遲 ----")
+    if latency["count"]:
+        print(f"樣本數: {latency['count']}，平均: {format_duration(latency['mean'])}")
+        print(f"中位數: {format_duration(latency['p50'])}，P90: {format_duration(latency['p90'])}，P99: {format_duration(latency['p99'])}")
+        for bucket, count in latency["histogram"].items():
+            print(f"  {bucket:>8} 秒: {count}")
+    else:
+        print("沒有可計算延遲的回覆")
+    print()
+    
+    coverage = report["coverage"]
+    print("---- 回覆覆蓋率 ----")
+    print(f"已回覆 {coverage['answered']}/{totals['comments']} 則留言 ({coverage['rate']:.1%})\n")
+    
+    print("---- 留言最多的貼文 ----")
+    for i, post in enumerate(report["busiest_posts"], 1):
+        text = post["text"][:30] + ("..." if len(post["text"]) > 30 else "")
+        print(f"{i}. {post['post_id']} 留言 {post['comments']} 則，已回覆 {post['answered']} 則: {text}")
+    print()
+    
+    print(f"---- 每小時留言數 (UTC{utc_offset:+d}) ----")
+    per_hour = report["comments_per_hour"]
+    peak = max(per_hour) or 1
+    for hour, count in enumerate(per_hour):
+        print(f"{hour:02d}:00 {'█' * round(count / peak * 30)} {count}")
+    print()
+    
+    follow_ups = report["follow_ups"]
+    print("---- 引起後續回覆的古風回覆 ----")
+    print(f"{follow_ups['replies_with_follow_ups']} 則回覆收到後續回覆 ({follow_ups['rate']:.1%})")
+    for i, reply in enumerate(follow_ups["top"], 1):
+        print(f"{i}. 後續回覆 {reply['follow_ups']} 則: {reply['text'][:40]}")
+
 def main():
     parser = argparse.ArgumentParser(description="列出和顯示 Threads 貼文")
     
+    parser.add_argument("--profile", action="store_true", help="記錄 cProfile 與火焰圖效能分析")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, metavar="DIR", help=f"效能分析的輸出目錄 (預設: {PROFILE_DIR})")
+    
     # 建立子命令
     subparsers = parser.add_subparsers(dest="command", help="命令")
     
@@ -85,12 +172,41 @@ def main():
     show_parser.add_argument("post_id", help="要顯示的貼文 ID")
     show_parser.add_argument("-j", "--json", action="store_true", help="以 JSON 格式輸出")
     
+    # 匯出所有貼文與回覆的子命令
+    export_parser = subparsers.add_parser(
+        "export", help="串流匯出所有貼文與各層回覆",
+        description="串流匯出所有貼文與各層回覆。--append 只匯出上次匯出之後發佈的新貼文，"
+                    "已匯出貼文下後來新增的回覆不會補上；要取得完整的最新回覆請匯出到新的路徑。"
+    )
+    export_parser.add_argument("output", help="輸出檔案 (jsonl) 或目錄 (parquet)")
+    export_parser.add_argument("-f", "--format", choices=EXPORT_FORMATS, default="jsonl", help="輸出格式 (預設: jsonl，parquet 需安裝 pyarrow)")
+    export_mode = export_parser.add_mutually_exclusive_group()
+    export_mode.add_argument("--resume", action="store_true", help="從中斷的匯出繼續")
+    export_mode.add_argument("--append", action="store_true", help="追加上次匯出之後的新貼文（已匯出貼文下後來新增的回覆不會補上，需要時請重新完整匯出）")
+    export_parser.add_argument("--page-size", type=int, default=25, help="每頁貼文數 (預設: 25)")
+    
+    # 分析匯出資料的子命令
+    analytics_parser = subparsers.add_parser("analytics", help="分析匯出的貼文與回覆（需安裝 numpy）")
+    analytics_parser.add_argument("input", help="export 子命令輸出的 JSONL 檔案或 Parquet 目錄")
+    analytics_parser.add_argument("-t", "--top", type=int, default=10, help="列出前幾名 (預設: 10)")
+    analytics_parser.add_argument("--utc-offset", type=int, default=8, help="每小時留言數使用的時區 (預設: 8)")
+    analytics_parser.add_argument("-j", "--json", action="store_true", help="以 JSON 格式輸出")
+    
     args = parser.parse_args()
     
+    with profile_run(args.command or "help", args.profile_dir) if args.profile else nullcontext():
+        run_command(parser, args)
+
+def run_command(parser, args):
+    """執行指定的子命令"""
     if args.command == "list":
         list_posts(args.count, args.json)
     elif args.command == "show":
         show_post_details(args.post_id, args.json)
+    elif args.command == "export":
+        export_all_posts(args.output, args.format, args.resume, args.append, args.page_size)
+    elif args.command == "analytics":
+        show_analytics(args.input, args.top, args.utc_offset, args.json)
     else:
         parser.print_help()
 
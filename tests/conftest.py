@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# 模組在匯入時就決定資料檔路徑，必須在匯入任何 utils 模組之前指向暫存目錄，測試不會寫入 data/
+os.environ["BOT_DATA_DIR"] = tempfile.mkdtemp(prefix="threads-bot-tests-")
+os.environ.setdefault("LEASE_BACKEND", "memory")
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from utils.admission import ANSWERED, DEGRADED, SHED, SKIPPED, AdmissionController, is_low_value_comment
+
+
+class BlockingHandler:
+    """第一筆工作會卡住唯一的工作執行緒，讓後續提交停在佇列中"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, job, degraded=False):
+        self.calls.append((job, degraded))
+        self.started.set()
+        self.release.wait(5)
+        return (DEGRADED if degraded else ANSWERED), job
+
+
+def _controller(policy, handler):
+    controller = AdmissionController(handler, max_in_flight=1, max_queue=2, policy=policy, high_water=0.5,
+                                     value_fn=is_low_value_comment)
+    first = controller.submit("busy")
+    assert handler.started.wait(5)
+    return controller, first
+
+
+def _results(futures):
+    return [future.result(5) for future in futures]
+
+
+def test_drop_oldest_sheds_the_oldest_queued_job():
+    handler = BlockingHandler()
+    controller, first = _controller("drop-oldest", handler)
+    futures = [controller.submit(job) for job in ("a", "b", "c")]
+    handler.release.set()
+    assert _results([first] + futures) == [(ANSWERED, "busy"), (SHED, None), (ANSWERED, "b"), (ANSWERED, "c")]
+    assert controller.stats()[SHED] == 1
+
+
+def test_skip_low_value_only_when_overloaded():
+    handler = BlockingHandler()
+    controller, first = _controller("skip-low-value", handler)
+    # 佇列是空的，尚未過載，低價值留言照常排入
+    low_before = controller.submit("哈哈")
+    low_after = controller.submit("讚")
+    normal = controller.submit("請問這句怎麼解？")
+    rejected = controller.submit("佇列已滿時的新留言")
+    handler.release.set()
+    assert _results([first, low_before, low_after, normal, rejected]) == [
+        (ANSWERED, "busy"), (ANSWERED, "哈哈"), (SKIPPED, None), (ANSWERED, "請問這句怎麼解？"), (SHED, None)
+    ]
+
+
+def test_degrade_uses_template_replies_when_overloaded():
+    handler = BlockingHandler()
+    controller, first = _controller("degrade", handler)
+    futures = [controller.submit(job) for job in ("a", "b", "c")]
+    handler.release.set()
+    assert _results([first] + futures) == [(ANSWERED, "busy"), (ANSWERED, "a"), (DEGRADED, "b"), (SHED, None)]
+    assert [degraded for _, degraded in handler.calls] == [False, False, True]
+
+
+def test_handler_exception_is_reported_as_failed():
+    def handler(job, degraded=False):
+        raise RuntimeError("boom")
+
+    controller = AdmissionController(handler, max_in_flight=1, max_queue=1)
+    assert controller.submit("x").result(5) == ("failed", None)
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        AdmissionController(lambda job, degraded=False: (ANSWERED, None), policy="random")
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from utils.graph_cache import TTLCache
+
+
+def test_hit_within_ttl_and_reload_after_expiry():
+    cache = TTLCache()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return {"n": len(loads)}
+
+    assert cache.get_or_load("posts", "k", 0.05, loader) == {"n": 1}
+    assert cache.get_or_load("posts", "k", 0.05, loader) == {"n": 1}
+    time.sleep(0.06)
+    assert cache.get_or_load("posts", "k", 0.05, loader) == {"n": 2}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_concurrent_reads_are_coalesced():
+    cache = TTLCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_load("replies", "k", 10, loader)))
+    owner.start()
+    assert started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(cache.get_or_load("replies", "k", 10, loader))) for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    # 等待者都登記為合併讀取後才放行載入
+    while cache.stats()["coalesced"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [owner] + waiters:
+        thread.join(5)
+    assert results == ["value"] * 4
+    assert len(calls) == 1
+
+
+def test_failed_load_is_shared_and_not_cached():
+    cache = TTLCache()
+
+    def failing():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("post", "k", 10, failing)
+    assert cache.get_or_load("post", "k", 10, lambda: "ok") == "ok"
+
+
+def test_invalidate_by_kind():
+    cache = TTLCache()
+    cache.get_or_load("posts", "a", 10, lambda: 1)
+    cache.get_or_load("user_info", "b", 10, lambda: 2)
+    cache.invalidate("posts")
+    assert cache.get_or_load("posts", "a", 10, lambda: 3) == 3
+    assert cache.get_or_load("user_info", "b", 10, lambda: 4) == 2
+    cache.invalidate()
+    assert cache.get_or_load("user_info", "b", 10, lambda: 5) == 5
+
+
+def test_invalidation_during_load_does_not_cache_stale_value_or_drop_newer_load():
+    cache = TTLCache()
+    old_started = threading.Event()
+    old_release = threading.Event()
+
+    def old_loader():
+        old_started.set()
+        old_release.wait(5)
+        return "stale"
+
+    results = {}
+    old = threading.Thread(target=lambda: results.setdefault("old", cache.get_or_load("replies", "k", 10, old_loader)))
+    old.start()
+    assert old_started.wait(5)
+    # 發佈後失效：進行中的舊載入不應寫入快取
+    cache.invalidate("replies")
+
+    new_started = threading.Event()
+    new_release = threading.Event()
+
+    def new_loader():
+        new_started.set()
+        new_release.wait(5)
+        return "fresh"
+
+    new = threading.Thread(target=lambda: results.setdefault("new", cache.get_or_load("replies", "k", 10, new_loader)))
+    new.start()
+    assert new_started.wait(5)
+    # 舊載入先完成，不可移除新請求登記的載入
+    old_release.set()
+    old.join(5)
+    assert cache._in_flight.get(("replies", "k")) is not None
+    new_release.set()
+    new.join(5)
+    assert results == {"old": "stale", "new": "fresh"}
+    assert cache.get_or_load("replies", "k", 10, lambda: "unused") == "fresh"
+
+
+def test_lru_eviction():
+    cache = TTLCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.get_or_load("post", key, 10, lambda key=key: key)
+    assert cache.stats()["entries"] == 2
+    assert cache.get_or_load("post", "a", 10, lambda: "reloaded") == "reloaded"
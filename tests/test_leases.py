@@ -0,0 +1,63 @@
+import time
+
+from utils.leases import InMemoryLeaseBackend, LeaseManager, SQLiteLeaseBackend
+
+
+def test_memory_lease_contention_and_expiry():
+    backend = InMemoryLeaseBackend()
+    assert backend.acquire("post:1", "a", ttl=0.05)
+    assert not backend.acquire("post:1", "b", ttl=0.05)
+    # 持有者可以續約
+    assert backend.acquire("post:1", "a", ttl=0.05)
+    time.sleep(0.06)
+    assert backend.acquire("post:1", "b", ttl=10)
+    assert not backend.acquire("post:1", "a", ttl=10)
+
+
+def test_release_only_by_owner():
+    backend = InMemoryLeaseBackend()
+    backend.acquire("comment:1", "a", ttl=10)
+    backend.release("comment:1", "b")
+    assert not backend.acquire("comment:1", "b", ttl=10)
+    backend.release("comment:1", "a")
+    assert backend.acquire("comment:1", "b", ttl=10)
+
+
+def test_expired_leases_are_purged_on_acquire():
+    backend = InMemoryLeaseBackend(purge_interval=0)
+    for index in range(5):
+        backend.acquire(f"comment:{index}", "a", ttl=0.01)
+    time.sleep(0.02)
+    backend.acquire("comment:new", "a", ttl=10)
+    assert list(backend._leases) == ["comment:new"]
+
+
+def test_sqlite_contention_expiry_and_purge(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+    first = SQLiteLeaseBackend(path, purge_interval=3600)
+    second = SQLiteLeaseBackend(path, purge_interval=3600)
+    assert first.acquire("post:1", "a", ttl=0.05)
+    assert not second.acquire("post:1", "b", ttl=0.05)
+    first.acquire("comment:1", "a", ttl=0.05)
+    time.sleep(0.06)
+    assert second.acquire("post:1", "b", ttl=10)
+    assert second.purge_expired(time.time()) == 1
+
+
+def test_hold_reports_lost_lease_when_renewal_fails():
+    backend = InMemoryLeaseBackend()
+    manager = LeaseManager(backend, owner="a")
+    with manager.hold("post:1", ttl=0.06) as lease:
+        assert lease and not lease.is_lost()
+        # 租約過期後被其他執行個體取得，續約會失敗
+        backend._leases["post:1"] = ("b", time.time() + 10)
+        assert lease.lost.wait(1)
+    # 結束時不會釋放別人的租約
+    assert backend._leases["post:1"][0] == "b"
+
+
+def test_hold_not_acquired_is_falsy():
+    backend = InMemoryLeaseBackend()
+    backend.acquire("post:1", "b", ttl=10)
+    with LeaseManager(backend, owner="a").hold("post:1", ttl=10) as lease:
+        assert not lease
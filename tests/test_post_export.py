@@ -0,0 +1,46 @@
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from utils import post_export
+
+
+class Crash(Exception):
+    """模擬匯出途中行程中斷"""
+
+
+POSTS = [{"id": f"p{i}", "text": f"貼文{i}", "timestamp": f"2025-04-0{i + 1}T08:00:00+0000"} for i in range(6)]
+
+
+def _fake_api(monkeypatch, crash_on=None):
+    def posts_page(limit=25, after=None, since=None):
+        start = int(after or 0)
+        page = POSTS[start:start + limit]
+        end = start + len(page)
+        paging = {"cursors": {"after": str(end)}, "next": "more"} if end < len(POSTS) else {}
+        return {"data": page, "paging": paging}
+
+    def conversation_page(post_id, after=None, limit=100):
+        if post_id == crash_on:
+            raise Crash(post_id)
+        return {"data": [{"id": f"{post_id}-r", "text": "回覆", "from": {"id": "u1", "username": "reader"}}]}
+
+    monkeypatch.setattr(post_export, "get_threads_user_id", lambda: "me")
+    monkeypatch.setattr(post_export, "get_user_threads_posts", posts_page)
+    monkeypatch.setattr(post_export, "get_post_conversation_page", conversation_page)
+
+
+def test_parquet_resume_after_crash_keeps_every_record(tmp_path, monkeypatch):
+    monkeypatch.setattr(post_export, "PARQUET_PART_ROWS", 4)
+    output = str(tmp_path / "export")
+
+    _fake_api(monkeypatch, crash_on="p3")
+    with pytest.raises(Crash):
+        post_export.export_posts(output, "parquet", page_size=2)
+
+    _fake_api(monkeypatch)
+    result = post_export.export_posts(output, "parquet", resume=True, page_size=2)
+
+    ids = pq.read_table(output).column("id").to_pylist()
+    assert result["records"] == 12
+    assert sorted(ids) == sorted([post["id"] for post in POSTS] + [f"{post['id']}-r" for post in POSTS])
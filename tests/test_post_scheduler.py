@@ -0,0 +1,126 @@
+import time
+
+import pytest
+
+from utils import post_scheduler
+from utils.post_scheduler import FAILED, PENDING, PREPARED, PUBLISHED, PUBLISHING, PostQueue, PostScheduler
+from utils.threads_client import ThreadsAPIError
+
+
+class FakeClient:
+    """記錄呼叫的 Threads 用戶端；publish_error 與 status 決定發佈結果不明時的情境"""
+
+    def __init__(self, publish_error=None, status="FINISHED", status_error=None):
+        self.publish_error = publish_error
+        self.status = status
+        self.status_error = status_error
+        self.created = []
+        self.published = []
+
+    def create_container(self, **fields):
+        self.created.append(fields)
+        return f"container-{len(self.created)}"
+
+    def publish(self, creation_id):
+        self.published.append(creation_id)
+        if self.publish_error:
+            raise self.publish_error
+        return {"id": f"post-{creation_id}"}
+
+    def container_status(self, creation_id):
+        if self.status_error:
+            raise self.status_error
+        return {"id": creation_id, "status": self.status}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return PostQueue(str(tmp_path / "post_queue.sqlite3"))
+
+
+def _schedule(queue, client):
+    scheduled_id = queue.add_many([{"text": "排程貼文"}])[0]
+    scheduler = PostScheduler(queue, client=client)
+    # 第一輪建立容器，跳過等待容器處理的秒數後的第二輪發佈
+    scheduler.run_once()
+    return scheduled_id, scheduler
+
+
+def _publish_round(scheduler):
+    return scheduler.run_once(time.time() + post_scheduler.POST_CONTAINER_SETTLE + 1)
+
+
+def _post(queue, scheduled_id):
+    return next(post for post in queue.list() if post["id"] == scheduled_id)
+
+
+def test_prepare_then_publish(queue):
+    client = FakeClient()
+    scheduled_id, scheduler = _schedule(queue, client)
+    assert _post(queue, scheduled_id)["status"] == PREPARED
+    assert _publish_round(scheduler) == {"prepared": 0, "published": 1}
+    post = _post(queue, scheduled_id)
+    assert (post["status"], post["post_id"]) == (PUBLISHED, "post-container-1")
+
+
+def test_publish_error_but_container_published(queue):
+    client = FakeClient(publish_error=ThreadsAPIError("timeout"), status="PUBLISHED")
+    scheduled_id, scheduler = _schedule(queue, client)
+    _publish_round(scheduler)
+    assert _post(queue, scheduled_id)["status"] == PUBLISHED
+    assert client.published == ["container-1"]
+
+
+def test_publish_error_with_finished_container_republishes_same_container(queue):
+    client = FakeClient(publish_error=ThreadsAPIError("bad gateway", 502), status="FINISHED")
+    scheduled_id, scheduler = _schedule(queue, client)
+    _publish_round(scheduler)
+    post = _post(queue, scheduled_id)
+    assert (post["status"], post["attempts"], post["container_id"]) == (PREPARED, 1, "container-1")
+
+    client.publish_error = None
+    _publish_round(scheduler)
+    assert _post(queue, scheduled_id)["status"] == PUBLISHED
+    assert client.published == ["container-1", "container-1"]
+    assert len(client.created) == 1
+
+
+def test_publish_error_with_failed_container_recreates_it(queue):
+    client = FakeClient(publish_error=ThreadsAPIError("bad request", 400), status="ERROR")
+    scheduled_id, scheduler = _schedule(queue, client)
+    _publish_round(scheduler)
+    post = _post(queue, scheduled_id)
+    assert (post["status"], post["attempts"], post["container_id"]) == (PENDING, 1, None)
+
+
+def test_unknown_outcome_stays_publishing_until_status_is_known(queue):
+    client = FakeClient(publish_error=ThreadsAPIError("timeout"), status_error=ThreadsAPIError("timeout"))
+    scheduled_id, scheduler = _schedule(queue, client)
+    _publish_round(scheduler)
+    post = _post(queue, scheduled_id)
+    assert (post["status"], post["attempts"]) == (PUBLISHING, 1)
+
+    # 逾時後的下一輪確認容器其實已發佈，不會再次送出
+    client.status_error = None
+    client.status = "PUBLISHED"
+    scheduler.run_once(time.time() + post_scheduler.POST_PUBLISHING_TIMEOUT + 1)
+    assert _post(queue, scheduled_id)["status"] == PUBLISHED
+    assert client.published == ["container-1"]
+
+
+def test_gives_up_after_max_attempts(queue, monkeypatch):
+    monkeypatch.setattr(post_scheduler, "POST_MAX_ATTEMPTS", 2)
+    client = FakeClient(publish_error=ThreadsAPIError("bad gateway", 502), status="FINISHED")
+    scheduled_id, scheduler = _schedule(queue, client)
+    _publish_round(scheduler)
+    _publish_round(scheduler)
+    post = _post(queue, scheduled_id)
+    assert (post["status"], post["attempts"]) == (FAILED, 2)
+
+
+def test_expired_container_is_recreated(queue):
+    client = FakeClient()
+    scheduled_id, scheduler = _schedule(queue, client)
+    scheduler.recover_stale(time.time() + post_scheduler.POST_CONTAINER_MAX_AGE + 1)
+    post = _post(queue, scheduled_id)
+    assert (post["status"], post["container_id"]) == (PENDING, None)
@@ -0,0 +1,68 @@
+import pytest
+import requests
+
+from utils import resilience
+from utils.resilience import UpstreamUnavailable, retry_with_backoff
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """記錄退避等待的秒數而不真的等待"""
+    recorded = []
+    monkeypatch.setattr(resilience.time, "sleep", recorded.append)
+    return recorded
+
+
+def _sequence(*outcomes):
+    """依序回傳或拋出 outcomes 中的結果"""
+    calls = []
+
+    def fn():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return fn, calls
+
+
+def test_succeeds_after_transient_failures(sleeps):
+    fn, calls = _sequence(UpstreamUnavailable("breaker open"), requests.ConnectionError("reset"), {"id": "1"})
+    assert retry_with_backoff(fn, attempts=3, base_delay=1, max_delay=10) == ({"id": "1"}, 3, None)
+    assert len(calls) == 3
+    # full jitter：第 n 次重試前最多等待 base_delay * 2**(n-1) 秒
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+
+
+def test_falsy_result_counts_as_failure(sleeps):
+    fn, calls = _sequence(None, {}, {"id": "1"})
+    assert retry_with_backoff(fn, attempts=3) == ({"id": "1"}, 3, None)
+
+
+def test_delay_is_capped(sleeps):
+    fn, _ = _sequence(None, None, None, None)
+    retry_with_backoff(fn, attempts=4, base_delay=10, max_delay=3)
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= 3 for delay in sleeps)
+
+
+def test_permanent_error_stops_immediately(sleeps):
+    fn, calls = _sequence(UpstreamUnavailable("bad request"), {"id": "1"})
+    result = retry_with_backoff(fn, attempts=3, is_transient=lambda e: "bad request" not in str(e))
+    assert result == (None, 1, "bad request")
+    assert len(calls) == 1 and sleeps == []
+
+
+def test_exhausted_attempts_return_last_error(sleeps):
+    fn, calls = _sequence(UpstreamUnavailable("first"), UpstreamUnavailable("second"))
+    assert retry_with_backoff(fn, attempts=2) == (None, 2, "second")
+    assert len(sleeps) == 1
+
+
+def test_unexpected_exception_is_not_retried(sleeps):
+    fn, calls = _sequence(ValueError("bug"), {"id": "1"})
+    with pytest.raises(ValueError):
+        retry_with_backoff(fn, attempts=3)
+    assert len(calls) == 1
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from utils.webhook_events import SHAPE_ENTRY_REPLIES, SHAPE_ENTRY_VALUE, parse_webhook_body
+
+
+def _entry_body(*changes):
+    return json.dumps({"object": "threads", "entry": [{"id": "1", "time": 1700000000, "changes": list(changes)}]}).encode()
+
+
+def test_threads_change_is_parsed():
+    _, events = parse_webhook_body(_entry_body({
+        "field": "threads",
+        "value": {"replies": {"thread_id": "100", "text": "你好", "from": {"id": "7", "username": "reader"}}},
+    }))
+    assert [(event.reply_to_id, event.text, event.username, event.shape) for event in events] == [
+        ("100", "你好", "reader", SHAPE_ENTRY_REPLIES)
+    ]
+
+
+def test_replies_and_mentions_fields_are_parsed():
+    _, events = parse_webhook_body(_entry_body(
+        {"field": "replies", "value": {"id": "300", "text": "留言", "from": {"id": "7", "username": "reader"}}},
+        {"field": "mentions", "value": {"id": "301", "text": "@bot 你好", "username": "fan"}},
+    ))
+    assert [(event.reply_to_id, event.username, event.shape) for event in events] == [
+        ("300", "reader", SHAPE_ENTRY_VALUE),
+        ("301", "fan", SHAPE_ENTRY_VALUE),
+    ]
+
+
+def test_other_fields_are_ignored():
+    _, events = parse_webhook_body(_entry_body(
+        {"field": "publish", "value": {"id": "200", "text": "新貼文"}},
+        {"value": {"id": "201", "text": "沒有 field"}},
+        {"field": "threads", "value": {"id": "202", "text": "留言"}},
+    ))
+    assert [(event.reply_to_id, event.shape) for event in events] == [("202", SHAPE_ENTRY_VALUE)]
+
+
+@pytest.mark.parametrize("body", [
+    {"entry": [1]},
+    {"entry": {"changes": []}},
+    {"entry": [{"changes": "x"}]},
+    {"entry": [{"changes": [1, None, {"field": ["replies"]}, {"field": "replies", "value": [1]}]}]},
+    {"entry": [{"changes": [{"field": "replies", "value": {"id": 5, "text": {"a": 1}, "from": "x"}}]}]},
+    {"entry": [{"changes": [{"field": "replies", "value": {"replies": "x"}}]}]},
+    {"values": {"value": "x"}},
+])
+def test_malformed_elements_are_skipped(body):
+    _, events = parse_webhook_body(json.dumps(body).encode())
+    assert events == []
+
+
+def test_malformed_elements_do_not_drop_valid_changes():
+    body = {"entry": [1, {"changes": [None, {"field": "replies", "value": {"id": "400", "text": "留言", "from": "x"}}]}]}
+    _, events = parse_webhook_body(json.dumps(body).encode())
+    assert [(event.reply_to_id, event.user_id) for event in events] == [("400", None)]
@@ -0,0 +1,47 @@
+import asyncio
+import hashlib
+import hmac
+
+from starlette.requests import Request
+
+from utils import webhook_guard
+from utils.rate_limit import KeyedRateLimiter
+from utils.webhook_guard import read_verified_body, request_source
+
+
+def _request(forwarded=None, client="10.0.0.5"):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "POST", "path": "/api/webhook", "headers": headers, "client": (client, 443)})
+
+
+def test_forwarded_for_ignored_without_trusted_proxy():
+    assert request_source(_request("1.2.3.4"), trusted_hops=0) == "10.0.0.5"
+
+
+def test_trusted_proxy_uses_address_it_appended():
+    # 用戶端自行填寫的 1.2.3.4 不會被採用
+    assert request_source(_request("1.2.3.4, 203.0.113.9"), trusted_hops=1) == "203.0.113.9"
+    assert request_source(_request("1.2.3.4, 203.0.113.9, 10.1.1.1"), trusted_hops=2) == "203.0.113.9"
+
+
+def _signed_request(body, secret):
+    signature = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    headers = [(b"x-hub-signature-256", signature.encode()), (b"content-length", str(len(body)).encode())]
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {"type": "http", "method": "POST", "path": "/api/webhook", "headers": headers, "client": ("10.0.0.5", 443)}
+    return Request(scope, receive)
+
+
+def test_valid_signature_accepted_after_source_is_blocked(monkeypatch):
+    monkeypatch.setattr(webhook_guard, "THREADS_APP_SECRET", "secret")
+    monkeypatch.setattr(webhook_guard, "_bad_sources", KeyedRateLimiter(0.001, 2))
+    body = b'{"entry": []}'
+
+    statuses = [asyncio.run(read_verified_body(_signed_request(body, "wrong")))[1].status_code for _ in range(3)]
+    assert statuses == [401, 401, 429]
+
+    raw, error = asyncio.run(read_verified_body(_signed_request(body, "secret")))
+    assert error is None and raw == body
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+OpenAI Batch API 的本地模擬伺服器
+
+實作 backlog 子命令用到的端點（上傳檔案、建立、查詢與列出 Batch、下載檔案內容），
+Batch 在指定秒數後完成，每個請求回傳固定格式的文言回覆，可選擇讓部分請求失敗。
+設定 OPENAI_BATCH_BASE_URL=http://127.0.0.1:8002/v1 即可讓 backlog 改用此伺服器。
+"""
+
+import json
+import time
+import uuid
+import random
+import argparse
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import PlainTextResponse
+
+app = FastAPI()
+files = {}
+batches = {}
+settings = {"delay": 5.0, "error_rate": 0.0}
+
+def _file_object(file_id, filename, purpose, content):
+    return {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(content.encode("utf-8")),
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": purpose,
+        "status": "processed",
+    }
+
+def _store_file(filename, purpose, content):
+    file_id = f"file-{uuid.uuid4().hex[:24]}"
+    files[file_id] = {"meta": _file_object(file_id, filename, purpose, content), "content": content}
+    return files[file_id]["meta"]
+
+def _fake_reply(body):
+    # 取出提示中的留言，回傳可辨識的固定回覆
+    prompt = body["messages"][-1]["content"]
+    message = prompt.split("今有人留言曰：「", 1)[-1].split("」", 1)[0]
+    return f"善哉斯言：{message[:10]}"
+
+def _run_batch(batch):
+    """依輸入檔產生輸出檔與錯誤檔，模擬 Batch 完成"""
+    output_lines, error_lines = [], []
+    for line in files[batch["input_file_id"]]["content"].splitlines():
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        request_id = f"batch_req_{uuid.uuid4().hex[:16]}"
+        if random.random() < settings["error_rate"]:
+            error_lines.append({
+                "id": request_id,
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 500, "body": {"error": {"message": "mock failure"}}},
+                "error": None,
+            })
+            continue
+        output_lines.append({
+            "id": request_id,
+            "custom_id": request["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "model": request["body"]["model"],
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": _fake_reply(request["body"])}, "finish_reason": "stop"}],
+                },
+            },
+            "error": None,
+        })
+
+    def dump(lines):
+        return "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+
+    batch["status"] = "completed"
+    batch["completed_at"] = int(time.time())
+    batch["output_file_id"] = _store_file("batch_output.jsonl", "batch_output", dump(output_lines))["id"] if output_lines else None
+    batch["error_file_id"] = _store_file("batch_errors.jsonl", "batch_output", dump(error_lines))["id"] if error_lines else None
+    total = len(output_lines) + len(error_lines)
+    batch["request_counts"] = {"total": total, "completed": len(output_lines), "failed": len(error_lines)}
+
+@app.post("/v1/files")
+async def upload_file(file: UploadFile = File(...), purpose: str = Form(...)):
+    content = (await file.read()).decode("utf-8")
+    return _store_file(file.filename, purpose, content)
+
+@app.get("/v1/files/{file_id}/content")
+async def file_content(file_id: str):
+    if file_id not in files:
+        raise HTTPException(status_code=404, detail="file not found")
+    return PlainTextResponse(files[file_id]["content"])
+
+@app.post("/v1/batches")
+async def create_batch(request: Request):
+    body = await request.json()
+    if body.get("input_file_id") not in files:
+        raise HTTPException(status_code=400, detail="input file not found")
+    batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+    total = sum(1 for line in files[body["input_file_id"]]["content"].splitlines() if line.strip())
+    batches[batch_id] = {
+        "id": batch_id,
+        "object": "batch",
+        "endpoint": body.get("endpoint"),
+        "input_file_id": body["input_file_id"],
+        "completion_window": body.get("completion_window"),
+        "status": "in_progress",
+        "created_at": int(time.time()),
+        "metadata": body.get("metadata"),
+        "output_file_id": None,
+        "error_file_id": None,
+        "request_counts": {"total": total, "completed": 0, "failed": 0},
+    }
+    return batches[batch_id]
+
+@app.get("/v1/batches")
+async def list_batches(limit: int = 20, after: str = None):
+    # 依建立時間由新到舊，以 after 分頁
+    ordered = sorted(batches.values(), key=lambda batch: batch["created_at"], reverse=True)
+    if after:
+        ids = [batch["id"] for batch in ordered]
+        ordered = ordered[ids.index(after) + 1:] if after in ids else []
+    page = ordered[:limit]
+    for batch in page:
+        if batch["status"] == "in_progress" and time.time() - batch["created_at"] >= settings["delay"]:
+            _run_batch(batch)
+    return {"object": "list", "data": page, "has_more": len(ordered) > limit,
+            "first_id": page[0]["id"] if page else None, "last_id": page[-1]["id"] if page else None}
+
+@app.get("/v1/batches/{batch_id}")
+async def retrieve_batch(batch_id: str):
+    batch = batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="batch not found")
+    if batch["status"] == "in_progress" and time.time() - batch["created_at"] >= settings["delay"]:
+        _run_batch(batch)
+    return batch
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI Batch API 的本地模擬伺服器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--delay", type=float, default=5, help="Batch 建立後幾秒完成 (預設: 5)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="失敗請求的比例 (預設: 0)")
+    args = parser.parse_args()
+
+    import uvicorn
+    settings.update(delay=args.delay, error_rate=args.error_rate)
+    print(f"🧪 模擬 Batch API: http://{args.host}:{args.port}/v1 (完成延遲 {args.delay:g} 秒，失敗比例 {args.error_rate:g})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
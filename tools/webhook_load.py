@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Webhook 流量重播與壓力測試工具
+
+讀取 WEBHOOK_CAPTURE_FILE 錄下的 webhook 內容，以指定的速率與並行數重播到
+FastAPI 應用程式（行程內直接呼叫 ASGI，或透過 HTTP），並回報每秒處理事件數、
+延遲百分位數，以及伺服器開始飽和的速率。OpenAI 與 Graph API 呼叫一律以
+固定延遲的假函式取代，不會真的發文。
+"""
+
+import os
+import sys
+import hmac
+import json
+import hashlib
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# 讓工具可以直接從專案根目錄以外的地方執行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 匯入 openai_client 時需要金鑰，重播時不會真的呼叫 OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+# 壓測時每個事件的 INFO 日誌會淹沒結果表格
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# 上游呼叫都是假的，不需要啟動暖機與排程發文
+os.environ.setdefault("WARMUP_ENABLED", "0")
+os.environ.setdefault("POST_SCHEDULER_ENABLED", "0")
+
+APPS = {
+    "webhook": ("api.webhook", "/api/webhook"),
+    "threads-api": ("utils.threads_api", "/api/webhook"),
+}
+
+def load_captured_payloads(path):
+    """讀取錄下的 webhook 內容，只保留 JSON body"""
+    payloads = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                payloads.append(json.dumps(record.get("body", record), ensure_ascii=False).encode("utf-8"))
+    return payloads
+
+def install_mocks(module, openai_latency, graph_latency):
+    """以固定延遲的假函式取代模組中的 OpenAI 與 Graph API 呼叫"""
+    def fake_generate_classical_reply(message, *args, **kwargs):
+        time.sleep(openai_latency)
+        return f"善哉斯言：{message[:10]}"
+
+    def fake_get_threads_user_id():
+        return "mock-user"
+
+    def fake_get_thread_post_details(post_id):
+        # 補上前文用的原貼文讀取
+        time.sleep(graph_latency)
+        return {"id": post_id, "text": "礦藝新版本心得"}
+
+    def fake_create_reply(threads_user_id, reply_to_id, text, media_type="TEXT"):
+        # 兩步驟流程：建立容器 + 發佈
+        time.sleep(graph_latency * 2)
+        return {"id": f"mock-{reply_to_id}"}
+
+    def fake_create_reply_with_retries(threads_user_id, reply_to_id, text, media_type="TEXT", creation_id=None):
+        return fake_create_reply(threads_user_id, reply_to_id, text, media_type), 1, None, None
+
+    # 同一批錄製內容會重播多次，不讀寫回覆紀錄與租約，避免重播的留言被當成已回覆而略過
+    def fake_is_handled(reply_to_id):
+        return False
+
+    def fake_mark_handled(reply_to_id, source, reply_id=None):
+        pass
+
+    def fake_claim_comment(comment_id):
+        return True
+
+    def fake_queued_reply_ids():
+        return set()
+
+    for name, fake in {
+        "generate_classical_reply": fake_generate_classical_reply,
+        "get_threads_user_id": fake_get_threads_user_id,
+        "get_thread_post_details": fake_get_thread_post_details,
+        "create_reply_with_two_steps": fake_create_reply,
+        "create_reply_with_retries": fake_create_reply_with_retries,
+        "is_handled": fake_is_handled,
+        "mark_handled": fake_mark_handled,
+        "claim_comment": fake_claim_comment,
+        "queued_reply_ids": fake_queued_reply_ids,
+    }.items():
+        if hasattr(module, name):
+            setattr(module, name, fake)
+
+def sign_payload(body, secret):
+    """產生與 Meta 相同格式的 X-Hub-Signature-256 標頭"""
+    return {"X-Hub-Signature-256": "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()}
+
+def load_app(app_name, openai_latency, graph_latency, secret):
+    import importlib
+    # 應用程式在匯入時讀取密鑰，必須在匯入前設定
+    os.environ["THREADS_APP_SECRET"] = secret
+    module_name, path = APPS[app_name]
+    module = importlib.import_module(module_name)
+    # 兩個應用程式的 webhook 都經由 utils.threads_api 生成與發布回覆
+    install_mocks(importlib.import_module("utils.threads_api"), openai_latency, graph_latency)
+    install_mocks(module, openai_latency, graph_latency)
+    return module.app, path
+
+async def asgi_post(app, path, body, headers=None):
+    """不經過網路，直接以 ASGI 介面送出一個 POST 請求，回傳狀態碼"""
+    request_headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+    ]
+    for key, value in (headers or {}).items():
+        request_headers.append((key.lower().encode(), value.encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": request_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("loadtest", 80),
+    }
+    sent = False
+    status = {}
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    await app(scope, receive, send)
+    return status.get("code", 500)
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+async def run_step(send_one, payloads, rate, duration, concurrency):
+    """
+    以開放迴圈 (open loop) 的方式按固定速率送出請求
+
+    延遲從「預定送出時間」開始計算，因此排隊等待的時間也會反映在百分位數中。
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    total = max(1, int(rate * duration))
+    interval = 1.0 / rate
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+
+    async def fire(index, scheduled):
+        nonlocal errors
+        async with semaphore:
+            try:
+                code = await send_one(payloads[index % len(payloads)])
+                if code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+        latencies.append(time.perf_counter() - scheduled)
+
+    tasks = []
+    for index in range(total):
+        scheduled = start + index * interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(index, scheduled)))
+    await asyncio.gather(*tasks)
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "offered_rate": rate,
+        "events": total,
+        "errors": errors,
+        "throughput": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+def make_sender(args):
+    if args.url:
+        import requests
+        session = requests.Session()
+        executor = ThreadPoolExecutor(max_workers=args.concurrency)
+
+        def post(body):
+            headers = {"Content-Type": "application/json", **sign_payload(body, args.secret)}
+            return session.post(args.url, data=body, headers=headers, timeout=60).status_code
+
+        async def send_one(body):
+            return await asyncio.get_running_loop().run_in_executor(executor, post, body)
+        return send_one
+
+    app, path = load_app(args.app, args.openai_latency, args.graph_latency, args.secret)
+
+    async def send_one(body):
+        return await asgi_post(app, path, body, sign_payload(body, args.secret))
+    return send_one
+
+def run_load_test(args):
+    payloads = load_captured_payloads(args.capture)
+    if not payloads:
+        print(f"❌ {args.capture} 中沒有任何錄下的 webhook 內容")
+        return
+
+    target = args.url or f"行程內 ({args.app})"
+    print(f"🎯 目標: {target}")
+    print(f"📼 載入 {len(payloads)} 筆錄下的 webhook 內容")
+
+    send_one = make_sender(args)
+    rates = [float(rate) for rate in args.rates.split(",")]
+    results = []
+    saturated_at = None
+
+    print(f"\n{'速率':>8} {'事件數':>6} {'錯誤':>5} {'事件/秒':>9} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9}")
+    for rate in rates:
+        result = asyncio.run(run_step(send_one, payloads, rate, args.duration, args.concurrency))
+        results.append(result)
+        print(f"{rate:>10.1f} {result['events']:>8} {result['errors']:>7} {result['throughput']:>12.1f} "
+              f"{result['p50_ms']:>11.1f} {result['p95_ms']:>11.1f} {result['p99_ms']:>11.1f}")
+        # 實際吞吐量跟不上送出速率，或 p99 超過目標，就視為開始飽和
+        if saturated_at is None and (result["throughput"] < rate * 0.9 or result["p99_ms"] > args.slo_ms):
+            saturated_at = rate
+            if not args.keep_going:
+                break
+
+    best = max(results, key=lambda r: r["throughput"])
+    print(f"\n📈 最高持續處理量: {best['throughput']:.1f} 事件/秒 (送出速率 {best['offered_rate']:.1f})")
+    if saturated_at is not None:
+        print(f"⚠️ 在 {saturated_at:.1f} 事件/秒時開始飽和 (吞吐量低於送出速率 90% 或 p99 > {args.slo_ms:.0f} ms)")
+    else:
+        print("✅ 測試的速率範圍內未達飽和")
+
+    if not args.url:
+        # 行程內模式可以直接讀取准入控制的丟棄與降級統計
+        from utils.threads_api import webhook_admission
+        stats = webhook_admission.stats()
+        print(f"🚦 准入控制 ({stats['policy']}): 回覆 {stats['answered']}、降級 {stats['degraded']}、"
+              f"略過 {stats['skipped']}、丟棄 {stats['shed']}、失敗 {stats['failed']}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"target": target, "steps": results, "saturated_at": saturated_at}, f, indent=2)
+        print(f"💾 結果已寫入 {args.json_out}")
+
+def serve(args):
+    """啟動已替換假函式的伺服器，供 HTTP 模式壓測"""
+    import uvicorn
+    app, path = load_app(args.app, args.openai_latency, args.graph_latency, args.secret)
+    print(f"🧪 以假的 OpenAI/Graph 呼叫啟動 {args.app}，webhook 路徑: {path}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+def main():
+    parser = argparse.ArgumentParser(description="重播錄下的 webhook 流量並測量伺服器容量")
+    subparsers = parser.add_subparsers(dest="command", help="命令")
+
+    def add_mock_arguments(sub):
+        sub.add_argument("--app", choices=sorted(APPS), default="webhook", help="要測試的應用程式 (預設: webhook)")
+        sub.add_argument("--openai-latency", type=float, default=0.8, help="假 OpenAI 生成的延遲秒數 (預設: 0.8)")
+        sub.add_argument("--graph-latency", type=float, default=0.2, help="假 Graph API 呼叫的延遲秒數 (預設: 0.2)")
+        sub.add_argument("--secret", default=os.getenv("THREADS_APP_SECRET") or "loadtest-secret",
+                         help="簽署 X-Hub-Signature-256 用的 App 密鑰 (預設: THREADS_APP_SECRET)")
+
+    run_parser = subparsers.add_parser("run", help="重播錄下的 webhook 流量")
+    run_parser.add_argument("capture", help="WEBHOOK_CAPTURE_FILE 錄下的 JSONL 檔")
+    run_parser.add_argument("--url", help="透過 HTTP 送到此網址；未指定時在行程內直接呼叫應用程式")
+    run_parser.add_argument("--rates", default="1,2,5,10,20,50", help="依序測試的每秒事件數，以逗號分隔")
+    run_parser.add_argument("--duration", type=float, default=10, help="每個速率持續的秒數 (預設: 10)")
+    run_parser.add_argument("--concurrency", type=int, default=32, help="最大並行請求數 (預設: 32)")
+    run_parser.add_argument("--slo-ms", type=float, default=2000, help="p99 延遲目標，超過視為飽和 (預設: 2000)")
+    run_parser.add_argument("--keep-going", action="store_true", help="飽和後仍繼續測試剩餘的速率")
+    run_parser.add_argument("--json-out", help="將結果寫入 JSON 檔")
+    add_mock_arguments(run_parser)
+
+    serve_parser = subparsers.add_parser("serve", help="啟動以假函式取代上游呼叫的伺服器")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8001)
+    add_mock_arguments(serve_parser)
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run_load_test(args)
+    elif args.command == "serve":
+        serve(args)
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
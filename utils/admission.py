@@ -0,0 +1,155 @@
+import os
+import re
+import threading
+from collections import deque, Counter
+from concurrent.futures import Future
+from dotenv import load_dotenv
+from utils.structured_log import get_logger
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+logger = get_logger("admission")
+
+# 同時處理（生成 + 發布）的留言數上限
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "4"))
+# 等待處理的留言數上限
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "50"))
+# 過載時的處理策略：drop-oldest、skip-low-value、degrade
+ADMISSION_POLICY = os.getenv("ADMISSION_POLICY", "drop-oldest")
+# 佇列深度超過此比例即視為過載，skip-low-value 與 degrade 策略開始生效
+ADMISSION_HIGH_WATER = float(os.getenv("ADMISSION_HIGH_WATER", "0.5"))
+
+POLICIES = ("drop-oldest", "skip-low-value", "degrade")
+
+# 處理結果
+ANSWERED = "answered"
+DEGRADED = "degraded"
+SHED = "shed"
+SKIPPED = "skipped"
+FAILED = "failed"
+IGNORED = "ignored"
+
+# 只有標點、表情或空白的留言
+_NO_CONTENT = re.compile(r"^[\W_]*$")
+# 常見的簡短附和
+_ACKNOWLEDGEMENTS = {"哈", "哈哈", "哈哈哈", "讚", "推", "+1", "笑死", "真的", "好", "ok", "lol"}
+
+
+def is_low_value_comment(text):
+    """判斷留言是否為過載時可以略過的低價值內容（純表情、過短的附和）"""
+    stripped = (text or "").strip().lower()
+    if len(stripped) <= 1 or _NO_CONTENT.match(stripped):
+        return True
+    return stripped in _ACKNOWLEDGEMENTS
+
+
+class AdmissionController:
+    """
+    留言處理的准入控制
+
+    以固定數量的工作執行緒限制同時處理的留言數，並以有上限的佇列限制等待中的留言數。
+    佇列滿或過載時依策略處理：
+
+        - drop-oldest：丟棄佇列中最舊的留言，讓新留言排入
+        - skip-low-value：過載時直接略過低價值留言，佇列滿時拒絕新留言
+        - degrade：過載時改用範本回覆（不呼叫 OpenAI），佇列滿時拒絕新留言
+
+    handler(job, degraded=...) 需回傳 (狀態, 發佈結果)；每筆提交都會得到一個 Future，
+    結果同樣為 (狀態, 發佈結果)。
+    """
+
+    def __init__(self, handler, max_in_flight=ADMISSION_MAX_IN_FLIGHT, max_queue=ADMISSION_MAX_QUEUE,
+                 policy=ADMISSION_POLICY, high_water=ADMISSION_HIGH_WATER, value_fn=None):
+        if policy not in POLICIES:
+            raise ValueError(f"未知的過載策略: {policy}")
+        self.handler = handler
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.policy = policy
+        self.high_water_depth = max(1, int(max_queue * high_water))
+        self.value_fn = value_fn
+        self.counts = Counter()
+        self.max_depth_seen = 0
+        self._queue = deque()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._workers = []
+
+    def _start_workers(self):
+        # 延遲到第一次提交才啟動，匯入模組本身不會產生執行緒
+        if self._workers:
+            return
+        for index in range(self.max_in_flight):
+            worker = threading.Thread(target=self._work, name=f"admission-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, job):
+        """
+        提交一筆留言
+
+        Args:
+            job: 交給 handler 處理的工作
+
+        Returns:
+            Future，結果為 (狀態, 發佈結果)
+        """
+        future = Future()
+        with self._cond:
+            self._start_workers()
+            self.counts["submitted"] += 1
+            depth = len(self._queue)
+            overloaded = depth >= self.high_water_depth
+
+            if self.policy == "skip-low-value" and overloaded and self.value_fn and self.value_fn(job):
+                self.counts[SKIPPED] += 1
+                future.set_result((SKIPPED, None))
+                return future
+
+            if depth >= self.max_queue:
+                if self.policy != "drop-oldest":
+                    self.counts[SHED] += 1
+                    future.set_result((SHED, None))
+                    return future
+                _, _, oldest = self._queue.popleft()
+                self.counts[SHED] += 1
+                oldest.set_result((SHED, None))
+
+            degraded = self.policy == "degrade" and overloaded
+            self._queue.append((job, degraded, future))
+            self.max_depth_seen = max(self.max_depth_seen, len(self._queue))
+            self._cond.notify()
+        return future
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job, degraded, future = self._queue.popleft()
+                self._in_flight += 1
+            try:
+                status, result = self.handler(job, degraded=degraded)
+            except Exception:
+                logger.exception("處理留言時發生錯誤")
+                status, result = FAILED, None
+            try:
+                future.set_result((status, result))
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self.counts[status] += 1
+
+    def stats(self):
+        """目前的處理統計"""
+        with self._cond:
+            return {
+                "policy": self.policy,
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._queue),
+                "max_queue_depth_seen": self.max_depth_seen,
+                **{key: self.counts[key] for key in ("submitted", ANSWERED, DEGRADED, SKIPPED, SHED, FAILED, IGNORED)},
+            }
@@ -0,0 +1,253 @@
+import os
+import json
+from utils.post_export import EXPORT_FIELDS
+
+# NumPy 為選用套件，只有分析匯出資料時才需要；Parquet 另需 pyarrow
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# 以整數代碼表示的 ID 欄位，三個欄位共用同一組代碼，可直接比較
+ID_FIELDS = ("id", "root_post_id", "parent_id")
+# 回覆延遲分布的百分位數
+LATENCY_PERCENTILES = (50, 90, 99)
+# 回覆延遲直方圖的區間上限（秒）
+LATENCY_BUCKETS = (60, 300, 900, 3600, 6 * 3600, 24 * 3600)
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("分析功能需要安裝 numpy (pip install numpy)")
+
+def load_columns(path):
+    """
+    將 export 子命令的輸出載入為欄位陣列
+
+    Args:
+        path: JSONL 檔案或 Parquet 目錄
+
+    Returns:
+        {欄位名稱: NumPy 陣列}。ID 欄位為 int64 代碼（缺值為 -1），代碼對應的原始 ID 在 id_values；
+        其他字串欄位為 object 陣列，缺值為空字串。文字長短不一，不轉成固定寬度的字串陣列，
+        避免記憶體用量由最長的一則留言決定
+    """
+    _require_numpy()
+    if os.path.isdir(path):
+        if pq is None:
+            raise RuntimeError("讀取 Parquet 需要安裝 pyarrow (pip install pyarrow)")
+        table = pq.read_table(path, columns=list(EXPORT_FIELDS))
+        columns = {name: table.column(name).to_pylist() for name in EXPORT_FIELDS}
+    else:
+        columns = {name: [] for name in EXPORT_FIELDS}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                for name in EXPORT_FIELDS:
+                    columns[name].append(record.get(name))
+
+    arrays = {}
+    for name, values in columns.items():
+        if name == "is_mine":
+            arrays[name] = np.array([bool(value) for value in values], dtype=bool)
+        elif name == "timestamp":
+            arrays[name] = parse_epochs(values)
+        elif name not in ID_FIELDS:
+            arrays[name] = np.array([value or "" for value in values], dtype=object)
+    arrays.update(encode_ids(columns))
+    return arrays
+
+def encode_ids(columns):
+    """
+    將 ID 欄位轉為共用的整數代碼
+
+    Args:
+        columns: {欄位名稱: ID 列表}，需包含 ID_FIELDS
+
+    Returns:
+        {欄位名稱: int64 代碼陣列（缺值為 -1）, "id_values": 代碼對應的原始 ID}
+    """
+    _require_numpy()
+    values = np.array([value or "" for name in ID_FIELDS for value in columns[name]], dtype=object)
+    id_values, codes = np.unique(values, return_inverse=True)
+    codes = codes.reshape(-1).astype(np.int64)
+    if len(id_values) and id_values[0] == "":
+        # 空字串排在最前面，扣掉後缺值成為 -1
+        id_values = id_values[1:]
+        codes -= 1
+    encoded = {"id_values": id_values}
+    start = 0
+    for name in ID_FIELDS:
+        end = start + len(columns[name])
+        encoded[name] = codes[start:end]
+        start = end
+    return encoded
+
+def parse_epochs(timestamps):
+    """
+    將 Threads 的 ISO 時間戳（UTC，例如 2024-01-01T12:00:00+0000）轉為 Unix 秒數
+
+    Returns:
+        float64 陣列，無法解析的時間為 NaN
+    """
+    _require_numpy()
+    # 先取到秒的部分，交給 datetime64 一次轉換整個陣列
+    trimmed = np.array([ts[:19] if isinstance(ts, str) and len(ts) >= 19 else "NaT" for ts in timestamps], dtype="U19")
+    try:
+        parsed = trimmed.astype("datetime64[s]")
+    except ValueError:
+        # 少數格式錯誤的時間戳逐一轉換，其餘維持向量化
+        parsed = np.array([_safe_datetime64(ts) for ts in trimmed], dtype="datetime64[s]")
+    epochs = parsed.astype("int64").astype("float64")
+    epochs[np.isnat(parsed)] = np.nan
+    return epochs
+
+def _safe_datetime64(ts):
+    try:
+        return np.datetime64(ts, "s")
+    except ValueError:
+        return np.datetime64("NaT")
+
+def _row_index(ids, size):
+    # 每個 ID 代碼第一次出現的列號，沒有對應列的代碼為 -1
+    rows = np.full(size, -1, dtype=np.int64)
+    codes, first = np.unique(ids, return_index=True)
+    present = codes >= 0
+    rows[codes[present]] = first[present]
+    return rows
+
+def _lookup(rows, keys):
+    # 找出 keys 所在的列，缺值或找不到時為 -1
+    if not len(rows):
+        return np.full(len(keys), -1, dtype=np.int64)
+    return np.where(keys >= 0, rows[np.clip(keys, 0, None)], -1)
+
+def _id_strings(id_values, codes):
+    return [id_values[code] if code >= 0 else "" for code in codes.tolist()]
+
+def _distribution(values):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {"count": 0}
+    result = {
+        "count": int(len(values)),
+        "mean": round(float(values.mean()), 1),
+    }
+    for percentile, value in zip(LATENCY_PERCENTILES, np.percentile(values, LATENCY_PERCENTILES)):
+        result[f"p{percentile}"] = round(float(value), 1)
+    edges = np.array((0,) + LATENCY_BUCKETS + (np.inf,))
+    counts, _ = np.histogram(values, bins=edges)
+    labels = [f"<={upper}" for upper in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}"]
+    result["histogram"] = dict(zip(labels, counts.tolist()))
+    return result
+
+def analyze_history(columns, top=10, utc_offset_hours=0):
+    """
+    以向量化運算分析匯出的貼文與回覆
+
+    Args:
+        columns: load_columns 載入的欄位陣列
+        top: 列出前幾名的貼文與回覆
+        utc_offset_hours: 每小時活躍度使用的時區偏移
+
+    Returns:
+        分析結果：回覆延遲分布、每篇貼文與每小時的留言數、機器人覆蓋率與我的回覆引起的後續回覆
+    """
+    _require_numpy()
+    ids = columns["id"]
+    id_values = columns["id_values"]
+    kinds = columns["kind"]
+    parents = columns["parent_id"]
+    roots = columns["root_post_id"]
+    mine = columns["is_mine"]
+    epochs = columns["timestamp"]
+
+    is_reply = kinds == "reply"
+    comments = is_reply & ~mine
+    my_replies = is_reply & mine
+
+    rows = _row_index(ids, len(id_values))
+
+    # 回覆延遲：我的回覆時間 - 被回覆留言的時間（只計算回覆他人留言的部分）
+    my_index = np.flatnonzero(my_replies)
+    parent_index = _lookup(rows, parents[my_index])
+    answered_other = parent_index >= 0
+    answered_other[answered_other] = ~mine[parent_index[answered_other]]
+    latencies = epochs[my_index[answered_other]] - epochs[parent_index[answered_other]]
+
+    # 覆蓋率：他人留言中有被我直接回覆的比例
+    answered_ids = np.unique(parents[my_replies])
+    answered_ids = answered_ids[answered_ids >= 0]
+    covered = np.isin(ids[comments], answered_ids)
+
+    # 每篇貼文的留言數
+    post_ids, post_counts = np.unique(roots[comments], return_counts=True)
+    busiest = np.argsort(post_counts)[::-1][:top]
+    post_covered = np.unique(roots[comments][covered], return_counts=True)
+    covered_by_post = dict(zip(post_covered[0].tolist(), post_covered[1].tolist()))
+    # 只為前幾名讀取貼文文字
+    post_texts = {}
+    post_lookup = _lookup(rows, post_ids[busiest])
+    for post_id, index in zip(post_ids[busiest].tolist(), post_lookup.tolist()):
+        post_texts[post_id] = columns["text"][index] if index >= 0 else ""
+
+    # 每小時的留言數
+    comment_epochs = epochs[comments]
+    comment_epochs = comment_epochs[~np.isnan(comment_epochs)]
+    hours = ((comment_epochs // 3600 + utc_offset_hours) % 24).astype(np.int64)
+    per_hour = np.bincount(hours, minlength=24)
+
+    # 後續回覆：直接回覆我的回覆的他人留言
+    follow_up_parents = parents[comments]
+    my_reply_ids = ids[my_replies]
+    follow_up_ids, follow_up_counts = np.unique(
+        follow_up_parents[np.isin(follow_up_parents, my_reply_ids[my_reply_ids >= 0])], return_counts=True
+    )
+    drew_follow_ups = len(follow_up_ids)
+    best = np.argsort(follow_up_counts)[::-1][:top]
+    best_lookup = _lookup(rows, follow_up_ids[best])
+
+    return {
+        "totals": {
+            "posts": int((kinds == "post").sum()),
+            "comments": int(comments.sum()),
+            "my_replies": int(my_replies.sum()),
+        },
+        "reply_latency_seconds": _distribution(latencies),
+        "coverage": {
+            "answered": int(covered.sum()),
+            "rate": round(float(covered.mean()), 4) if len(covered) else 0.0,
+        },
+        "busiest_posts": [
+            {
+                "post_id": post_id_string,
+                "text": post_texts[post_id],
+                "comments": int(count),
+                "answered": covered_by_post.get(post_id, 0),
+            }
+            for post_id, post_id_string, count in zip(
+                post_ids[busiest].tolist(), _id_strings(id_values, post_ids[busiest]), post_counts[busiest].tolist()
+            )
+        ],
+        "comments_per_hour": per_hour.tolist(),
+        "follow_ups": {
+            "replies_with_follow_ups": drew_follow_ups,
+            "rate": round(drew_follow_ups / int(my_replies.sum()), 4) if my_replies.any() else 0.0,
+            "top": [
+                {
+                    "reply_id": reply_id,
+                    "text": columns["text"][index] if index >= 0 else "",
+                    "follow_ups": int(count),
+                }
+                for reply_id, count, index in zip(
+                    _id_strings(id_values, follow_up_ids[best]), follow_up_counts[best].tolist(), best_lookup.tolist()
+                )
+            ],
+        },
+    }
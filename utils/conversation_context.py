@@ -0,0 +1,172 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# 最多保留幾則貼文或回覆，超過時淘汰最久沒使用的
+CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "4096"))
+# 每則內容保留的秒數
+CONTEXT_CACHE_TTL = float(os.getenv("CONTEXT_CACHE_TTL", "86400"))
+# 生成回覆時前文可使用的 token 數上限，0 表示不附上前文
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "300"))
+# 最多往上追溯幾層
+CONTEXT_MAX_DEPTH = int(os.getenv("CONTEXT_MAX_DEPTH", "6"))
+
+
+def estimate_tokens(text):
+    """
+    粗估文字的 token 數
+
+    中日韓文字大約一字一個 token，其餘字元大約四個一個 token；只用於前文預算，不需精確。
+    """
+    wide = sum(1 for char in text if ord(char) >= 0x2E80)
+    return wide + (len(text) - wide + 3) // 4
+
+
+class ConversationContextCache:
+    """
+    以貼文或回覆 ID 保存內容與上一層 ID 的快取
+
+    只記錄逐篇掃描、webhook 與發布回覆時本來就取得的資料，不會為了前文另外呼叫 API。
+    """
+
+    def __init__(self, max_entries=CONTEXT_CACHE_MAX_ENTRIES, ttl=CONTEXT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(self, thread_id, text, username=None, parent_id=None, is_mine=False):
+        """
+        記錄一則貼文或回覆
+
+        Args:
+            thread_id: 貼文或回覆 ID
+            text: 內容
+            username: 發文者帳號
+            parent_id: 回覆的對象 ID，貼文本身為 None
+            is_mine: 是否為自己發佈的內容
+        """
+        if not thread_id or not text:
+            return
+        with self._lock:
+            previous = self._entries.get(thread_id)
+            # 有些來源不帶上一層 ID 或發文者，不覆蓋已知的資訊
+            if previous:
+                parent_id = parent_id or previous[1]["parent_id"]
+                is_mine = is_mine or previous[1]["is_mine"]
+            self._entries[thread_id] = (time.monotonic() + self.ttl, {
+                "text": text,
+                "username": username,
+                "parent_id": parent_id,
+                "is_mine": is_mine,
+            })
+            self._entries.move_to_end(thread_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, thread_id):
+        """取得未過期的內容，不存在時返回 None"""
+        with self._lock:
+            entry = self._entries.get(thread_id)
+            if not entry:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[thread_id]
+                return None
+            self._entries.move_to_end(thread_id)
+            return entry[1]
+
+    def ancestors(self, thread_id, max_depth=CONTEXT_MAX_DEPTH):
+        """
+        從 thread_id 開始往上取出快取中的前文
+
+        Returns:
+            由近到遠的內容列表，遇到未快取的一層即停止
+        """
+        chain = []
+        seen = set()
+        while thread_id and thread_id not in seen and len(chain) < max_depth:
+            seen.add(thread_id)
+            node = self.get(thread_id)
+            if not node:
+                break
+            chain.append(node)
+            thread_id = node["parent_id"]
+        return chain
+
+    def context_window(self, thread_id, root_id=None, max_tokens=CONTEXT_TOKEN_BUDGET):
+        """
+        取出符合 token 預算的前文
+
+        優先保留原貼文（過長時截斷），其餘預算由最接近的一層往上分配。
+
+        Args:
+            thread_id: 被回覆留言的上一層 ID
+            root_id: 原貼文 ID，上一層關係不完整時用來補上原貼文
+            max_tokens: token 預算
+
+        Returns:
+            由遠到近排列的 {"username", "text", "is_mine", "is_root"} 列表
+        """
+        if max_tokens <= 0:
+            return []
+        chain = self.ancestors(thread_id)
+        root = chain.pop() if chain and not chain[-1]["parent_id"] else None
+        if root is None and root_id:
+            root = self.get(root_id)
+            if root in chain:
+                chain.remove(root)
+
+        window = []
+        budget = max_tokens
+        if root:
+            text = root["text"]
+            # 原貼文最多使用一半預算，其餘留給較近的回覆
+            limit = max_tokens // 2 if chain else max_tokens
+            if estimate_tokens(text) > limit:
+                text = _truncate(text, limit)
+            budget -= estimate_tokens(text)
+            root = {**root, "text": text, "is_root": True}
+        for node in chain:
+            cost = estimate_tokens(node["text"])
+            if cost > budget:
+                break
+            budget -= cost
+            window.append(node)
+        window.reverse()
+        if root:
+            window.insert(0, root)
+        return [
+            {"username": node["username"], "text": node["text"], "is_mine": node["is_mine"], "is_root": node.get("is_root", False)}
+            for node in window
+        ]
+
+
+def _truncate(text, max_tokens):
+    # 逐字累加估計值，保留預算內的開頭並以省略號結尾
+    wide = narrow = 0
+    for index, char in enumerate(text):
+        if ord(char) >= 0x2E80:
+            wide += 1
+        else:
+            narrow += 1
+        if wide + (narrow + 3) // 4 + 1 > max_tokens:
+            return text[:index] + "…"
+    return text
+
+
+# 整個行程共用的前文快取
+conversation_context = ConversationContextCache()
+
+def remember_thread(thread_id, text, username=None, parent_id=None, is_mine=False):
+    """記錄一則貼文或回覆到共用的前文快取"""
+    conversation_context.remember(thread_id, text, username, parent_id, is_mine)
+
+def context_for(thread_id, root_id=None):
+    """取出共用前文快取中符合預算的前文，參數同 ConversationContextCache.context_window"""
+    return conversation_context.context_window(thread_id, root_id)
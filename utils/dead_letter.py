@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+from utils.local_store import data_path, append_jsonl, read_jsonl, write_jsonl
+
+# 重試後仍發送失敗的回覆，連同已生成的文字一起保存，之後可直接重送
+DEAD_LETTER_FILE = data_path("dead_letters.jsonl")
+
+def record_failed_reply(reply_to_id, reply_text, source, attempts, error=None, post_id=None, username=None, original_text=None, creation_id=None):
+    """
+    將發送失敗的回覆存入待重送佇列
+
+    Args:
+        reply_to_id: 要回覆的留言 ID
+        reply_text: 已生成的回覆文字（重送時不再重新生成）
+        source: 失敗來源 (sweep, webhook, replay)
+        attempts: 已嘗試的次數
+        error: 最後一次的錯誤訊息
+        post_id: 所屬貼文 ID
+        username: 留言者帳號
+        original_text: 原始留言內容
+        creation_id: 已建立但發佈失敗的媒體容器 ID（重送時先查詢狀態再發佈同一個容器）
+    """
+    append_jsonl(DEAD_LETTER_FILE, {
+        "reply_to_id": reply_to_id,
+        "reply_text": reply_text,
+        "source": source,
+        "attempts": attempts,
+        "error": error,
+        "post_id": post_id,
+        "username": username,
+        "original_text": original_text,
+        "creation_id": creation_id,
+        "failed_at": datetime.now(timezone.utc).isoformat()
+    })
+
+def load_dead_letters():
+    """讀取所有待重送的回覆"""
+    return list(read_jsonl(DEAD_LETTER_FILE))
+
+def queued_reply_ids():
+    """待重送佇列中的留言 ID，這些留言交給 replay 處理，掃描、webhook 與提及都不再重新回覆"""
+    return {entry["reply_to_id"] for entry in load_dead_letters()}
+
+def save_dead_letters(entries):
+    """以剩餘的紀錄改寫待重送佇列"""
+    write_jsonl(DEAD_LETTER_FILE, entries)
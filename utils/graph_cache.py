@@ -0,0 +1,115 @@
+import os
+import time
+import threading
+from collections import OrderedDict, Counter
+from concurrent.futures import Future
+from dotenv import load_dotenv
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# 設為 0 可停用 Graph 讀取快取
+GRAPH_CACHE_ENABLED = os.getenv("GRAPH_CACHE_ENABLED", "1") == "1"
+# 最多快取幾個回應，超過時淘汰最久沒使用的
+GRAPH_CACHE_MAX_ENTRIES = int(os.getenv("GRAPH_CACHE_MAX_ENTRIES", "1024"))
+
+# 各類讀取的快取秒數，0 表示不快取
+CACHE_TTLS = {
+    "user_info": float(os.getenv("CACHE_TTL_USER_INFO", "3600")),
+    "posts": float(os.getenv("CACHE_TTL_POSTS", "60")),
+    "post": float(os.getenv("CACHE_TTL_POST", "300")),
+    "replies": float(os.getenv("CACHE_TTL_REPLIES", "30")),
+    # 對話串目前只由匯出逐頁讀取一次，快取只會佔用記憶體
+    "conversation": float(os.getenv("CACHE_TTL_CONVERSATION", "0")),
+    "mentions": float(os.getenv("CACHE_TTL_MENTIONS", "15")),
+    "user_replies": float(os.getenv("CACHE_TTL_USER_REPLIES", "30")),
+    "publishing_limit": float(os.getenv("PUBLISHING_LIMIT_TTL", "60")),
+}
+
+# 發佈貼文或回覆後內容會改變的讀取類型
+INVALIDATE_ON_PUBLISH = ("posts", "replies", "conversation", "user_replies", "publishing_limit")
+
+
+class TTLCache:
+    """
+    讀穿式快取
+
+    每個鍵的值在 TTL 內直接返回；同一個鍵同時有多個讀取時只會呼叫一次 loader，其餘等待同一個結果
+    （失敗也一起收到例外，且不會被快取）。返回的物件由所有呼叫端共用，不可修改。
+    """
+
+    def __init__(self, max_entries=GRAPH_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.counts = Counter()
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, kind, key, ttl, loader):
+        """
+        取得快取的值，過期或不存在時呼叫 loader 載入
+
+        Args:
+            kind: 讀取類型，用於依類型失效
+            key: 快取鍵
+            ttl: 快取秒數
+            loader: 載入函式
+        """
+        cache_key = (kind, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(cache_key)
+                self.counts["hits"] += 1
+                return entry[1]
+            future = self._in_flight.get(cache_key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[cache_key] = future
+                self.counts["misses"] += 1
+            else:
+                self.counts["coalesced"] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                # 載入期間若已被失效，新的請求可能已登記自己的載入，不可移除
+                if self._in_flight.get(cache_key) is future:
+                    del self._in_flight[cache_key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            # 載入期間若已被失效，結果只交給等待者，不寫入快取，也不移除新請求的載入
+            if self._in_flight.get(cache_key) is future:
+                del self._in_flight[cache_key]
+                self._entries[cache_key] = (time.monotonic() + ttl, value)
+                self._entries.move_to_end(cache_key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, *kinds):
+        """使指定類型（未指定時為全部）的快取失效"""
+        with self._lock:
+            for cache_key in list(self._entries):
+                if not kinds or cache_key[0] in kinds:
+                    del self._entries[cache_key]
+            for cache_key in list(self._in_flight):
+                if not kinds or cache_key[0] in kinds:
+                    del self._in_flight[cache_key]
+            self.counts["invalidations"] += 1
+
+    def stats(self):
+        """快取命中統計"""
+        with self._lock:
+            return {
+                "enabled": GRAPH_CACHE_ENABLED,
+                "entries": len(self._entries),
+                **{key: self.counts[key] for key in ("hits", "misses", "coalesced", "invalidations")},
+            }
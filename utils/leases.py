@@ -0,0 +1,251 @@
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from utils.local_store import data_path
+from utils.structured_log import get_logger
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# 租約後端：sqlite（同一台機器或共用檔案系統上的多個執行個體）或 memory（單一行程）
+LEASE_BACKEND = os.getenv("LEASE_BACKEND", "sqlite")
+LEASE_DB_PATH = os.getenv("LEASE_DB_PATH") or data_path("leases.sqlite3")
+# 貼文租約的有效秒數，持有期間每隔三分之一的時間自動續約
+POST_LEASE_TTL = float(os.getenv("POST_LEASE_TTL", "300"))
+# 留言租約的有效秒數，應涵蓋生成與發布（含重試）所需的時間
+COMMENT_LEASE_TTL = float(os.getenv("COMMENT_LEASE_TTL", "600"))
+# 取得租約時最多每隔幾秒清除一次已過期的租約（留言租約回覆後不釋放，不清除會一直累積）
+LEASE_PURGE_INTERVAL = float(os.getenv("LEASE_PURGE_INTERVAL", "60"))
+
+logger = get_logger("leases")
+
+
+class LeaseBackend:
+    """
+    租約後端介面
+
+    acquire 在租約不存在、已過期或本來就屬於 owner 時取得（或續約）並返回 True；
+    release 只釋放屬於 owner 的租約。已過期的租約在 acquire 時每隔 purge_interval 秒清除一次。
+    """
+
+    def __init__(self, purge_interval=LEASE_PURGE_INTERVAL):
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+
+    def acquire(self, key, owner, ttl):
+        raise NotImplementedError
+
+    def release(self, key, owner):
+        raise NotImplementedError
+
+    def purge_expired(self, now):
+        """刪除已過期的租約，返回刪除的數量"""
+        raise NotImplementedError
+
+    def _purge_due(self, now):
+        if now - self._last_purge < self.purge_interval:
+            return False
+        self._last_purge = now
+        return True
+
+
+class InMemoryLeaseBackend(LeaseBackend):
+    """單一行程內的租約，供本地執行或測試替代 SQLite"""
+
+    def __init__(self, purge_interval=LEASE_PURGE_INTERVAL):
+        super().__init__(purge_interval)
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, owner, ttl):
+        now = time.time()
+        with self._lock:
+            if self._purge_due(now):
+                self._purge_locked(now)
+            current = self._leases.get(key)
+            if current and current[0] != owner and current[1] > now:
+                return False
+            self._leases[key] = (owner, now + ttl)
+            return True
+
+    def release(self, key, owner):
+        with self._lock:
+            current = self._leases.get(key)
+            if current and current[0] == owner:
+                del self._leases[key]
+
+    def purge_expired(self, now):
+        with self._lock:
+            return self._purge_locked(now)
+
+    def _purge_locked(self, now):
+        expired = [key for key, (_, expires_at) in self._leases.items() if expires_at <= now]
+        for key in expired:
+            del self._leases[key]
+        return len(expired)
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """
+    以 SQLite 檔案保存租約
+
+    多個行程可共用同一個資料庫檔案；取得租約是單一條件式 UPSERT，由 SQLite 的寫入鎖保證同時只有一個持有者。
+    """
+
+    def __init__(self, path=LEASE_DB_PATH, purge_interval=LEASE_PURGE_INTERVAL):
+        super().__init__(purge_interval)
+        self.path = path
+        self._local = threading.local()
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        # sqlite3 連線不可跨執行緒共用，每個執行緒各自開一條
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, key, owner, ttl):
+        now = time.time()
+        if self._purge_due(now):
+            self.purge_expired(now)
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at <= ?",
+                (key, owner, now + ttl, now)
+            )
+            return cursor.rowcount > 0
+
+    def release(self, key, owner):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def purge_expired(self, now):
+        conn = self._connect()
+        with conn:
+            return conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,)).rowcount
+
+
+class HeldLease:
+    """
+    LeaseManager.hold 產生的租約狀態
+
+    布林值為是否取得租約；lost 在背景續約失敗（租約可能已被其他執行個體取得）時被設定，
+    呼叫端應在每項工作之間檢查，遺失後停止處理。
+    """
+
+    def __init__(self, key, acquired):
+        self.key = key
+        self.acquired = acquired
+        self.lost = threading.Event()
+
+    def __bool__(self):
+        return self.acquired
+
+    def is_lost(self):
+        return self.lost.is_set()
+
+
+class LeaseManager:
+    """
+    以租約協調多個執行個體的工作分配
+
+    每個執行個體有唯一的 owner；取得貼文或留言的租約後才處理，其他執行個體會略過。
+    """
+
+    def __init__(self, backend, owner=None):
+        self.backend = backend
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def try_acquire(self, key, ttl):
+        """嘗試取得租約；後端故障時視為取得失敗，寧可略過也不重複回覆"""
+        try:
+            return self.backend.acquire(key, self.owner, ttl)
+        except Exception:
+            logger.exception("取得租約失敗", extra={"key": key})
+            return False
+
+    def release(self, key):
+        """釋放自己持有的租約"""
+        try:
+            self.backend.release(key, self.owner)
+        except Exception:
+            logger.exception("釋放租約失敗", extra={"key": key})
+
+    @contextmanager
+    def hold(self, key, ttl):
+        """
+        在 with 區塊內持有租約，並在背景定期續約
+
+        Yields:
+            HeldLease：布林值為是否取得租約，未取得時呼叫端應略過這項工作；
+            續約失敗後 lost 會被設定，呼叫端應停止處理
+        """
+        if not self.try_acquire(key, ttl):
+            yield HeldLease(key, False)
+            return
+        lease = HeldLease(key, True)
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(ttl / 3):
+                if not self.try_acquire(key, ttl):
+                    logger.warning("續約失敗，租約可能已被其他執行個體取得", extra={"key": key})
+                    lease.lost.set()
+                    return
+
+        renewer = threading.Thread(target=renew, name=f"lease-{key}", daemon=True)
+        renewer.start()
+        try:
+            yield lease
+        finally:
+            stop.set()
+            self.release(key)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_lease_manager():
+    """整個行程共用的租約管理器，第一次使用時才建立後端"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            backend = SQLiteLeaseBackend() if LEASE_BACKEND == "sqlite" else InMemoryLeaseBackend()
+            _manager = LeaseManager(backend)
+        return _manager
+
+def hold_post(post_id):
+    """持有貼文租約的 context manager，讓多個執行個體依貼文分工"""
+    return get_lease_manager().hold(f"post:{post_id}", POST_LEASE_TTL)
+
+def claim_comment(comment_id):
+    """
+    取得留言（或提及）的租約
+
+    回覆成功後不主動釋放，讓租約自然過期，期間其他執行個體不會再回覆同一則留言。
+
+    Returns:
+        是否取得租約
+    """
+    return get_lease_manager().try_acquire(f"comment:{comment_id}", COMMENT_LEASE_TTL)
+
+def release_comment(comment_id):
+    """放棄留言租約（例如生成回覆失敗），讓下一輪或其他執行個體可以立即接手"""
+    get_lease_manager().release(f"comment:{comment_id}")
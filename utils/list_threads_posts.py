@@ -1,70 +1,115 @@
-import requests
-import os
 import json
-from dotenv import load_dotenv
-
-# 載入 .env 檔案中的環境變數
-load_dotenv()
-
-# 使用 .env 檔案中的 THREADS_ACCESS_TOKEN
-THREADS_ACCESS_TOKEN = os.getenv("THREADS_ACCESS_TOKEN")
+from utils.threads_client import threads_client, ThreadsAPIError
 
 def get_threads_user_id():
-    """獲取 Threads 使用者 ID"""
-    url = f"https://graph.threads.net/v1.0/me?fields=id&access_token={THREADS_ACCESS_TOKEN}"
-    response = requests.get(url)
-    if response.ok:
-        return response.json().get("id")
-    return None
+    """獲取 Threads 使用者 ID（成功後快取）"""
+    try:
+        return threads_client.user_id()
+    except ThreadsAPIError:
+        return None
 
-def get_user_threads_posts(limit=25):
+def get_user_threads_posts(limit=25, after=None, since=None):
     """
     獲取用戶的 Threads 貼文列表
     
     Args:
         limit: 獲取的貼文數量上限，預設為 25
+        after: 上一頁回應中 paging.cursors.after 的游標
+        since: 只取此 Unix 時間戳之後的貼文
     
     Returns:
-        貼文列表或失敗時返回 None
+        貼文列表或失敗時返回包含 error 的字典
+    """
+    try:
+        return threads_client.posts(limit=limit, after=after, since=since)
+    except ThreadsAPIError as e:
+        return {"error": f"獲取貼文列表失敗: {e}"}
+
+def get_thread_post_details(post_id):
     """
-    threads_user_id = get_threads_user_id()
-    if not threads_user_id:
-        return {"error": "找不到 Threads 帳號"}
+    獲取特定 Threads 貼文的詳細資訊
+    
+    Args:
+        post_id: 貼文 ID
     
-    url = f"https://graph.threads.net/v1.0/{threads_user_id}/threads"
-    params = {
-        "access_token": THREADS_ACCESS_TOKEN,
-        "limit": limit,
-        "fields": "id,text,timestamp,media_type"
-    }
+    Returns:
+        貼文詳細資訊或失敗時返回包含 error 的字典
+    """
+    try:
+        return threads_client.post_details(post_id)
+    except ThreadsAPIError as e:
+        return {"error": f"獲取貼文詳細資訊失敗: {e}"}
+
+def get_post_replies(post_id, limit=50, after=None):
+    """
+    獲取指定貼文下的第一層回覆
     
-    response = requests.get(url, params=params)
-    if not response.ok:
-        return {"error": f"獲取貼文列表失敗: {response.text}"}
+    Args:
+        post_id: 貼文 ID
+        limit: 最多獲取幾條回覆
+        after: 上一頁回應中 paging.cursors.after 的游標
     
-    return response.json()
+    Returns:
+        回覆列表或失敗時返回包含 error 的字典
+    """
+    try:
+        return threads_client.replies(post_id, limit=limit, after=after)
+    except ThreadsAPIError as e:
+        return {"error": f"獲取回覆列表失敗: {e}"}
 
-def get_thread_post_details(post_id):
+def get_post_conversation_page(post_id, after=None, limit=100):
     """
-    獲取特定 Threads 貼文的詳細資訊
+    獲取一頁貼文下的所有層級回覆（包含回覆的回覆）
     
     Args:
         post_id: 貼文 ID
+        after: 上一頁回應中 paging.cursors.after 的游標
+        limit: 每頁數量上限
     
     Returns:
-        貼文詳細資訊或失敗時返回 None
+        回覆列表（含 paging）或失敗時返回包含 error 的字典
+    """
+    try:
+        return threads_client.conversation(post_id, limit=limit, after=after)
+    except ThreadsAPIError as e:
+        return {"error": f"獲取回覆列表失敗: {e}"}
+
+def get_threads_mentions_page(after=None, since=None, limit=50):
     """
-    url = f"https://graph.threads.net/v1.0/{post_id}"
-    params = {
-        "access_token": THREADS_ACCESS_TOKEN,
-        "fields": "id,text,timestamp,media_type"
-    }
+    獲取一頁提及我的貼文
+    
+    Args:
+        after: 上一頁回應中 paging.cursors.after 的游標
+        since: 只取此 Unix 時間戳之後的提及
+        limit: 每頁數量上限
     
-    response = requests.get(url, params=params)
-    if not response.ok:
-        return {"error": f"獲取貼文詳細資訊失敗: {response.text}"}
+    Returns:
+        提及列表（含 paging）或失敗時返回包含 error 的字典
+    """
+    try:
+        return threads_client.mentions(limit=limit, after=after, since=since)
+    except ThreadsAPIError as e:
+        return {"error": f"獲取提及失敗: {e}"}
+
+def iter_pages(fetch_page, start_after=None, **kwargs):
+    """
+    依 paging.cursors.after 逐頁取出資料
+
+    Args:
+        fetch_page: 接受 after 參數並返回一頁結果的函式
+        start_after: 從此游標開始（續傳時使用）
+        **kwargs: 傳給 fetch_page 的其他參數
+
+    Yields:
+        (本頁使用的游標, 本頁資料)；取得某頁失敗時拋出 RuntimeError
+    """
+    def fetch(after=None, **kwargs):
+        page = fetch_page(after=after, **kwargs)
+        if "error" in page:
+            raise RuntimeError(page["error"])
+        return page
     
-    return response.json()
+    yield from threads_client.paginate(fetch, start_after=start_after, **kwargs)
 
 if __name__ == "__main__":
     # 測試獲取用戶貼文
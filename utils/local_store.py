@@ -0,0 +1,67 @@
+import os
+import json
+import threading
+from dotenv import load_dotenv
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# 本地狀態檔（待重送佇列、紀錄檔等）的存放目錄
+DATA_DIR = os.getenv("BOT_DATA_DIR", "data")
+
+_lock = threading.Lock()
+
+def data_path(*parts):
+    """取得資料目錄下的檔案路徑"""
+    return os.path.join(DATA_DIR, *parts)
+
+def _ensure_parent(path):
+    # 只在實際寫入時才建立目錄，避免在唯讀環境 (如 Vercel) 匯入模組就失敗
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+
+def append_jsonl(path, record):
+    """在 JSONL 檔案末尾追加一筆紀錄"""
+    line = json.dumps(record, ensure_ascii=False)
+    with _lock:
+        _ensure_parent(path)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+def read_jsonl(path):
+    """逐筆讀取 JSONL 檔案；檔案不存在時不產生任何紀錄"""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def write_jsonl(path, records):
+    """以暫存檔加上原子替換的方式整個改寫 JSONL 檔案"""
+    tmp_path = f"{path}.tmp"
+    with _lock:
+        _ensure_parent(path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+
+
+def read_json(path, default=None):
+    """讀取 JSON 狀態檔；檔案不存在時返回 default"""
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def write_json(path, data):
+    """以暫存檔加上原子替換的方式寫入 JSON 狀態檔"""
+    tmp_path = f"{path}.tmp"
+    with _lock:
+        _ensure_parent(path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
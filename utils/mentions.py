@@ -0,0 +1,180 @@
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from utils.list_threads_posts import get_threads_user_id, get_threads_mentions_page, iter_pages
+from utils.openai_client import generate_classical_reply
+from utils.threads_api import create_reply_with_retries
+from utils.admission import ANSWERED, FAILED, IGNORED
+from utils.dead_letter import record_failed_reply, queued_reply_ids
+from utils.reply_ledger import is_handled, mark_handled
+from utils.leases import claim_comment, release_comment
+from utils.local_store import data_path, read_json, write_json
+from utils.rate_limit import TokenBucket
+from utils.structured_log import get_logger
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# 提及處理的同時回覆數，與 webhook 的准入控制分開計算
+MENTIONS_MAX_IN_FLIGHT = int(os.getenv("MENTIONS_MAX_IN_FLIGHT", "2"))
+# 提及回覆的速率預算：每分鐘回覆數與突發量
+MENTIONS_REPLIES_PER_MINUTE = float(os.getenv("MENTIONS_REPLIES_PER_MINUTE", "6"))
+MENTIONS_REPLY_BURST = int(os.getenv("MENTIONS_REPLY_BURST", "2"))
+# 每頁提及數
+MENTIONS_PAGE_SIZE = int(os.getenv("MENTIONS_PAGE_SIZE", "50"))
+# 往回多看幾秒，避免遺漏時間戳與水位相近但較晚出現的提及（重複的由回覆紀錄排除）
+MENTIONS_OVERLAP_SECONDS = int(os.getenv("MENTIONS_OVERLAP_SECONDS", "300"))
+
+# 上次處理到的最新提及時間
+MENTIONS_STATE_FILE = data_path("mentions_state.json")
+
+logger = get_logger("mentions")
+
+def _mention_epoch(mention):
+    try:
+        return datetime.fromisoformat(mention.get("timestamp", "").replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+def iter_mentions(since=None, page_size=MENTIONS_PAGE_SIZE):
+    """
+    依分頁逐筆取出提及
+
+    Args:
+        since: 只取此 Unix 時間戳之後的提及
+        page_size: 每頁數量
+
+    Yields:
+        提及資訊；取得某頁失敗時拋出 RuntimeError
+    """
+    for _, mentions in iter_pages(get_threads_mentions_page, since=since, limit=page_size):
+        yield from mentions
+
+def reply_to_mention(mention, my_user_id, bucket, dry_run=False):
+    """
+    為一則提及生成古風回覆並發布
+
+    Args:
+        mention: 提及資訊
+        my_user_id: 我的用戶 ID
+        bucket: 提及回覆共用的權杖桶
+        dry_run: 是否只模擬執行，不實際發送回覆
+
+    Returns:
+        處理狀態
+    """
+    if not dry_run and not claim_comment(mention["id"]):
+        return IGNORED
+    bucket.acquire()
+    reply_text = generate_classical_reply(mention.get("text", ""))
+    if dry_run:
+        print(f"🔄 模擬回覆 @{mention.get('username', '未知用戶')}: {reply_text}")
+        return ANSWERED
+
+    result, attempts, error, creation_id = create_reply_with_retries(
+        threads_user_id=my_user_id,
+        reply_to_id=mention["id"],
+        text=reply_text
+    )
+    if not result:
+        record_failed_reply(
+            mention["id"], reply_text, "mentions", attempts, error,
+            username=mention.get("username"), original_text=mention.get("text"), creation_id=creation_id
+        )
+        # 已存入待重送佇列，其他流程不會再處理，釋放租約讓 replay 可以立即重送
+        release_comment(mention["id"])
+        logger.warning("提及回覆失敗", extra={"mention_id": mention["id"], "attempts": attempts, "error": error})
+        return FAILED
+    mark_handled(mention["id"], "mentions", result.get("id"))
+    logger.info("提及回覆完成", extra={"mention_id": mention["id"], "attempts": attempts})
+    return ANSWERED
+
+def _safe_reply(mention, my_user_id, bucket, dry_run):
+    """
+    Returns:
+        (處理狀態, 是否為未存入待重送佇列的失敗)；後者需要保留水位，下次重新處理
+    """
+    try:
+        return reply_to_mention(mention, my_user_id, bucket, dry_run), False
+    except Exception:
+        # 例如生成回覆失敗：沒有可重送的回覆文字，釋放租約讓下次執行重新處理
+        logger.exception("處理提及時發生錯誤", extra={"mention_id": mention.get("id")})
+        if not dry_run:
+            release_comment(mention["id"])
+        return FAILED, True
+
+def process_mentions(limit=None, days=None, dry_run=False, max_in_flight=MENTIONS_MAX_IN_FLIGHT):
+    """
+    回覆上次水位之後的新提及
+
+    依分頁取出水位之後的提及，排除回覆紀錄中已處理的，再以獨立的執行緒數與速率預算
+    生成並發布回覆。處理完後推進水位；發布失敗的提及存入待重送佇列，
+    其他失敗（例如生成回覆失敗）則讓水位停在最早的失敗提及，下次執行重新處理。
+
+    待處理的提及超過 limit 時，依時間由舊到新只處理最早的 limit 則，水位推進到其中最新的一則，
+    較新的提及留到下次執行。
+
+    Args:
+        limit: 本次最多回覆幾則 (None 表示全部)
+        days: 尚無水位時（第一次執行）只處理最近幾天內的提及
+        dry_run: 是否只模擬執行，不實際發送回覆
+        max_in_flight: 同時處理的提及數
+
+    Returns:
+        各狀態的提及數，失敗時返回包含 error 的字典
+    """
+    my_user_id = get_threads_user_id()
+    if not my_user_id:
+        return {"error": "找不到 Threads 帳號"}
+
+    state = read_json(MENTIONS_STATE_FILE, {})
+    watermark = state.get("watermark")
+    if watermark:
+        since = watermark - MENTIONS_OVERLAP_SECONDS
+    elif days is not None:
+        since = time.time() - days * 86400
+    else:
+        since = None
+
+    # 已在待重送佇列中的提及交給 replay 處理，不重新生成
+    queued = queued_reply_ids()
+    counts = Counter()
+    pending = []
+    newest = watermark
+    try:
+        for mention in iter_mentions(since=since):
+            counts["fetched"] += 1
+            epoch = _mention_epoch(mention)
+            if epoch and (newest is None or epoch > newest):
+                newest = epoch
+            if is_handled(mention["id"]) or mention["id"] in queued:
+                counts[IGNORED] += 1
+                continue
+            pending.append(mention)
+    except RuntimeError as e:
+        return {"error": str(e)}
+
+    if limit is not None and len(pending) > limit:
+        # 先處理最早的提及，水位只推進到已處理的最新一則，較新的留到下次；無法判斷時間時不推進
+        pending.sort(key=lambda mention: _mention_epoch(mention) or 0)
+        counts["deferred"] = len(pending) - limit
+        pending = pending[:limit]
+        epochs = [_mention_epoch(mention) for mention in pending]
+        newest = max(epochs) if all(epochs) else None
+
+    bucket = TokenBucket(MENTIONS_REPLIES_PER_MINUTE / 60, MENTIONS_REPLY_BURST)
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="mentions") as executor:
+        outcomes = executor.map(lambda mention: _safe_reply(mention, my_user_id, bucket, dry_run), pending)
+        for mention, (status, needs_retry) in zip(pending, outcomes):
+            counts[status] += 1
+            if needs_retry and newest is not None:
+                # 水位不可越過未存入待重送佇列的失敗提及；無法判斷時間時整批都不推進
+                epoch = _mention_epoch(mention)
+                newest = min(newest, epoch) if epoch else None
+
+    if not dry_run and newest:
+        write_json(MENTIONS_STATE_FILE, {"watermark": newest})
+    return dict(counts)
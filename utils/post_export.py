@@ -0,0 +1,268 @@
+import os
+import glob
+import json
+from datetime import datetime
+from utils.list_threads_posts import get_threads_user_id, get_user_threads_posts, get_post_conversation_page, iter_pages
+from utils.local_store import read_json, write_json
+
+# pyarrow 為選用套件，只有輸出 Parquet 時才需要
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = ("jsonl", "parquet")
+
+# Parquet 分段檔的筆數，以及寫入前在記憶體中累積的筆數
+PARQUET_PART_ROWS = 50000
+PARQUET_BATCH_ROWS = 1000
+
+# 匯出紀錄的欄位，貼文與回覆共用
+EXPORT_FIELDS = ("kind", "id", "root_post_id", "parent_id", "user_id", "username", "timestamp", "text", "is_mine")
+
+def _timestamp_epoch(timestamp_str):
+    try:
+        return datetime.fromisoformat(timestamp_str.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+def post_record(post, my_user_id):
+    """將貼文轉為匯出紀錄"""
+    return {
+        "kind": "post",
+        "id": post.get("id"),
+        "root_post_id": post.get("id"),
+        "parent_id": None,
+        "user_id": my_user_id,
+        "username": post.get("username"),
+        "timestamp": post.get("timestamp"),
+        "text": post.get("text"),
+        "is_mine": True,
+    }
+
+def reply_record(reply, post_id, my_user_id):
+    """將回覆轉為匯出紀錄"""
+    user_info = reply.get("from") or {}
+    user_id = user_info.get("id")
+    return {
+        "kind": "reply",
+        "id": reply.get("id"),
+        "root_post_id": (reply.get("root_post") or {}).get("id", post_id),
+        "parent_id": (reply.get("replied_to") or {}).get("id", post_id),
+        "user_id": user_id,
+        "username": reply.get("username") or user_info.get("username"),
+        "timestamp": reply.get("timestamp"),
+        "text": reply.get("text"),
+        "is_mine": user_id == my_user_id,
+    }
+
+class JsonlExportWriter:
+    """
+    逐筆寫入 JSONL 檔案
+
+    檢查點記錄已確認寫入的位元組數，續傳時先截斷到該位置，中斷前寫了一半的貼文不會重複。
+    每次 checkpoint 後內容都已寫入檔案，因此 pending 永遠為 False。
+    """
+
+    pending = False
+
+    def __init__(self, path, state=None):
+        self.path = path
+        if state is not None and os.path.exists(path):
+            with open(path, "r+b") as f:
+                f.truncate(state.get("offset", 0))
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def checkpoint(self):
+        self._file.flush()
+        return {"offset": self._file.tell()}
+
+    def close(self):
+        self._file.close()
+        return {"offset": os.path.getsize(self.path)}
+
+class ParquetExportWriter:
+    """
+    分批寫入 Parquet 分段檔案
+
+    輸出為一個目錄，每累積 part_rows 筆就關閉目前的分段檔；記憶體中最多只保留 batch_rows 筆。
+    檢查點只記錄已關閉的分段檔，續傳時刪除未完成的分段，從上一個檢查點重新匯出。
+    pending 表示還有紀錄在未關閉的分段中，此時不可保存匯出進度，否則續傳會漏掉這些紀錄。
+    """
+
+    def __init__(self, path, state=None, batch_rows=None, part_rows=None):
+        if pa is None:
+            raise RuntimeError("輸出 Parquet 需要安裝 pyarrow (pip install pyarrow)")
+        self.path = path
+        self.batch_rows = batch_rows or PARQUET_BATCH_ROWS
+        self.part_rows = part_rows or PARQUET_PART_ROWS
+        self.schema = pa.schema([
+            ("kind", pa.string()),
+            ("id", pa.string()),
+            ("root_post_id", pa.string()),
+            ("parent_id", pa.string()),
+            ("user_id", pa.string()),
+            ("username", pa.string()),
+            ("timestamp", pa.string()),
+            ("text", pa.string()),
+            ("is_mine", pa.bool_()),
+        ])
+        os.makedirs(path, exist_ok=True)
+        self.parts = list((state or {}).get("parts", []))
+        existing = sorted(glob.glob(os.path.join(path, "part-*.parquet")))
+        if state is not None:
+            for part in existing:
+                if os.path.basename(part) not in self.parts:
+                    os.remove(part)
+        else:
+            self.parts = [os.path.basename(part) for part in existing]
+        self._buffer = []
+        self._writer = None
+        self._part_name = None
+        self._part_count = 0
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        if self._writer is None:
+            self._part_name = f"part-{len(self.parts):05d}.parquet"
+            self._writer = pq.ParquetWriter(os.path.join(self.path, self._part_name), self.schema)
+        columns = {field: [record[field] for record in self._buffer] for field in EXPORT_FIELDS}
+        self._writer.write_table(pa.table(columns, schema=self.schema))
+        self._part_count += len(self._buffer)
+        self._buffer = []
+
+    def _close_part(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+            self.parts.append(self._part_name)
+            self._writer = None
+            self._part_count = 0
+
+    @property
+    def pending(self):
+        return self._writer is not None or bool(self._buffer)
+
+    def write(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_rows:
+            self._flush()
+
+    def checkpoint(self):
+        if self._part_count + len(self._buffer) >= self.part_rows:
+            self._close_part()
+        return {"parts": list(self.parts)}
+
+    def close(self):
+        self._close_part()
+        return {"parts": list(self.parts)}
+
+def checkpoint_path(output):
+    """匯出檢查點的檔案路徑"""
+    return f"{output.rstrip(os.sep)}.checkpoint.json"
+
+def export_posts(output, export_format="jsonl", resume=False, append=False, page_size=25, progress=None):
+    """
+    串流匯出所有貼文與其下各層回覆
+
+    以分頁逐篇取得貼文與對話串，每筆紀錄直接寫入檔案。每處理完一篇貼文就更新檢查點，
+    但只在紀錄都已寫入檔案時才保存（Parquet 為關閉分段檔時），續傳不會漏掉任何紀錄。
+
+    Args:
+        output: 輸出檔案 (jsonl) 或目錄 (parquet)
+        export_format: jsonl 或 parquet
+        resume: 從未完成匯出的檢查點繼續
+        append: 在已完成的匯出後追加上次匯出之後的新貼文；已匯出貼文下後來新增的回覆不會補上
+        page_size: 每頁貼文數
+        progress: 每處理完一篇貼文時呼叫，參數為 (貼文 ID, 已匯出的紀錄數)
+
+    Returns:
+        匯出統計或失敗時返回包含 error 的字典
+    """
+    if export_format not in EXPORT_FORMATS:
+        return {"error": f"不支援的格式: {export_format}"}
+
+    my_user_id = get_threads_user_id()
+    if not my_user_id:
+        return {"error": "找不到 Threads 帳號"}
+
+    ckpt_file = checkpoint_path(output)
+    checkpoint = read_json(ckpt_file)
+    since = None
+    if resume or append:
+        if not checkpoint:
+            return {"error": "找不到匯出檢查點"}
+        if checkpoint.get("format") != export_format:
+            return {"error": f"檢查點的格式為 {checkpoint.get('format')}"}
+        if resume and checkpoint.get("complete"):
+            return {"error": "上次匯出已完成，請改用追加模式"}
+        if append and not checkpoint.get("complete"):
+            return {"error": "上次匯出尚未完成，請先續傳"}
+    elif os.path.exists(output) or checkpoint:
+        return {"error": f"{output} 已存在，請使用續傳或追加模式，或改用其他路徑"}
+
+    if append:
+        # 追加模式：只取上次匯出中最新貼文之後的貼文（since 包含當下那一秒，因此加一）
+        since = checkpoint["newest_epoch"] + 1 if checkpoint.get("newest_epoch") else None
+        checkpoint = {"format": export_format, "writer": checkpoint["writer"], "newest_epoch": checkpoint.get("newest_epoch"),
+                      "since": since, "page_after": None, "done_ids": [], "records": checkpoint.get("records", 0)}
+    elif resume:
+        since = checkpoint.get("since")
+    else:
+        checkpoint = {"format": export_format, "writer": None, "newest_epoch": None,
+                      "since": None, "page_after": None, "done_ids": [], "records": 0}
+
+    writer_cls = JsonlExportWriter if export_format == "jsonl" else ParquetExportWriter
+    try:
+        writer = writer_cls(output, checkpoint["writer"])
+    except RuntimeError as e:
+        return {"error": str(e)}
+    # 先寫入檢查點，第一篇貼文完成前中斷也能續傳
+    checkpoint["complete"] = False
+    checkpoint["writer"] = writer.checkpoint()
+    write_json(ckpt_file, checkpoint)
+
+    exported_posts = 0
+    start_after = checkpoint["page_after"]
+    done_ids = set(checkpoint["done_ids"])
+    try:
+        for page_after, posts in iter_pages(get_user_threads_posts, limit=page_size, since=since, start_after=start_after):
+            if page_after != checkpoint["page_after"]:
+                checkpoint["page_after"] = page_after
+                done_ids = set()
+            for post in posts:
+                if post.get("id") in done_ids:
+                    continue
+                writer.write(post_record(post, my_user_id))
+                records = 1
+                for _, replies in iter_pages(get_post_conversation_page, post_id=post["id"]):
+                    for reply in replies:
+                        writer.write(reply_record(reply, post["id"], my_user_id))
+                        records += 1
+
+                epoch = _timestamp_epoch(post.get("timestamp"))
+                if epoch and (checkpoint["newest_epoch"] is None or epoch > checkpoint["newest_epoch"]):
+                    checkpoint["newest_epoch"] = epoch
+                done_ids.add(post["id"])
+                checkpoint["done_ids"] = sorted(done_ids)
+                checkpoint["records"] += records
+                checkpoint["writer"] = writer.checkpoint()
+                if not writer.pending:
+                    write_json(ckpt_file, checkpoint)
+                exported_posts += 1
+                if progress:
+                    progress(post["id"], checkpoint["records"])
+    except RuntimeError as e:
+        writer.close()
+        return {"error": str(e), "posts": exported_posts, "records": checkpoint["records"]}
+
+    checkpoint["writer"] = writer.close()
+    checkpoint.update({"complete": True, "page_after": None, "done_ids": []})
+    write_json(ckpt_file, checkpoint)
+    return {"posts": exported_posts, "records": checkpoint["records"]}
@@ -0,0 +1,421 @@
+import os
+import csv
+import io
+import asyncio
+import json
+import time
+import sqlite3
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime
+from dotenv import load_dotenv
+from utils.local_store import data_path
+from utils.threads_client import threads_client, ThreadsAPIError
+from utils.conversation_context import remember_thread
+from utils.structured_log import get_logger
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# 設為 0 不啟動背景排程（例如 serverless 部署或壓測時）
+POST_SCHEDULER_ENABLED = os.getenv("POST_SCHEDULER_ENABLED", "1") == "1"
+POST_QUEUE_DB_PATH = os.getenv("POST_QUEUE_DB_PATH") or data_path("post_queue.sqlite3")
+# 排程器檢查佇列的間隔秒數
+POST_SCHEDULER_INTERVAL = float(os.getenv("POST_SCHEDULER_INTERVAL", "5"))
+# 在預定時間前幾秒建立媒體容器（容器 24 小時內有效）
+POST_PREPARE_AHEAD = float(os.getenv("POST_PREPARE_AHEAD", "600"))
+# 容器建立後至少等待幾秒才發佈，讓伺服器處理媒體
+POST_CONTAINER_SETTLE = float(os.getenv("POST_CONTAINER_SETTLE", "5"))
+# 建立容器或發佈失敗幾次後放棄
+POST_MAX_ATTEMPTS = int(os.getenv("POST_MAX_ATTEMPTS", "3"))
+# 一次最多排程幾篇貼文
+POST_BULK_LIMIT = int(os.getenv("POST_BULK_LIMIT", "500"))
+# 停在 publishing 超過幾秒（例如發佈途中行程中斷）就查詢容器狀態確認是否已發佈
+POST_PUBLISHING_TIMEOUT = float(os.getenv("POST_PUBLISHING_TIMEOUT", "300"))
+# 容器建立後超過幾秒仍未發佈就重新建立（容器 24 小時後失效）
+POST_CONTAINER_MAX_AGE = float(os.getenv("POST_CONTAINER_MAX_AGE", str(23 * 3600)))
+
+# 貼文狀態：pending 等待建立容器、prepared 容器已建立、publishing 發佈中、
+# published 已發佈、failed 放棄、cancelled 已取消
+PENDING, PREPARED, PUBLISHING, PUBLISHED, FAILED, CANCELLED = (
+    "pending", "prepared", "publishing", "published", "failed", "cancelled"
+)
+
+logger = get_logger("post_scheduler")
+
+
+def parse_publish_at(value, now=None):
+    """
+    將預定發佈時間轉為 Unix 秒數
+
+    Args:
+        value: ISO 8601 字串（未帶時區時視為伺服器本地時間）、Unix 秒數，或 None 表示立即發佈
+
+    Returns:
+        Unix 秒數；格式錯誤時拋出 ValueError
+    """
+    now = time.time() if now is None else now
+    if value is None or value == "":
+        return now
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return parsed.timestamp()
+
+def validate_post(post):
+    """
+    檢查一篇貼文的內容，規則與 /api/threads 相同
+
+    Returns:
+        錯誤訊息，沒有問題時返回 None
+    """
+    if not isinstance(post, dict):
+        return "貼文格式錯誤"
+    media_type = post.get("media_type") or "TEXT"
+    if media_type not in ("TEXT", "IMAGE", "VIDEO"):
+        return f"不支援的媒體類型: {media_type}"
+    if media_type == "TEXT" and not post.get("text"):
+        return "文字貼文需要提供文字內容"
+    if media_type == "IMAGE" and not post.get("image_url"):
+        return "圖片貼文需要提供圖片 URL"
+    if media_type == "VIDEO" and not post.get("video_url"):
+        return "影片貼文需要提供影片 URL"
+    try:
+        parse_publish_at(post.get("publish_at"))
+    except (TypeError, ValueError):
+        return f"無法解析預定發佈時間: {post.get('publish_at')}"
+    return None
+
+def parse_post_file(filename, content):
+    """
+    解析上傳的貼文檔案
+
+    支援 JSON 陣列（或含 posts 欄位的物件）、JSONL，以及有標題列的 CSV
+    （欄位：text, publish_at, media_type, link_attachment, image_url, video_url）。
+
+    Returns:
+        貼文列表；格式錯誤時拋出 ValueError
+    """
+    text = content.decode("utf-8-sig") if isinstance(content, bytes) else content
+    if (filename or "").lower().endswith(".csv"):
+        return [{key: value for key, value in row.items() if value} for row in csv.DictReader(io.StringIO(text))]
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # 不是單一 JSON 文件時視為 JSONL
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        return data["posts"] if "posts" in data else [data]
+    return data
+
+
+class PostQueue:
+    """
+    以 SQLite 保存的排程貼文佇列
+
+    狀態轉換都是帶條件的 UPDATE，多個執行個體共用同一個資料庫檔案時，同一篇貼文只會被發佈一次。
+    """
+
+    def __init__(self, path=POST_QUEUE_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS scheduled_posts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    text TEXT,
+                    media_type TEXT NOT NULL,
+                    link_attachment TEXT,
+                    image_url TEXT,
+                    video_url TEXT,
+                    publish_at REAL NOT NULL,
+                    status TEXT NOT NULL,
+                    container_id TEXT,
+                    container_created_at REAL,
+                    post_id TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS scheduled_posts_due ON scheduled_posts (status, publish_at)")
+
+    def _connect(self):
+        # sqlite3 連線不可跨執行緒共用，每個執行緒各自開一條
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def add_many(self, posts):
+        """
+        加入多篇貼文，呼叫前應已通過 validate_post
+
+        Returns:
+            新貼文的 ID 列表
+        """
+        now = time.time()
+        conn = self._connect()
+        ids = []
+        with conn:
+            for post in posts:
+                cursor = conn.execute(
+                    "INSERT INTO scheduled_posts (text, media_type, link_attachment, image_url, video_url, publish_at, status, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (post.get("text"), post.get("media_type") or "TEXT", post.get("link_attachment"), post.get("image_url"),
+                     post.get("video_url"), parse_publish_at(post.get("publish_at"), now), PENDING, now, now)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def list(self, status=None, limit=100):
+        """依預定時間列出貼文"""
+        query = "SELECT * FROM scheduled_posts"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY publish_at, id LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._connect().execute(query, params)]
+
+    def counts(self):
+        """各狀態的貼文數"""
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM scheduled_posts GROUP BY status")
+        return {status: count for status, count in rows}
+
+    def cancel(self, scheduled_id):
+        """取消尚未發佈的貼文，成功返回 True"""
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE scheduled_posts SET status = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), scheduled_id, PENDING, PREPARED)
+            )
+        return cursor.rowcount > 0
+
+    def due_for_container(self, now, ahead=POST_PREPARE_AHEAD):
+        """預定時間在 ahead 秒內、尚未建立容器的貼文"""
+        return [dict(row) for row in self._connect().execute(
+            "SELECT * FROM scheduled_posts WHERE status = ? AND publish_at <= ? ORDER BY publish_at, id",
+            (PENDING, now + ahead)
+        )]
+
+    def due_for_publish(self, now, settle=POST_CONTAINER_SETTLE):
+        """已到預定時間、容器也已處理完成的貼文"""
+        return [dict(row) for row in self._connect().execute(
+            "SELECT * FROM scheduled_posts WHERE status = ? AND publish_at <= ? AND container_created_at <= ? ORDER BY publish_at, id",
+            (PREPARED, now, now - settle)
+        )]
+
+    def stale(self, status, before, column="updated_at"):
+        """處於 status 且 column 早於 before 的貼文（用來找出卡住的貼文）"""
+        return [dict(row) for row in self._connect().execute(
+            f"SELECT * FROM scheduled_posts WHERE status = ? AND {column} < ? ORDER BY publish_at, id",
+            (status, before)
+        )]
+
+    def transition(self, scheduled_id, from_status, to_status, **fields):
+        """
+        只有貼文仍處於 from_status 時才改為 to_status 並更新欄位
+
+        Returns:
+            是否成功轉換（其他執行個體已處理時為 False）
+        """
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                f"UPDATE scheduled_posts SET status = ?, updated_at = ?{', ' + assignments if assignments else ''} WHERE id = ? AND status = ?",
+                (to_status, time.time(), *fields.values(), scheduled_id, from_status)
+            )
+        return cursor.rowcount > 0
+
+
+class PostScheduler:
+    """
+    在背景執行緒中定期處理排程貼文
+
+    預定時間前 POST_PREPARE_AHEAD 秒建立媒體容器，到時間後再發佈，因此發佈時不需要等待
+    容器處理。失敗時重試，達到 POST_MAX_ATTEMPTS 次後標記為 failed。
+
+    發佈逾時等結果不明的錯誤不會直接重試：貼文留在 publishing，查詢容器狀態確認後才決定
+    標記為已發佈或重新發佈，避免同一篇貼文發佈兩次。每一輪（包含啟動後的第一輪）都會處理
+    卡在 publishing 或容器已過期的貼文。
+    """
+
+    def __init__(self, queue, client=threads_client, interval=POST_SCHEDULER_INTERVAL):
+        self.queue = queue
+        self.client = client
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="post-scheduler", daemon=True)
+        self._thread.start()
+        logger.info("排程發文已啟動", extra={"interval": self.interval})
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("排程發文處理失敗")
+            self._stop.wait(self.interval)
+
+    def run_once(self, now=None):
+        """
+        處理一輪到期的貼文
+
+        Returns:
+            本輪建立的容器數與發佈的貼文數
+        """
+        now = time.time() if now is None else now
+        self.recover_stale(now)
+        prepared = sum(1 for post in self.queue.due_for_container(now) if not self._stop.is_set() and self._prepare(post))
+        published = sum(1 for post in self.queue.due_for_publish(now) if not self._stop.is_set() and self._publish(post))
+        return {"prepared": prepared, "published": published}
+
+    def recover_stale(self, now):
+        """
+        處理卡住的貼文
+
+        - publishing 超過 POST_PUBLISHING_TIMEOUT 秒：查詢容器狀態確認是否已發佈
+        - prepared 的容器超過 POST_CONTAINER_MAX_AGE 秒：容器即將失效，退回 pending 重新建立
+        """
+        for post in self.queue.stale(PUBLISHING, now - POST_PUBLISHING_TIMEOUT):
+            self._resolve_publishing(post)
+        for post in self.queue.stale(PREPARED, now - POST_CONTAINER_MAX_AGE, column="container_created_at"):
+            self.queue.transition(post["id"], PREPARED, PENDING, container_id=None, container_created_at=None)
+            logger.info("容器已過期，重新建立", extra={"scheduled_id": post["id"]})
+
+    def _fail(self, post, from_status, error):
+        """確定沒有發佈的失敗：退回 pending 重新建立容器，達到次數上限時標記為 failed"""
+        attempts = post["attempts"] + 1
+        status = FAILED if attempts >= POST_MAX_ATTEMPTS else PENDING
+        self.queue.transition(post["id"], from_status, status, attempts=attempts, error=error, container_id=None, container_created_at=None)
+        logger.warning("排程貼文處理失敗", extra={"scheduled_id": post["id"], "attempts": attempts, "error": error, "status": status})
+
+    def _resolve_publishing(self, post, error=None):
+        """
+        發佈結果不明時查詢容器狀態
+
+        已發佈就標記為 published；確定未發佈時依容器狀態重新發佈同一個容器或重新建立容器。
+        無法查詢時留在 publishing，之後由 recover_stale 再次確認；查詢失敗達 POST_MAX_ATTEMPTS 次
+        後標記為 failed，需要人工確認，不會自動重新發佈。
+
+        Returns:
+            是否已發佈
+        """
+        try:
+            state = self.client.container_status(post["container_id"]).get("status")
+        except ThreadsAPIError as e:
+            attempts = post["attempts"] + 1
+            status = FAILED if attempts >= POST_MAX_ATTEMPTS else PUBLISHING
+            self.queue.transition(post["id"], PUBLISHING, status, attempts=attempts, error=f"無法確認是否已發佈: {error or e}")
+            logger.warning("無法確認排程貼文是否已發佈", extra={"scheduled_id": post["id"], "attempts": attempts, "error": str(e), "status": status})
+            return False
+        if state == "PUBLISHED":
+            # 狀態查詢只有容器 ID，無法得知發佈後的貼文 ID
+            self.queue.transition(post["id"], PUBLISHING, PUBLISHED, error=None)
+            logger.info("排程貼文已在先前的嘗試中發佈", extra={"scheduled_id": post["id"], "container_id": post["container_id"]})
+            return True
+        error = error or f"容器狀態為 {state}"
+        if state in ("FINISHED", "IN_PROGRESS"):
+            # 容器仍可使用，下一輪重新發佈同一個容器
+            attempts = post["attempts"] + 1
+            status = FAILED if attempts >= POST_MAX_ATTEMPTS else PREPARED
+            self.queue.transition(post["id"], PUBLISHING, status, attempts=attempts, error=error)
+            logger.warning("排程貼文尚未發佈", extra={"scheduled_id": post["id"], "attempts": attempts, "error": error, "status": status})
+            return False
+        self._fail(post, PUBLISHING, error)
+        return False
+
+    def _prepare(self, post):
+        try:
+            container_id = self.client.create_container(
+                media_type=post["media_type"],
+                text=post["text"],
+                link_attachment=post["link_attachment"],
+                image_url=post["image_url"],
+                video_url=post["video_url"]
+            )
+        except ThreadsAPIError as e:
+            self._fail(post, PENDING, str(e))
+            return False
+        if not container_id:
+            self._fail(post, PENDING, "未取得媒體容器 ID")
+            return False
+        # 其他執行個體已先建立容器或貼文已取消時，多出的容器不發佈即可
+        return self.queue.transition(post["id"], PENDING, PREPARED, container_id=container_id, container_created_at=time.time())
+
+    def _publish(self, post):
+        # 先搶到 publishing 狀態，避免多個執行個體發佈同一篇
+        if not self.queue.transition(post["id"], PREPARED, PUBLISHING):
+            return False
+        try:
+            result = self.client.publish(post["container_id"])
+        except ThreadsAPIError as e:
+            # 逾時或 5xx 時發佈可能已生效；先前的發佈也可能剛好完成，確認容器狀態後再決定
+            return self._resolve_publishing(post, str(e))
+        post_id = result.get("id")
+        self.queue.transition(post["id"], PUBLISHING, PUBLISHED, post_id=post_id, error=None)
+        remember_thread(post_id, post["text"], is_mine=True)
+        logger.info("排程貼文已發佈", extra={"scheduled_id": post["id"], "post_id": post_id, "delay": round(time.time() - post["publish_at"], 1)})
+        return True
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_post_queue():
+    """整個行程共用的排程佇列，第一次使用時才建立資料庫"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = PostQueue()
+        return _queue
+
+def install_post_scheduler(app):
+    """
+    在 FastAPI 應用程式的 lifespan 中啟動與停止背景排程，保留原本的 lifespan（例如暖機）
+
+    Args:
+        app: FastAPI 應用程式
+    """
+    inner = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        scheduler = None
+        if POST_SCHEDULER_ENABLED:
+            scheduler = PostScheduler(get_post_queue())
+            scheduler.start()
+        async with inner(app) as state:
+            yield state
+        if scheduler:
+            await asyncio.to_thread(scheduler.stop)
+
+    app.router.lifespan_context = lifespan
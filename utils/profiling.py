@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import time
+import random
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from utils.local_store import data_path
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# 預設的效能分析輸出目錄
+PROFILE_DIR = os.getenv("PROFILE_DIR", data_path("profiles"))
+# API 請求的抽樣比例 (0 表示關閉，1 表示每個 /api/* 請求都分析)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# 牆上時鐘取樣間隔（秒）
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+# cProfile 同一時間只能有一個啟用中的分析器
+_profiler_lock = threading.Lock()
+
+
+class WallClockSampler:
+    """
+    定時擷取所有執行緒的呼叫堆疊，累計成 folded stack 格式
+
+    與 cProfile 不同，這裡量的是牆上時間，等待網路或 sleep 的時間也會被計入，
+    輸出可直接交給 flamegraph.pl 或 speedscope 產生火焰圖。
+
+    Args:
+        interval: 取樣間隔（秒）
+        thread_filter: 依執行緒名稱決定是否取樣的函式 (None 表示所有執行緒)；
+            套用時會略過閒置中、正在等待工作的執行緒池執行緒
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL, thread_filter=None):
+        self.interval = interval
+        self.thread_filter = thread_filter
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="wall-clock-sampler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                name = names.get(thread_id, str(thread_id))
+                if thread_id == own_id or (self.thread_filter and not self.thread_filter(name)):
+                    continue
+                stack = []
+                idle = False
+                while frame is not None:
+                    code = frame.f_code
+                    # 執行緒池的工作執行緒在 queue.get 等待下一個工作
+                    idle = idle or (code.co_name == "get" and os.path.basename(code.co_filename) == "queue.py")
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if idle and self.thread_filter:
+                    continue
+                stack.append(name)
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _output_base(output_dir, label):
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(output_dir, f"{label}-{stamp}")
+
+
+def _write_profile(profiler, sampler, base, metadata):
+    """寫出 .pstats（profiler 為 None 時略過）、火焰圖用的 .folded 與中繼資料 .json"""
+    if profiler is not None:
+        profiler.dump_stats(f"{base}.pstats")
+    sampler.write_folded(f"{base}.folded")
+    with open(f"{base}.json", "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+
+@contextmanager
+def profile_run(label, output_dir=None, top=20):
+    """
+    分析一段程式的執行效能，結束後寫出分析檔並列出最耗時的函式
+
+    Args:
+        label: 輸出檔名前綴（例如子命令名稱）
+        output_dir: 輸出目錄，預設為 PROFILE_DIR
+        top: 結束時列出累計時間最多的前幾個函式
+    """
+    base = _output_base(output_dir or PROFILE_DIR, label)
+    profiler = cProfile.Profile()
+    sampler = WallClockSampler()
+    started_at = datetime.now(timezone.utc).isoformat()
+    start = time.perf_counter()
+
+    sampler.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        sampler.stop()
+        _write_profile(profiler, sampler, base, {
+            "label": label,
+            "argv": sys.argv,
+            "started_at": started_at,
+            "duration_ms": (time.perf_counter() - start) * 1000,
+        })
+        print(f"\n📊 效能分析已寫入 {base}.pstats / {base}.folded")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
+
+
+def _request_thread_filter(loop_thread_name):
+    """
+    只取樣處理請求的執行緒：事件迴圈與 asyncio.to_thread、Starlette 同步路由使用的執行緒池
+
+    admission 工作執行緒、排程器與暖機等背景執行緒不計入請求的分析。
+    """
+    def is_request_thread(name):
+        return name == loop_thread_name or name.startswith("asyncio_") or name == "AnyIO worker thread"
+    return is_request_thread
+
+
+def install_profiling_middleware(app, sample_rate=None, output_dir=None):
+    """
+    為 FastAPI 應用程式加上抽樣式的請求效能分析
+
+    只分析 /api/* 請求，抽中的請求會在輸出目錄留下牆上時間取樣的 .folded
+    與包含方法、路徑、狀態碼及耗時的 .json。同一時間只會分析一個請求，
+    其他並行請求即使被抽中也會直接略過。
+
+    路由的阻塞工作大多交給執行緒池（asyncio.to_thread）執行，而 cProfile 只會分析啟用它的
+    事件迴圈執行緒，因此請求分析不產生 .pstats，只以取樣器記錄事件迴圈與執行緒池的堆疊。
+    分析期間同時處理中的其他請求若也用到執行緒池，會一併出現在 .folded 中；webhook 回覆在
+    admission 工作執行緒中於回應之後才處理，不在請求分析的範圍內。
+
+    Args:
+        app: FastAPI 應用程式
+        sample_rate: 抽樣比例，預設為 PROFILE_SAMPLE_RATE；為 0 時不安裝
+        output_dir: 輸出目錄，預設為 PROFILE_DIR 下的 requests 子目錄
+    """
+    sample_rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+    if sample_rate <= 0:
+        return
+    output_dir = output_dir or os.path.join(PROFILE_DIR, "requests")
+
+    @app.middleware("http")
+    async def profile_request(request, call_next):
+        if not request.url.path.startswith("/api/") or random.random() >= sample_rate:
+            return await call_next(request)
+        if not _profiler_lock.acquire(blocking=False):
+            return await call_next(request)
+
+        try:
+            sampler = WallClockSampler(thread_filter=_request_thread_filter(threading.current_thread().name))
+            received_at = datetime.now(timezone.utc).isoformat()
+            start = time.perf_counter()
+            status_code = 500
+            sampler.start()
+            try:
+                response = await call_next(request)
+                status_code = response.status_code
+                return response
+            finally:
+                sampler.stop()
+                label = request.url.path.strip("/").replace("/", "_")
+                _write_profile(None, sampler, _output_base(output_dir, label), {
+                    "method": request.method,
+                    "path": request.url.path,
+                    "query": str(request.url.query),
+                    "status_code": status_code,
+                    "client": request.client.host if request.client else None,
+                    "received_at": received_at,
+                    "duration_ms": (time.perf_counter() - start) * 1000,
+                    "sample_rate": sample_rate,
+                })
+        finally:
+            _profiler_lock.release()
@@ -0,0 +1,82 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    權杖桶限流器
+
+    每秒補充 rate 個權杖，最多累積 burst 個；每次取用消耗一個。
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def has_tokens(self):
+        """檢查目前是否還有權杖，但不消耗"""
+        with self._lock:
+            self._refill()
+            return self._tokens >= 1
+
+    def try_acquire(self):
+        """嘗試取用一個權杖，成功返回 True"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self):
+        """阻塞直到取得一個權杖"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class KeyedRateLimiter:
+    """
+    依來源（例如 IP）各自維護權杖桶
+
+    最多追蹤 max_keys 個來源，超過時淘汰最久沒出現的來源，記憶體用量固定。
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, key):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def has_tokens(self, key):
+        return self._bucket(key).has_tokens()
+
+    def try_acquire(self, key):
+        return self._bucket(key).try_acquire()
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import uuid
+from openai import OpenAI
+from dotenv import load_dotenv
+from utils.local_store import data_path, read_json, write_json
+from utils.openai_client import reply_completion_params
+from utils.structured_log import get_logger
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# Batch 請求使用的 API 位址；指向 tools/mock_openai_batch.py 即可在本地測試
+OPENAI_BATCH_BASE_URL = os.getenv("OPENAI_BATCH_BASE_URL") or None
+# 輪詢 Batch 狀態的間隔秒數
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# 積壓回覆的進度檢查點，以及上傳與下載的 JSONL
+BATCH_STATE_FILE = data_path("reply_batch_state.json")
+BATCH_INPUT_FILE = data_path("reply_batch_input.jsonl")
+BATCH_OUTPUT_FILE = data_path("reply_batch_output.jsonl")
+
+# 不會再有結果的 Batch 狀態
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+logger = get_logger("reply_batch")
+_client = None
+
+def get_batch_client():
+    """Batch 專用的 OpenAI 用戶端，第一次使用時才建立"""
+    global _client
+    if _client is None:
+        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=OPENAI_BATCH_BASE_URL)
+    return _client
+
+def load_batch_state():
+    """讀取積壓回覆的檢查點，沒有進行中的批次時返回 None"""
+    return read_json(BATCH_STATE_FILE)
+
+def save_batch_state(state):
+    """寫入積壓回覆的檢查點"""
+    write_json(BATCH_STATE_FILE, state)
+
+def clear_batch_state():
+    """批次處理完成後刪除檢查點"""
+    if os.path.exists(BATCH_STATE_FILE):
+        os.remove(BATCH_STATE_FILE)
+
+def write_batch_input(comments, path=BATCH_INPUT_FILE):
+    """
+    將待回覆留言寫成 Batch 輸入檔，每行一個 chat.completions 請求
+
+    Args:
+        comments: 留言列表，每則需有 reply_id、text，可選 context（生成用的前文）
+        path: 輸出的 JSONL 路徑
+
+    Returns:
+        寫入的請求數
+    """
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for comment in comments:
+            request = {
+                "custom_id": comment["reply_id"],
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": reply_completion_params(comment["text"], comment.get("context")),
+            }
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+    return len(comments)
+
+def upload_batch_input(path=BATCH_INPUT_FILE):
+    """
+    上傳 Batch 輸入檔（上傳本身不收費，中斷後重新上傳只會多出一個未使用的檔案）
+
+    Returns:
+        (上傳的檔案 ID, 這次送出的識別碼)；識別碼寫入 Batch 的 metadata，用來找回已建立的 Batch
+    """
+    with open(path, "rb") as f:
+        input_file = get_batch_client().files.create(file=f, purpose="batch")
+    return input_file.id, uuid.uuid4().hex
+
+def find_batch(submission_id):
+    """依 metadata 中的送出識別碼找出已建立的 Batch，找不到時返回 None"""
+    for batch in get_batch_client().batches.list(limit=100):
+        if (batch.metadata or {}).get("submission_id") == submission_id:
+            return batch
+    return None
+
+def create_batch(input_file_id, submission_id):
+    """
+    建立 Batch；同一個送出識別碼只會建立一次
+
+    呼叫前應先把 input_file_id 與 submission_id 寫入檢查點。建立後、寫入檢查點前中斷時，
+    重新執行會依 metadata 找回先前建立的 Batch，不會重複送出（重複送出會重複收費）。
+
+    Returns:
+        Batch ID
+    """
+    existing = find_batch(submission_id)
+    if existing:
+        logger.info("找到先前建立的 Batch", extra={"batch_id": existing.id, "submission_id": submission_id})
+        return existing.id
+    batch = get_batch_client().batches.create(
+        input_file_id=input_file_id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata={"source": "threads-auto-reply", "submission_id": submission_id}
+    )
+    logger.info("已建立 Batch", extra={"batch_id": batch.id, "input_file_id": input_file_id})
+    return batch.id
+
+def wait_for_batch(batch_id, poll_interval=BATCH_POLL_INTERVAL, timeout=None, on_poll=None):
+    """
+    輪詢 Batch 直到不會再有結果或超過等待時間
+
+    Args:
+        batch_id: Batch ID
+        poll_interval: 輪詢間隔秒數
+        timeout: 最多等待幾秒 (None 表示一直等待)
+        on_poll: 每次輪詢後以 Batch 物件呼叫，用於顯示進度
+
+    Returns:
+        最後一次查詢到的 Batch 物件
+    """
+    client = get_batch_client()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if on_poll:
+            on_poll(batch)
+        if batch.status in FINAL_STATUSES:
+            return batch
+        if deadline is not None and time.monotonic() + poll_interval > deadline:
+            return batch
+        time.sleep(poll_interval)
+
+def download_batch_results(batch, path=BATCH_OUTPUT_FILE):
+    """
+    下載 Batch 的輸出檔與錯誤檔並取出每則留言的回覆
+
+    過期或取消的 Batch 仍可能有部分結果，一併取出。
+
+    Returns:
+        (留言 ID 對應回覆文字的字典, 失敗的留言 ID 對應錯誤訊息的字典)
+    """
+    replies, errors = {}, {}
+    client = get_batch_client()
+    lines = []
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if file_id:
+            lines.extend(client.files.content(file_id).text.splitlines())
+    if not lines:
+        return replies, errors
+
+    # 保留原始輸出，方便排查個別失敗的請求
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(line + "\n" for line in lines if line.strip())
+
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        custom_id = record.get("custom_id")
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            errors[custom_id] = (record.get("error") or {}).get("message") or f"HTTP {response.get('status_code')}"
+            continue
+        try:
+            replies[custom_id] = response["body"]["choices"][0]["message"]["content"].strip()
+        except (KeyError, IndexError, TypeError, AttributeError):
+            errors[custom_id] = "回應格式錯誤"
+    return replies, errors
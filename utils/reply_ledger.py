@@ -0,0 +1,52 @@
+import threading
+from datetime import datetime, timezone
+from utils.local_store import data_path, append_jsonl, read_jsonl
+
+# 已回覆過的留言與提及，webhook、逐篇掃描、提及處理與重送共用，避免同一則被回覆兩次
+REPLY_LEDGER_FILE = data_path("handled_replies.jsonl")
+
+_lock = threading.Lock()
+_handled = None
+
+def _load():
+    # 第一次查詢時才讀取檔案，之後只在記憶體中比對
+    global _handled
+    if _handled is None:
+        _handled = {entry["reply_to_id"] for entry in read_jsonl(REPLY_LEDGER_FILE)}
+    return _handled
+
+def load_handled():
+    """
+    預先載入回覆紀錄（例如啟動暖機時），避免第一則留言才讀取檔案
+
+    Returns:
+        已記錄的留言與提及數
+    """
+    with _lock:
+        return len(_load())
+
+def is_handled(reply_to_id):
+    """檢查留言或提及是否已回覆過"""
+    with _lock:
+        return reply_to_id in _load()
+
+def mark_handled(reply_to_id, source, reply_id=None):
+    """
+    記錄已回覆的留言或提及
+
+    Args:
+        reply_to_id: 被回覆的留言或提及 ID
+        source: 回覆來源 (sweep, webhook, mentions, replay)
+        reply_id: 發佈的回覆 ID
+    """
+    with _lock:
+        handled = _load()
+        if reply_to_id in handled:
+            return
+        handled.add(reply_to_id)
+    append_jsonl(REPLY_LEDGER_FILE, {
+        "reply_to_id": reply_to_id,
+        "source": source,
+        "reply_id": reply_id,
+        "handled_at": datetime.now(timezone.utc).isoformat()
+    })
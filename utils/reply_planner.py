@@ -0,0 +1,115 @@
+import os
+import re
+import math
+import time
+from collections import Counter
+from dotenv import load_dotenv
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# 每則回覆預估耗時（秒）：生成 + 兩步驟發布的 5 秒等待 + 兩則回覆之間的 10 秒間隔
+SECONDS_PER_REPLY = float(os.getenv("PLANNER_SECONDS_PER_REPLY", "18"))
+# 新鮮度分數的半衰期（小時）
+RECENCY_HALF_LIFE_HOURS = float(os.getenv("PLANNER_RECENCY_HALF_LIFE_HOURS", "24"))
+
+# 各項分數的權重
+WEIGHT_RECENCY = 1.0
+WEIGHT_ENGAGEMENT = 0.6
+WEIGHT_QUESTION = 0.8
+
+# 直接提問的留言：問號或常見疑問詞
+_QUESTION = re.compile(r"[?？]|嗎|呢|何|怎|為什麼|為啥|請問|如何|是否|能否|可否")
+
+
+def is_direct_question(text):
+    """判斷留言是否為直接提問"""
+    return bool(_QUESTION.search(text or ""))
+
+
+def remaining_reply_quota(limit_info):
+    """
+    從發文限制資訊算出剩餘的回覆額度
+
+    Args:
+        limit_info: threads_publishing_limit 的回應
+
+    Returns:
+        剩餘回覆數，無法判斷時返回 None
+    """
+    if not limit_info or "error" in limit_info:
+        return None
+    data = limit_info.get("data") or [limit_info]
+    for item in data:
+        config = item.get("reply_config") or {}
+        total = config.get("quota_total")
+        if total is not None:
+            return max(0, total - item.get("reply_quota_usage", 0))
+    return None
+
+
+def score_comment(comment, now=None):
+    """
+    為一則待回覆留言評分
+
+    分數由三部分組成：
+        - 新鮮度：依留言時間以半衰期遞減 (0~1)
+        - 互動度：留言本身已有人回覆，加上內容長度 (0~1)
+        - 直接提問：留言是在問問題 (0 或 1)
+
+    Args:
+        comment: collect_pending_replies 產生的 ReplyRecord
+        now: 計算新鮮度的基準時間（Unix 秒數）
+
+    Returns:
+        分數，越高越值得回覆
+    """
+    now = now or time.time()
+    if comment.created_at is not None:
+        age_hours = max(0.0, (now - comment.created_at) / 3600)
+        recency = math.pow(0.5, age_hours / RECENCY_HALF_LIFE_HOURS)
+    else:
+        recency = 0.0
+
+    text = comment.text or ""
+    engagement = (0.6 if comment.has_replies else 0.0) + min(len(text), 80) / 80 * 0.4
+    question = 1.0 if is_direct_question(text) else 0.0
+
+    return WEIGHT_RECENCY * recency + WEIGHT_ENGAGEMENT * engagement + WEIGHT_QUESTION * question
+
+
+def plan_replies(candidates, quota=None, window_seconds=None, seconds_per_reply=SECONDS_PER_REPLY, now=None, per_post=None):
+    """
+    在回覆額度與時間窗口內挑出最值得回覆的留言
+
+    Args:
+        candidates: 所有貼文下待回覆的留言
+        quota: 剩餘回覆額度 (None 表示不限制)
+        window_seconds: 可用的執行時間 (None 表示不限制)
+        seconds_per_reply: 每則回覆預估耗時
+        now: 計算新鮮度的基準時間（Unix 秒數）
+        per_post: 每篇貼文最多排程幾條，超過的低分留言不排程也不計入延後 (None 表示不限制)
+
+    Returns:
+        (依分數由高到低排序的排程, 因額度或時間不足而延後的留言數)
+    """
+    now = now or time.time()
+    for comment in candidates:
+        comment.score = round(score_comment(comment, now), 3)
+    scored = sorted(candidates, key=lambda comment: comment.score, reverse=True)
+
+    if per_post is not None:
+        taken = Counter()
+        eligible = []
+        for comment in scored:
+            if taken[comment.post_id] < per_post:
+                taken[comment.post_id] += 1
+                eligible.append(comment)
+        scored = eligible
+
+    capacity = len(scored)
+    if quota is not None:
+        capacity = min(capacity, quota)
+    if window_seconds is not None:
+        capacity = min(capacity, int(window_seconds // seconds_per_reply))
+    return scored[:capacity], len(scored) - capacity
@@ -0,0 +1,151 @@
+import time
+from datetime import datetime
+
+UNKNOWN_USERNAME = "未知用戶"
+UNKNOWN_NAME = "未知名稱"
+NO_TEXT = "[無文字內容]"
+
+
+def parse_epoch(timestamp):
+    """
+    將 Threads 的 ISO 時間戳（例如 2024-01-01T12:00:00+0000）轉為 Unix 秒數
+
+    Returns:
+        整數秒數，無法解析時返回 None
+    """
+    if not timestamp:
+        return None
+    try:
+        return int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp())
+    except (ValueError, AttributeError):
+        return None
+
+def format_epoch(epoch):
+    """將 Unix 秒數轉為易讀的 UTC 時間，與 format_timestamp 的輸出格式相同"""
+    if epoch is None:
+        return ""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch))
+
+
+class ReplyRecord:
+    """
+    一則留言的精簡表示
+
+    只保留篩選、評分與回覆需要的欄位，時間在建立時解析一次為 Unix 秒數；
+    使用 __slots__，大量留言時記憶體約為等量字典的三分之一。
+    """
+
+    __slots__ = ("reply_id", "post_id", "user_id", "username", "name", "text", "created_at", "has_replies", "score")
+
+    def __init__(self, reply_id, post_id, user_id, username, name, text, created_at, has_replies=False, score=None):
+        self.reply_id = reply_id
+        self.post_id = post_id
+        self.user_id = user_id
+        self.username = username
+        self.name = name
+        self.text = text
+        self.created_at = created_at
+        self.has_replies = has_replies
+        self.score = score
+
+    @classmethod
+    def from_api(cls, reply, post_id):
+        """由 Graph API 的回覆資料建立，不保留原始 JSON"""
+        sender = reply.get("from") or {}
+        return cls(
+            reply.get("id"),
+            post_id,
+            sender.get("id"),
+            sender.get("username") or UNKNOWN_USERNAME,
+            sender.get("name") or UNKNOWN_NAME,
+            reply.get("text") or NO_TEXT,
+            parse_epoch(reply.get("timestamp")),
+            bool(reply.get("has_replies")),
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """由 to_dict 的結果還原（例如讀取檢查點）"""
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    def to_dict(self):
+        """轉為可寫入 JSON 的字典"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @property
+    def display_time(self):
+        """顯示用的留言時間，只在需要時才格式化"""
+        return format_epoch(self.created_at)
+
+    def __repr__(self):
+        return f"ReplyRecord({self.reply_id!r}, @{self.username}, {self.text[:20]!r})"
+
+
+class ReplyScan:
+    """scan_replies 的結果"""
+
+    __slots__ = ("candidates", "my_replies", "commenter_ids", "commenter_names", "handled", "too_old")
+
+    def __init__(self):
+        self.candidates = []        # 他人的留言中尚未回覆、且在日期範圍內的（貼文下有我的回覆時只剩沒有留言者 ID 的）
+        self.my_replies = []        # 我在此貼文下的回覆
+        self.commenter_ids = set()  # 所有其他留言者的 ID
+        self.commenter_names = {}   # 留言者 ID 對應 (名稱, 帳號)，只在需要顯示時收集
+        self.handled = 0            # 回覆紀錄中已回覆過的留言數（只計算仍需判斷的留言）
+        self.too_old = 0            # 早於日期限制的留言數（同上）
+
+    @property
+    def replied_user_ids(self):
+        """
+        視為已回覆的用戶
+
+        Threads API 無法得知回覆是針對哪條留言，只要貼文下有我的回覆，就假設所有其他用戶都已被回覆過。
+        """
+        return self.commenter_ids if self.my_replies else set()
+
+    @property
+    def pending(self):
+        """需要回覆的留言"""
+        return self.candidates
+
+
+def scan_replies(replies, post_id, my_user_id, since_epoch=None, is_handled=None, collect_names=False):
+    """
+    一次走訪貼文下的回覆，分出我的回覆與待回覆的留言
+
+    Args:
+        replies: Graph API 的回覆資料（可為逐頁產生的迭代器）
+        post_id: 貼文 ID
+        my_user_id: 我的用戶 ID
+        since_epoch: 只保留此時間（Unix 秒數）之後的留言 (None 表示不限制)
+        is_handled: 判斷留言是否已由其他流程回覆的函式
+        collect_names: 是否收集留言者名稱（顯示已回覆用戶時使用）
+
+    Returns:
+        ReplyScan
+    """
+    scan = ReplyScan()
+    for reply in replies:
+        sender = reply.get("from") or {}
+        user_id = sender.get("id")
+        if user_id == my_user_id:
+            if not scan.my_replies:
+                # 有我的回覆後，有留言者 ID 的留言都視為已回覆，不必再保留
+                scan.candidates = [record for record in scan.candidates if record.user_id is None]
+            scan.my_replies.append(ReplyRecord.from_api(reply, post_id))
+            continue
+        if user_id:
+            scan.commenter_ids.add(user_id)
+            if collect_names:
+                scan.commenter_names[user_id] = (sender.get("name") or UNKNOWN_NAME, sender.get("username") or UNKNOWN_USERNAME)
+            if scan.my_replies:
+                continue
+        if is_handled and is_handled(reply.get("id")):
+            scan.handled += 1
+            continue
+        record = ReplyRecord.from_api(reply, post_id)
+        if since_epoch is not None and record.created_at is not None and record.created_at < since_epoch:
+            scan.too_old += 1
+            continue
+        scan.candidates.append(record)
+    return scan
@@ -0,0 +1,282 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import requests
+from dotenv import load_dotenv
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# 各上游服務的單次呼叫期限（秒）
+GRAPH_READ_DEADLINE = float(os.getenv("GRAPH_READ_DEADLINE", "10"))
+GRAPH_WRITE_DEADLINE = float(os.getenv("GRAPH_WRITE_DEADLINE", "20"))
+OPENAI_DEADLINE = float(os.getenv("OPENAI_DEADLINE", "30"))
+
+# 對沖請求：Graph 讀寫在樣本不足時使用的預設延遲，以及計算 p95 所需的最少樣本數
+DEFAULT_HEDGE_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "2"))
+HEDGE_MIN_SAMPLES = 20
+# OpenAI 生成通常超過數秒且每次都收費：樣本不足時不對沖，有樣本後延遲也不低於期限的一半
+OPENAI_HEDGE_MIN_DELAY = float(os.getenv("OPENAI_HEDGE_MIN_DELAY", str(OPENAI_DEADLINE / 2)))
+
+# 斷路器：連續失敗幾次後開啟，開啟後多久允許試探請求
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+# 重試：最多嘗試次數與退避延遲（秒）
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "2"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))
+
+UPSTREAM_WORKERS = int(os.getenv("UPSTREAM_WORKERS", "16"))
+
+# 對沖請求會讓落後的那一個在背景跑完，因此需要獨立的執行緒池
+_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix="upstream")
+
+# 共用的連線池，重複使用到 graph.threads.net 的 TLS 連線
+HTTP_SESSION = requests.Session()
+_adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=UPSTREAM_WORKERS)
+HTTP_SESSION.mount("https://", _adapter)
+HTTP_SESSION.mount("http://", _adapter)
+
+
+class UpstreamUnavailable(Exception):
+    """上游服務暫時無法使用（逾時或斷路器開啟）"""
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    """呼叫超過期限仍未完成"""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    """斷路器開啟中，直接快速失敗"""
+
+
+class LatencyTracker:
+    """記錄最近的呼叫延遲，用來估計 p95 作為對沖延遲"""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * pct / 100))
+        return samples[index]
+
+
+class CircuitBreaker:
+    """
+    簡單的三態斷路器：closed → open → half-open
+
+    連續失敗達門檻後開啟，在 reset_timeout 內所有呼叫直接失敗；
+    之後只放行一個試探請求，成功則關閉，失敗則重新開啟。
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        """呼叫前檢查；斷路器開啟時拋出 CircuitOpenError"""
+        with self._lock:
+            state = self._state_locked()
+            if state == "open":
+                raise CircuitOpenError(f"{self.name} 斷路器開啟中")
+            if state == "half-open":
+                if self._probing:
+                    raise CircuitOpenError(f"{self.name} 斷路器試探中")
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class Upstream:
+    """
+    單一上游服務的延遲統計與斷路器
+
+    Args:
+        default_hedge_delay: 樣本不足時的對沖延遲，None 表示樣本不足時不對沖
+        min_hedge_delay: 對沖延遲的下限
+    """
+
+    def __init__(self, name, deadline, default_hedge_delay=DEFAULT_HEDGE_DELAY, min_hedge_delay=0):
+        self.name = name
+        self.deadline = deadline
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(name)
+
+    def hedge_delay(self):
+        """送出第二個請求前等待的秒數，None 表示不對沖"""
+        p95 = self.latency.percentile(95)
+        if p95 is None:
+            return self.default_hedge_delay
+        return max(p95, self.min_hedge_delay)
+
+
+UPSTREAMS = {
+    "graph-read": Upstream("graph-read", GRAPH_READ_DEADLINE),
+    "graph-write": Upstream("graph-write", GRAPH_WRITE_DEADLINE),
+    "openai": Upstream("openai", OPENAI_DEADLINE, default_hedge_delay=None, min_hedge_delay=OPENAI_HEDGE_MIN_DELAY),
+}
+
+
+def _timed(upstream, fn, args, kwargs):
+    start = time.monotonic()
+    result = fn(*args, **kwargs)
+    upstream.latency.record(time.monotonic() - start)
+    return result
+
+
+def resilient_call(upstream_name, fn, *args, hedge=False, deadline=None, is_failure=None, **kwargs):
+    """
+    以期限、對沖請求與斷路器保護一次上游呼叫
+
+    Args:
+        upstream_name: 上游名稱 (graph-read, graph-write, openai)
+        fn: 實際執行呼叫的函式
+        hedge: 是否在 p95 延遲後送出第二個相同請求（只適用於冪等呼叫）
+        deadline: 覆寫預設期限（秒）
+        is_failure: 判斷回傳值是否應計為上游失敗的函式
+
+    Returns:
+        fn 的回傳值；逾時拋出 DeadlineExceeded，斷路器開啟時拋出 CircuitOpenError
+    """
+    upstream = UPSTREAMS[upstream_name]
+    upstream.breaker.before_call()
+    deadline = deadline or upstream.deadline
+    start = time.monotonic()
+
+    futures = {_executor.submit(_timed, upstream, fn, args, kwargs)}
+    hedge_delay = upstream.hedge_delay() if hedge else None
+    if hedge_delay is not None:
+        done, _ = wait(futures, timeout=min(hedge_delay, deadline))
+        if not done and time.monotonic() - start < deadline:
+            futures.add(_executor.submit(_timed, upstream, fn, args, kwargs))
+
+    error = None
+    while futures:
+        remaining = deadline - (time.monotonic() - start)
+        done, futures = wait(futures, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                error = e
+                continue
+            if is_failure and is_failure(result):
+                upstream.breaker.record_failure()
+            else:
+                upstream.breaker.record_success()
+            # 另一個請求若還在排隊就取消（已在執行的無法中斷，只能讓它在背景跑完）
+            for other in futures:
+                other.cancel()
+            return result
+
+    for other in futures:
+        other.cancel()
+    upstream.breaker.record_failure()
+    if error is not None:
+        raise error
+    raise DeadlineExceeded(f"{upstream_name} 呼叫超過 {deadline} 秒期限")
+
+
+def _is_server_error(response):
+    """5xx 與 429 代表上游降級，4xx 則是請求本身的問題"""
+    return response.status_code >= 500 or response.status_code == 429
+
+
+def graph_get(url, params=None, headers=None):
+    """以對沖請求與斷路器保護的 Graph API GET"""
+    return resilient_call(
+        "graph-read", HTTP_SESSION.get, url, params=params, headers=headers,
+        timeout=GRAPH_READ_DEADLINE, hedge=True, is_failure=_is_server_error
+    )
+
+
+def graph_post(url, data=None, hedge=False, headers=None):
+    """
+    以期限與斷路器保護的 Graph API POST
+
+    發佈 (threads_publish) 不是冪等操作，絕不可對沖；
+    建立容器重複一次只會多出一個未發佈的容器，可以對沖。
+    """
+    return resilient_call(
+        "graph-write", HTTP_SESSION.post, url, data=data, headers=headers,
+        timeout=GRAPH_WRITE_DEADLINE, hedge=hedge, is_failure=_is_server_error
+    )
+
+
+def retry_with_backoff(fn, *args, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                       retry_on=(UpstreamUnavailable, requests.RequestException), is_transient=None, **kwargs):
+    """
+    以指數退避加隨機抖動 (full jitter) 重試暫時性失敗
+
+    回傳 None 或拋出 retry_on 中的例外都視為暫時性失敗；is_transient 判斷為永久性的例外立即停止重試。
+
+    Args:
+        fn: 要執行的函式
+        attempts: 最多嘗試次數
+        base_delay: 第一次重試前的最大等待秒數，之後每次加倍
+        max_delay: 單次等待秒數上限
+        retry_on: 視為失敗的例外類型
+        is_transient: 判斷例外是否值得重試的函式 (None 表示全部重試)
+
+    Returns:
+        (fn 的回傳值或 None, 實際嘗試次數, 最後一次的錯誤訊息)
+    """
+    error = None
+    for attempt in range(1, attempts + 1):
+        try:
+            result = fn(*args, **kwargs)
+            if result:
+                return result, attempt, None
+            error = "上游回傳失敗"
+        except retry_on as e:
+            error = str(e)
+            if is_transient and not is_transient(e):
+                return None, attempt, error
+        if attempt < attempts:
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1))))
+    return None, attempts, error
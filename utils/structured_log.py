@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from dotenv import load_dotenv
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# 日誌等級；webhook 內容只在 DEBUG 等級才會記錄
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# INFO 以下日誌的抽樣比例，WARNING 以上一律保留
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+# 背景寫入佇列的容量，滿了就丟棄新的日誌而不阻塞請求
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# LogRecord 內建的欄位，其餘以 extra 傳入的欄位都會輸出到 JSON
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+dropped_records = 0
+
+
+class JsonLineFormatter(logging.Formatter):
+    """將日誌格式化為一行精簡的 JSON"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """依比例抽樣 INFO 以下的日誌"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    把日誌丟進背景佇列，格式化與寫出都交給背景執行緒
+
+    標準的 QueueHandler 會在呼叫端執行緒先格式化訊息；這裡只預先處理例外堆疊，
+    其餘序列化都延後到背景執行緒，佇列滿時直接丟棄並計數。
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        global dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records += 1
+
+
+def _configure():
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonLineFormatter())
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+
+    root = logging.getLogger("threads_bot")
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+    root.propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    # 結束時把佇列中剩下的日誌寫完
+    atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    """
+    取得專案的結構化日誌記錄器
+
+    額外欄位以 extra 傳入，例如 logger.info("reply_published", extra={"reply_id": reply_id})。
+
+    Args:
+        name: 模組名稱，會成為 threads_bot.<name>
+    """
+    _configure()
+    return logging.getLogger(f"threads_bot.{name}")
@@ -1,17 +1,41 @@
-import requests
 import os
-import json
 import time
-from fastapi import FastAPI, Request
-from utils.openai_client import generate_classical_reply
+import asyncio
+from collections import Counter
+from openai import OpenAIError
+from fastapi import FastAPI, Request, UploadFile, File
+from utils.openai_client import generate_classical_reply, template_classical_reply
+from utils.admission import AdmissionController, is_low_value_comment, ANSWERED, DEGRADED, FAILED, IGNORED
+from utils.dead_letter import record_failed_reply, queued_reply_ids
+from utils.reply_ledger import is_handled, mark_handled
+from utils.leases import claim_comment, release_comment
+from utils.webhook_capture import capture_webhook_payload
+from utils.webhook_guard import read_verified_body, reject_malformed
+from utils.webhook_events import WebhookEvent, parse_webhook_body
+from utils.profiling import install_profiling_middleware
+from utils.warmup import install_warmup
+from utils.post_scheduler import install_post_scheduler, get_post_queue, validate_post, parse_post_file, POST_BULK_LIMIT
+from utils.structured_log import get_logger
+from utils.list_threads_posts import get_threads_user_id, get_thread_post_details
+from utils.conversation_context import conversation_context, remember_thread, context_for
+from utils.threads_client import threads_client, async_threads_client, ThreadsAPIError
+from utils.resilience import retry_with_backoff, UpstreamUnavailable
 from dotenv import load_dotenv
 
 # 載入 .env 檔案中的環境變數
 load_dotenv()
 
-# 使用 .env 檔案中的 THREADS_ACCESS_TOKEN
-THREADS_ACCESS_TOKEN = os.getenv("THREADS_ACCESS_TOKEN")
+# webhook 留言的原貼文不在前文快取時，是否讀取一次（經過 Graph 讀取快取）補上
+CONTEXT_FETCH_ROOT_POST = os.getenv("CONTEXT_FETCH_ROOT_POST", "1") == "1"
+
+logger = get_logger("threads_api")
 app = FastAPI()
+# 設定 PROFILE_SAMPLE_RATE 後抽樣分析 /api/* 請求
+install_profiling_middleware(app)
+# 啟動時預先建立連線與快取，/api/ready 在暖機完成後才回報就緒
+install_warmup(app)
+# 背景排程器依預定時間預先建立容器並發佈排程貼文
+install_post_scheduler(app)
 
 def create_threads_media_container(threads_user_id: str, media_type: str, text: str, link_attachment: str = None, image_url: str = None, video_url: str = None, reply_to_id: str = None):
     """
@@ -29,35 +53,19 @@ def create_threads_media_container(threads_user_id: str, media_type: str, text:
     Returns:
         容器 ID 或失敗時返回 None
     """
-    url = f"https://graph.threads.net/v1.0/{threads_user_id}/threads"
-    
-    # 建立資料字典
-    data = {
-        "media_type": media_type,
-        "text": text,
-        "access_token": THREADS_ACCESS_TOKEN
-    }
-    
-    # 根據媒體類型添加特定參數
-    if media_type == "IMAGE" and image_url:
-        data["image_url"] = image_url
-    elif media_type == "VIDEO" and video_url:
-        data["video_url"] = video_url
-    
-    # 添加連結附件 (僅適用於文字貼文)
-    if media_type == "TEXT" and link_attachment:
-        data["link_attachment"] = link_attachment
-    
-    # 如果是回覆，添加 reply_to_id 參數
-    if reply_to_id:
-        data["reply_to_id"] = reply_to_id
-    
-    response = requests.post(url, data=data)
-    if not response.ok:
-        print(f"媒體容器建立失敗: {response.text}")
+    try:
+        return threads_client.create_container(
+            media_type=media_type,
+            text=text,
+            link_attachment=link_attachment,
+            image_url=image_url,
+            video_url=video_url,
+            reply_to_id=reply_to_id,
+            user_id=threads_user_id
+        )
+    except ThreadsAPIError as e:
+        logger.warning("媒體容器建立失敗", extra={"status": e.status_code, "error": str(e), "reply_to_id": reply_to_id})
         return None
-    
-    return response.json().get("id")
 
 def publish_threads_container(threads_user_id: str, creation_id: str):
     """
@@ -70,18 +78,11 @@ def publish_threads_container(threads_user_id: str, creation_id: str):
     Returns:
         發佈的貼文 ID 或失敗時返回 None
     """
-    url = f"https://graph.threads.net/v1.0/{threads_user_id}/threads_publish"
-    data = {
-        "creation_id": creation_id,
-        "access_token": THREADS_ACCESS_TOKEN
-    }
-    
-    response = requests.post(url, data=data)
-    if not response.ok:
-        print(f"容器發佈失敗: {response.text}")
+    try:
+        return threads_client.publish(creation_id, user_id=threads_user_id)
+    except ThreadsAPIError as e:
+        logger.warning("容器發佈失敗", extra={"status": e.status_code, "error": str(e), "creation_id": creation_id})
         return None
-    
-    return response.json()
 
 def create_post_with_two_steps(threads_user_id: str, text: str, media_type: str = "TEXT", link_attachment: str = None, image_url: str = None, video_url: str = None):
     """
@@ -109,7 +110,7 @@ def create_post_with_two_steps(threads_user_id: str, text: str, media_type: str
     )
     
     if not container_id:
-        print("媒體容器創建失敗")
+        logger.warning("媒體容器創建失敗")
         return None
     
     # 建議等待一段時間
@@ -118,9 +119,10 @@ def create_post_with_two_steps(threads_user_id: str, text: str, media_type: str
     # 步驟 2: 發布媒體容器
     result = publish_threads_container(threads_user_id, container_id)
     if not result:
-        print("媒體容器發布失敗")
+        logger.warning("媒體容器發布失敗", extra={"creation_id": container_id})
         return None
     
+    remember_thread(result.get("id"), text, is_mine=True)
     return result
 
 def create_reply_with_two_steps(threads_user_id: str, reply_to_id: str, text: str, media_type: str = "TEXT"):
@@ -145,7 +147,7 @@ def create_reply_with_two_steps(threads_user_id: str, reply_to_id: str, text: st
     )
     
     if not container_id:
-        print("回覆容器創建失敗")
+        logger.warning("回覆容器創建失敗", extra={"reply_to_id": reply_to_id})
         return None
     
     # 建議等待一段時間
@@ -154,54 +156,236 @@ def create_reply_with_two_steps(threads_user_id: str, reply_to_id: str, text: st
     # 步驟 2: 發布回覆容器
     result = publish_threads_container(threads_user_id, container_id)
     if not result:
-        print("回覆容器發布失敗")
+        logger.warning("回覆容器發布失敗", extra={"reply_to_id": reply_to_id, "creation_id": container_id})
         return None
     
+    # 記下自己的回覆，之後有人接著回覆時可作為前文
+    remember_thread(result.get("id"), text, parent_id=reply_to_id, is_mine=True)
     return result
 
+def _is_transient(error):
+    return getattr(error, "transient", False)
+
+def publish_container_with_retries(threads_user_id: str, creation_id: str):
+    """
+    以退避重試發佈同一個媒體容器，不會重新建立容器
+
+    只重試暫時性錯誤（5xx、429、連線錯誤與逾時），其他 4xx 立即失敗。發佈逾時時請求可能
+    已經生效，因此每次重試前先查詢容器狀態：已是 PUBLISHED 就視為成功，不再送出。
+
+    Args:
+        threads_user_id: Threads 使用者 ID
+        creation_id: 媒體容器 ID
+    
+    Returns:
+        (發佈結果或 None, 嘗試次數, 最後一次的錯誤訊息)
+    """
+    tried = []
+
+    def publish_once():
+        if tried:
+            status = threads_client.container_status(creation_id)
+            state = status.get("status")
+            if state == "PUBLISHED":
+                logger.info("容器已在先前的嘗試中發佈", extra={"creation_id": creation_id})
+                # 狀態查詢只有容器 ID，無法得知發佈後的回覆 ID
+                return {"id": None, "creation_id": creation_id}
+            if state in ("ERROR", "EXPIRED"):
+                raise ThreadsAPIError(f"容器狀態為 {state}: {status.get('error_message') or ''}".strip(), transient=False)
+        tried.append(creation_id)
+        return threads_client.publish(creation_id, user_id=threads_user_id)
+
+    return retry_with_backoff(publish_once, retry_on=(ThreadsAPIError,), is_transient=_is_transient)
+
+def create_reply_with_retries(threads_user_id: str, reply_to_id: str, text: str, media_type: str = "TEXT", creation_id: str = None):
+    """
+    以退避重試的方式執行兩步驟回覆，處理暫時性的失敗
+
+    建立容器可以安全地重試；發佈只重試同一個容器（見 publish_container_with_retries），
+    不會因為發佈失敗而重新建立容器，避免同一則回覆發佈兩次。權杖失效、回覆對象已刪除等
+    4xx 錯誤不重試。
+
+    重送先前發佈失敗的回覆時傳入當時的容器 ID：先查詢容器狀態，已發佈就直接視為成功，
+    仍可發佈就發佈同一個容器，只有容器已失效 (ERROR、EXPIRED) 才重新建立。
+
+    Args:
+        threads_user_id: Threads 使用者 ID
+        reply_to_id: 要回覆的貼文或回覆 ID
+        text: 回覆文字內容
+        media_type: 媒體類型，預設為 TEXT
+        creation_id: 先前已建立的媒體容器 ID (None 表示建立新容器)
+    
+    Returns:
+        (發佈結果或 None, 嘗試次數, 最後一次的錯誤訊息, 媒體容器 ID 或 None)
+    """
+    if creation_id:
+        try:
+            status = threads_client.container_status(creation_id)
+        except ThreadsAPIError as e:
+            # 無法確認舊容器是否已發佈時不建立新容器，以免重複回覆
+            logger.warning("查詢先前的回覆容器失敗", extra={"reply_to_id": reply_to_id, "creation_id": creation_id, "error": str(e)})
+            return None, 0, str(e), creation_id
+        state = status.get("status")
+        if state == "PUBLISHED":
+            logger.info("先前的回覆容器已發佈", extra={"reply_to_id": reply_to_id, "creation_id": creation_id})
+            return {"id": None, "creation_id": creation_id}, 0, None, creation_id
+        if state in ("ERROR", "EXPIRED"):
+            logger.info("先前的回覆容器已失效，重新建立", extra={"reply_to_id": reply_to_id, "creation_id": creation_id, "status": state})
+            creation_id = None
+    
+    create_attempts = 0
+    if not creation_id:
+        creation_id, create_attempts, error = retry_with_backoff(
+            threads_client.create_container,
+            media_type=media_type,
+            text=text,
+            reply_to_id=reply_to_id,
+            user_id=threads_user_id,
+            retry_on=(ThreadsAPIError,),
+            is_transient=_is_transient
+        )
+        if not creation_id:
+            logger.warning("回覆容器建立失敗", extra={"reply_to_id": reply_to_id, "attempts": create_attempts, "error": error})
+            return None, create_attempts, error, None
+        
+        # 建議等待一段時間
+        time.sleep(5)  # 等待 5 秒讓伺服器處理
+    
+    result, publish_attempts, error = publish_container_with_retries(threads_user_id, creation_id)
+    attempts = create_attempts + publish_attempts
+    if not result:
+        logger.warning("回覆容器發布失敗", extra={"reply_to_id": reply_to_id, "creation_id": creation_id, "attempts": publish_attempts, "error": error})
+        return None, attempts, error, creation_id
+    
+    # 記下自己的回覆，之後有人接著回覆時可作為前文
+    remember_thread(result.get("id"), text, parent_id=reply_to_id, is_mine=True)
+    return result, attempts, None, creation_id
+
+def webhook_reply_context(event: WebhookEvent):
+    """
+    記錄 webhook 留言並取出生成回覆用的前文
+
+    前文只來自快取；原貼文不在快取時最多讀取一次貼文內容，之後同一篇貼文下的留言都直接使用快取。
+
+    Returns:
+        符合 token 預算的前文列表
+    """
+    parent_id = event.parent_id or event.root_post_id
+    remember_thread(event.reply_to_id, event.text, event.username, parent_id)
+    root_id = event.root_post_id
+    if CONTEXT_FETCH_ROOT_POST and root_id and not conversation_context.get(root_id):
+        details = get_thread_post_details(root_id)
+        if "error" in details:
+            logger.warning("讀取原貼文失敗，僅以留言本身生成回覆", extra={"post_id": root_id, "error": details["error"]})
+        else:
+            remember_thread(root_id, details.get("text"), is_mine=True)
+    return context_for(parent_id, root_id)
+
+def reply_to_webhook_event(event: WebhookEvent, degraded: bool = False):
+    """
+    為一則 webhook 留言生成古風回覆並發布
+
+    Args:
+        event: 從 webhook 內容取出的留言
+        degraded: 過載降級時改用範本回覆，不呼叫 OpenAI
+
+    Returns:
+        (處理狀態, 發佈結果)
+    """
+    my_user_id = get_threads_user_id()
+    if not my_user_id:
+        logger.warning("找不到 Threads 帳號，略過 webhook 留言", extra={"reply_id": event.reply_to_id})
+        return FAILED, None
+    
+    # 避免回覆自己的訊息
+    if event.user_id == my_user_id:
+        return IGNORED, None
+    
+    # Meta 可能重送同一則 webhook，掃描或提及處理也可能已回覆過；已在待重送佇列中的留言交給 replay 處理
+    if is_handled(event.reply_to_id) or event.reply_to_id in queued_reply_ids():
+        return IGNORED, None
+    
+    # 逐篇掃描或其他執行個體正在處理同一則留言
+    if not claim_comment(event.reply_to_id):
+        return IGNORED, None
+    
+    logger.info("收到留言", extra={"reply_id": event.reply_to_id, "username": event.username, "timestamp": event.timestamp, "shape": event.shape})
+    
+    try:
+        # 使用 OpenAI 來生成古風回覆，過載時改用範本回覆
+        reply_text = template_classical_reply(event.text) if degraded else generate_classical_reply(event.text, webhook_reply_context(event))
+        
+        # 使用兩步驟回覆流程，暫時性失敗會自動重試
+        result, attempts, error, creation_id = create_reply_with_retries(
+            threads_user_id=my_user_id,
+            reply_to_id=event.reply_to_id,
+            text=reply_text
+        )
+    except (UpstreamUnavailable, OpenAIError, ThreadsAPIError) as e:
+        # 尚未回覆也未記入待重送，釋放租約讓下一輪掃描或 Meta 重送的 webhook 能再處理
+        logger.warning("webhook 回覆失敗，釋放留言租約", extra={"reply_id": event.reply_to_id, "error": str(e)})
+        release_comment(event.reply_to_id)
+        return FAILED, None
+    if result:
+        mark_handled(event.reply_to_id, "webhook", result.get("id"))
+    else:
+        record_failed_reply(
+            event.reply_to_id, reply_text, "webhook", attempts, error,
+            username=event.username, original_text=event.text, creation_id=creation_id
+        )
+        # 已存入待重送佇列，其他流程不會再處理，釋放租約讓 replay 可以立即重送
+        release_comment(event.reply_to_id)
+    logger.info("webhook 回覆完成", extra={"reply_id": event.reply_to_id, "published": bool(result), "attempts": attempts, "degraded": degraded})
+    if not result:
+        return FAILED, None
+    return (DEGRADED if degraded else ANSWERED), result
+
+# 限制同時處理與排隊等待的留言數，兩個 webhook 端點共用
+webhook_admission = AdmissionController(reply_to_webhook_event, value_fn=lambda event: is_low_value_comment(event.text))
+
+async def process_webhook_events(events):
+    """
+    將留言交給准入控制處理，並等待被接受的留言完成
+
+    生成與發布都在工作執行緒中進行，不會阻塞事件迴圈；被丟棄的留言會立即返回。
+
+    Returns:
+        各狀態的留言數
+    """
+    futures = [webhook_admission.submit(event) for event in events]
+    outcomes = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+    return dict(Counter(status for status, _ in outcomes))
+
 @app.post("/api/webhook")
 async def handle_event(request: Request):
     """處理 Threads API 的 Webhook 回調"""
-    body = await request.json()
-    print(json.dumps(body, indent=2))
-
     # Threads Webhook 格式處理
     # 參考: https://developers.facebook.com/docs/threads/webhooks
-    for entry in body.get("entry", []):
-        for change in entry.get("changes", []):
-            if change.get("field") == "threads":
-                value = change.get("value", {})
-                if "replies" in value:
-                    # 處理回覆通知
-                    reply_data = value.get("replies", {})
-                    thread_id = reply_data.get("thread_id")
-                    text = reply_data.get("text", "")
-                    from_user = reply_data.get("from", {})
-                    threads_user_id = from_user.get("id")
-                    
-                    if text and thread_id and threads_user_id:
-                        # 避免回覆自己的訊息
-                        my_user_id = get_threads_user_id()
-                        if threads_user_id != my_user_id:
-                            # 使用 OpenAI 來生成古風回覆
-                            reply_text = generate_classical_reply(text)
-                            
-                            # 使用兩步驟回覆流程
-                            create_reply_with_two_steps(
-                                threads_user_id=my_user_id,
-                                reply_to_id=thread_id,
-                                text=reply_text
-                            )
-
-    return {"status": "ok"}
-
-def get_threads_user_id():
-    """獲取 Threads 使用者 ID"""
-    url = f"https://graph.threads.net/v1.0/me?fields=id&access_token={THREADS_ACCESS_TOKEN}"
-    response = requests.get(url)
-    if response.ok:
-        return response.json().get("id")
-    return None
+    # 先驗證大小與簽章，未通過的請求不會解析 JSON，也不會觸發生成或發布
+    raw_body, error_response = await read_verified_body(request)
+    if error_response:
+        return error_response
+    try:
+        body, events = parse_webhook_body(raw_body)
+    except ValueError:
+        return reject_malformed(request)
+    capture_webhook_payload(request.url.path, body)
+    # 完整內容只在 DEBUG 等級記錄，序列化也在背景執行緒進行
+    logger.debug("收到 webhook 內容", extra={"body": body})
+
+    return {"status": "ok", "results": await process_webhook_events(events)}
+
+def get_publishing_limit():
+    """
+    獲取 Threads 發文限制（經由讀取快取，發佈後自動失效）
+    
+    Returns:
+        發文限制資訊或失敗時返回包含 error 的字典
+    """
+    try:
+        return threads_client.publishing_limit()
+    except ThreadsAPIError:
+        return {"error": "無法獲取發文限制"}
 
 # 添加測試 OpenAI 古風回覆生成的 API 端點
 @app.post("/api/test-openai")
@@ -228,6 +412,18 @@ async def test_openai_generation(request: Request):
             "success": False
         }
 
+@app.get("/api/webhook-stats")
+async def webhook_stats():
+    """webhook 留言處理的准入控制統計（處理中、排隊、丟棄與降級數量）"""
+    return webhook_admission.stats()
+
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """Graph 讀取快取的命中統計"""
+    if not threads_client.cache:
+        return {"enabled": False}
+    return threads_client.cache.stats()
+
 # 以下是為了通過 API 測試所需的端點
 
 @app.get("/api/threads-user-id")
@@ -241,50 +437,31 @@ async def get_user_id_endpoint():
 @app.get("/api/threads-user-info")
 async def get_user_info():
     """獲取 Threads 帳號資訊 (threads_basic)"""
-    url = f"https://graph.threads.net/v1.0/me?fields=id,username,name,threads_profile_picture_url,threads_biography&access_token={THREADS_ACCESS_TOKEN}"
-    response = requests.get(url)
-    if response.ok:
-        return response.json()
-    return {"error": "無法獲取 Threads 帳號資訊"}
+    try:
+        return await async_threads_client.user_info()
+    except ThreadsAPIError:
+        return {"error": "無法獲取 Threads 帳號資訊"}
 
 @app.get("/api/threads-post-limit")
 async def fetch_threads_post_limit():
     """檢查 Threads 發文限制 (threads_content_publish)"""
-    threads_user_id = get_threads_user_id()
-    if not threads_user_id:
-        return {"error": "找不到 Threads 帳號"}
-    
-    url = f"https://graph.threads.net/v1.0/{threads_user_id}/threads_publishing_limit?fields=quota_usage,config&access_token={THREADS_ACCESS_TOKEN}"
-    response = requests.get(url)
-    if response.ok:
-        return response.json()
-    return {"error": "無法獲取發文限制"}
+    return await asyncio.to_thread(get_publishing_limit)
 
 @app.get("/api/threads-mentions")
-async def get_threads_mentions():
-    """獲取 Threads 提及 (threads_manage_mentions)"""
-    threads_user_id = get_threads_user_id()
-    if not threads_user_id:
-        return {"error": "找不到 Threads 帳號"}
-    
-    url = f"https://graph.threads.net/v1.0/{threads_user_id}/mentions?access_token={THREADS_ACCESS_TOKEN}"
-    response = requests.get(url)
-    if response.ok:
-        return response.json()
-    return {"error": "無法獲取提及資訊"}
+async def get_threads_mentions(after: str = None, since: int = None, limit: int = 25):
+    """獲取 Threads 提及 (threads_manage_mentions)，以 paging.cursors.after 取得下一頁"""
+    try:
+        return await async_threads_client.mentions(limit=limit, after=after, since=since)
+    except ThreadsAPIError:
+        return {"error": "無法獲取提及資訊"}
 
 @app.get("/api/threads-replies")
-async def get_threads_replies():
+async def get_threads_replies(after: str = None, limit: int = 25):
     """獲取 Threads 回覆 (threads_read_replies)"""
-    threads_user_id = get_threads_user_id()
-    if not threads_user_id:
-        return {"error": "找不到 Threads 帳號"}
-    
-    url = f"https://graph.threads.net/v1.0/{threads_user_id}/replies?access_token={THREADS_ACCESS_TOKEN}"
-    response = requests.get(url)
-    if response.ok:
-        return response.json()
-    return {"error": "無法獲取回覆資訊"}
+    try:
+        return await async_threads_client.user_replies(limit=limit, after=after)
+    except ThreadsAPIError:
+        return {"error": "無法獲取回覆資訊"}
 
 @app.post("/api/threads")
 async def create_media_container_endpoint(request: Request):
@@ -401,6 +578,55 @@ async def create_complete_reply_endpoint(request: Request):
         return result
     return {"error": "回覆發佈失敗"}
 
+def enqueue_posts(posts):
+    """
+    驗證並加入排程貼文，任一篇有問題時整批不加入
+
+    Returns:
+        {"queued": 篇數, "ids": [排程 ID]} 或包含 error 的字典
+    """
+    if not isinstance(posts, list) or not posts:
+        return {"error": "缺少要排程的貼文"}
+    if len(posts) > POST_BULK_LIMIT:
+        return {"error": f"一次最多排程 {POST_BULK_LIMIT} 篇貼文"}
+    for idx, post in enumerate(posts):
+        error = validate_post(post)
+        if error:
+            return {"error": f"第 {idx + 1} 篇貼文: {error}"}
+    ids = get_post_queue().add_many(posts)
+    return {"queued": len(ids), "ids": ids}
+
+@app.post("/api/scheduled-posts")
+async def schedule_posts_endpoint(request: Request):
+    """排程一篇或多篇貼文（{"posts": [...]} 或單篇貼文），寫入佇列後立即返回"""
+    body = await request.json()
+    posts = body.get("posts") if isinstance(body, dict) and "posts" in body else [body]
+    return await asyncio.to_thread(enqueue_posts, posts)
+
+@app.post("/api/scheduled-posts/upload")
+async def upload_scheduled_posts_endpoint(file: UploadFile = File(...)):
+    """上傳 JSON、JSONL 或 CSV 檔案批次排程貼文"""
+    content = await file.read()
+    try:
+        posts = parse_post_file(file.filename, content)
+    except (ValueError, UnicodeDecodeError) as e:
+        return {"error": f"無法解析貼文檔案: {e}"}
+    return await asyncio.to_thread(enqueue_posts, posts)
+
+@app.get("/api/scheduled-posts")
+async def list_scheduled_posts_endpoint(status: str = None, limit: int = 100):
+    """依預定時間列出排程貼文與各狀態的數量"""
+    queue = get_post_queue()
+    posts = await asyncio.to_thread(queue.list, status, limit)
+    return {"counts": await asyncio.to_thread(queue.counts), "data": posts}
+
+@app.delete("/api/scheduled-posts/{scheduled_id}")
+async def cancel_scheduled_post_endpoint(scheduled_id: int):
+    """取消尚未發佈的排程貼文"""
+    if await asyncio.to_thread(get_post_queue().cancel, scheduled_id):
+        return {"status": "cancelled", "id": scheduled_id}
+    return {"error": "找不到可取消的排程貼文（可能已發佈或不存在）"}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,290 @@
+import os
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+import requests
+from dotenv import load_dotenv
+from utils.resilience import graph_get, graph_post, UpstreamUnavailable
+from utils.graph_cache import TTLCache, CACHE_TTLS, INVALIDATE_ON_PUBLISH, GRAPH_CACHE_ENABLED
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+GRAPH_BASE_URL = "https://graph.threads.net/v1.0"
+
+# 各類資料查詢的欄位，所有呼叫端共用同一份設定
+USER_ID_FIELDS = "id"
+USER_INFO_FIELDS = "id,username,name,threads_profile_picture_url,threads_biography"
+POST_FIELDS = "id,text,timestamp,media_type"
+REPLY_FIELDS = "id,text,timestamp,has_replies,from{id,username,name}"
+CONVERSATION_FIELDS = "id,text,timestamp,username,replied_to,root_post,from{id,username}"
+MENTION_FIELDS = "id,text,username,timestamp,permalink"
+PUBLISHING_LIMIT_FIELDS = "quota_usage,config,reply_quota_usage,reply_config"
+
+# Graph API 回傳的 JSON 物件
+GraphResponse = Dict[str, Any]
+
+
+class ThreadsAPIError(Exception):
+    """
+    Threads Graph API 呼叫失敗（包含上游不可用與 HTTP 錯誤）
+
+    transient 表示重試可能成功：連線錯誤、逾時、斷路器開啟、5xx 與 429 是暫時性的，
+    其他 4xx（權杖失效、回覆對象已刪除等）重試也不會成功。
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, transient: Optional[bool] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        if transient is None:
+            transient = status_code is None or status_code >= 500 or status_code == 429
+        self.transient = transient
+
+
+class ThreadsClient:
+    """
+    Threads Graph API 用戶端
+
+    所有請求都經過 utils/resilience.py 的連線池、期限、對沖與斷路器，存取權杖放在
+    Authorization 標頭而不是網址中。失敗時拋出 ThreadsAPIError。讀取方法依類型經過
+    TTL 快取，發佈後相關類型的快取會失效。
+    """
+
+    def __init__(self, access_token: Optional[str] = None, cache: Optional[TTLCache] = None):
+        self.access_token = access_token or os.getenv("THREADS_ACCESS_TOKEN")
+        self.cache = cache if cache is not None else (TTLCache() if GRAPH_CACHE_ENABLED else None)
+        self._user_id = None
+        self._lock = threading.Lock()
+
+    def _headers(self):
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+    def _check(self, response):
+        if response.ok:
+            return response.json()
+        try:
+            message = response.json().get("error", {}).get("message") or response.text
+        except ValueError:
+            message = response.text
+        raise ThreadsAPIError(message, response.status_code)
+
+    def get(self, path: str, **params: Any) -> GraphResponse:
+        """GET graph.threads.net/v1.0/{path}，省略值為 None 的參數"""
+        params = {key: value for key, value in params.items() if value is not None}
+        try:
+            response = graph_get(f"{GRAPH_BASE_URL}/{path}", params=params, headers=self._headers())
+        except (UpstreamUnavailable, requests.RequestException) as e:
+            raise ThreadsAPIError(str(e)) from e
+        return self._check(response)
+
+    def cached_get(self, kind: str, path: str, **params: Any) -> GraphResponse:
+        """依讀取類型的 TTL 快取 GET 結果，同時發生的相同讀取只呼叫一次上游"""
+        ttl = CACHE_TTLS.get(kind, 0)
+        if not self.cache or ttl <= 0:
+            return self.get(path, **params)
+        key = (path, tuple(sorted((name, value) for name, value in params.items() if value is not None)))
+        return self.cache.get_or_load(kind, key, ttl, lambda: self.get(path, **params))
+
+    def invalidate(self, *kinds: str) -> None:
+        """使指定類型（未指定時為全部）的讀取快取失效"""
+        if self.cache:
+            self.cache.invalidate(*kinds)
+
+    def post(self, path: str, hedge: bool = False, **data: Any) -> GraphResponse:
+        """POST graph.threads.net/v1.0/{path}，省略值為 None 的參數"""
+        data = {key: value for key, value in data.items() if value is not None}
+        try:
+            response = graph_post(f"{GRAPH_BASE_URL}/{path}", data=data, hedge=hedge, headers=self._headers())
+        except (UpstreamUnavailable, requests.RequestException) as e:
+            raise ThreadsAPIError(str(e)) from e
+        return self._check(response)
+
+    def paginate(self, method: Callable[..., GraphResponse], *args: Any, start_after: Optional[str] = None,
+                 **kwargs: Any) -> Iterator[Tuple[Optional[str], List[GraphResponse]]]:
+        """
+        依 paging.cursors.after 逐頁呼叫列表方法
+
+        Args:
+            method: 接受 after 參數的列表方法，例如 client.posts
+            start_after: 從此游標開始（續傳時使用）
+
+        Yields:
+            (本頁使用的游標, 本頁資料)
+        """
+        after = start_after
+        while True:
+            page = method(*args, after=after, **kwargs)
+            data = page.get("data") or []
+            yield after, data
+            paging = page.get("paging") or {}
+            next_after = (paging.get("cursors") or {}).get("after")
+            if not data or not paging.get("next") or not next_after:
+                return
+            after = next_after
+
+    def user_id(self) -> str:
+        """存取權杖對應的帳號 ID（成功後快取，帳號不會改變）"""
+        if self._user_id:
+            return self._user_id
+        with self._lock:
+            if not self._user_id:
+                self._user_id = self.get("me", fields=USER_ID_FIELDS).get("id")
+        if not self._user_id:
+            raise ThreadsAPIError("找不到 Threads 帳號")
+        return self._user_id
+
+    def user_info(self) -> GraphResponse:
+        """帳號資訊 (threads_basic)"""
+        return self.cached_get("user_info", "me", fields=USER_INFO_FIELDS)
+
+    def posts(self, limit: int = 25, after: Optional[str] = None, since: Optional[float] = None) -> GraphResponse:
+        """自己的貼文列表"""
+        return self.cached_get("posts", f"{self.user_id()}/threads", fields=POST_FIELDS, limit=limit, after=after,
+                        since=int(since) if since else None)
+
+    def post_details(self, post_id: str) -> GraphResponse:
+        """單篇貼文"""
+        return self.cached_get("post", post_id, fields=POST_FIELDS)
+
+    def replies(self, post_id: str, limit: int = 50, after: Optional[str] = None) -> GraphResponse:
+        """貼文下的第一層回覆"""
+        return self.cached_get("replies", f"{post_id}/replies", fields=REPLY_FIELDS, limit=limit, after=after)
+
+    def conversation(self, post_id: str, limit: int = 100, after: Optional[str] = None) -> GraphResponse:
+        """貼文下所有層級的回覆"""
+        return self.cached_get("conversation", f"{post_id}/conversation", fields=CONVERSATION_FIELDS, limit=limit, after=after, reverse="false")
+
+    def mentions(self, limit: int = 50, after: Optional[str] = None, since: Optional[float] = None) -> GraphResponse:
+        """提及我的貼文 (threads_manage_mentions)"""
+        return self.cached_get("mentions", f"{self.user_id()}/mentions", fields=MENTION_FIELDS, limit=limit, after=after,
+                        since=int(since) if since else None)
+
+    def user_replies(self, limit: int = 25, after: Optional[str] = None) -> GraphResponse:
+        """我發佈過的回覆 (threads_read_replies)"""
+        return self.cached_get("user_replies", f"{self.user_id()}/replies", limit=limit, after=after)
+
+    def publishing_limit(self) -> GraphResponse:
+        """發文與回覆額度"""
+        return self.cached_get("publishing_limit", f"{self.user_id()}/threads_publishing_limit", fields=PUBLISHING_LIMIT_FIELDS)
+
+    def create_container(self, media_type: str = "TEXT", text: Optional[str] = None, link_attachment: Optional[str] = None,
+                         image_url: Optional[str] = None, video_url: Optional[str] = None, reply_to_id: Optional[str] = None,
+                         user_id: Optional[str] = None) -> Optional[str]:
+        """
+        建立媒體容器（發文或回覆的第一步）
+
+        Args:
+            user_id: 發文帳號，預設為存取權杖對應的帳號
+
+        Returns:
+            容器 ID
+        """
+        data = {"media_type": media_type, "text": text, "reply_to_id": reply_to_id}
+        # 根據媒體類型添加特定參數
+        if media_type == "IMAGE":
+            data["image_url"] = image_url
+        elif media_type == "VIDEO":
+            data["video_url"] = video_url
+        elif media_type == "TEXT":
+            data["link_attachment"] = link_attachment
+        # 重複建立只會多出未發佈的容器，因此可以對沖
+        return self.post(f"{user_id or self.user_id()}/threads", hedge=True, **data).get("id")
+
+    def container_status(self, creation_id: str) -> GraphResponse:
+        """
+        查詢媒體容器的狀態 (IN_PROGRESS, FINISHED, PUBLISHED, ERROR, EXPIRED)，不經過快取
+
+        發佈結果不明（例如逾時）時用來確認容器是否其實已發佈。
+        """
+        return self.get(creation_id, fields="id,status,error_message")
+
+    def publish(self, creation_id: str, user_id: Optional[str] = None) -> GraphResponse:
+        """發佈媒體容器（發文或回覆的第二步，不可對沖），成功後使貼文、回覆與額度的快取失效"""
+        result = self.post(f"{user_id or self.user_id()}/threads_publish", creation_id=creation_id)
+        self.invalidate(*INVALIDATE_ON_PUBLISH)
+        return result
+
+
+class AsyncThreadsClient:
+    """
+    ThreadsClient 的非同步介面，供 FastAPI 路由使用
+
+    每個方法都以 asyncio.to_thread 在工作執行緒中執行對應的同步方法：不會阻塞事件迴圈，
+    並共用同一個同步用戶端的帳號快取、讀取快取、連線池與期限、對沖、斷路器設定。
+    這不是非阻塞 I/O，每個進行中的呼叫仍佔用一個工作執行緒。
+    """
+
+    def __init__(self, client: Optional[ThreadsClient] = None):
+        self.client = client or ThreadsClient()
+
+    async def user_id(self) -> str:
+        """存取權杖對應的帳號 ID"""
+        return await asyncio.to_thread(self.client.user_id)
+
+    async def user_info(self) -> GraphResponse:
+        """帳號資訊 (threads_basic)"""
+        return await asyncio.to_thread(self.client.user_info)
+
+    async def posts(self, limit: int = 25, after: Optional[str] = None, since: Optional[float] = None) -> GraphResponse:
+        """自己的貼文列表"""
+        return await asyncio.to_thread(self.client.posts, limit=limit, after=after, since=since)
+
+    async def post_details(self, post_id: str) -> GraphResponse:
+        """單篇貼文"""
+        return await asyncio.to_thread(self.client.post_details, post_id)
+
+    async def replies(self, post_id: str, limit: int = 50, after: Optional[str] = None) -> GraphResponse:
+        """貼文下的第一層回覆"""
+        return await asyncio.to_thread(self.client.replies, post_id, limit=limit, after=after)
+
+    async def conversation(self, post_id: str, limit: int = 100, after: Optional[str] = None) -> GraphResponse:
+        """貼文下所有層級的回覆"""
+        return await asyncio.to_thread(self.client.conversation, post_id, limit=limit, after=after)
+
+    async def mentions(self, limit: int = 50, after: Optional[str] = None, since: Optional[float] = None) -> GraphResponse:
+        """提及我的貼文 (threads_manage_mentions)"""
+        return await asyncio.to_thread(self.client.mentions, limit=limit, after=after, since=since)
+
+    async def user_replies(self, limit: int = 25, after: Optional[str] = None) -> GraphResponse:
+        """我發佈過的回覆 (threads_read_replies)"""
+        return await asyncio.to_thread(self.client.user_replies, limit=limit, after=after)
+
+    async def publishing_limit(self) -> GraphResponse:
+        """發文與回覆額度"""
+        return await asyncio.to_thread(self.client.publishing_limit)
+
+    async def create_container(self, media_type: str = "TEXT", text: Optional[str] = None, link_attachment: Optional[str] = None,
+                               image_url: Optional[str] = None, video_url: Optional[str] = None, reply_to_id: Optional[str] = None,
+                               user_id: Optional[str] = None) -> Optional[str]:
+        """建立媒體容器，返回容器 ID"""
+        return await asyncio.to_thread(
+            self.client.create_container, media_type=media_type, text=text, link_attachment=link_attachment,
+            image_url=image_url, video_url=video_url, reply_to_id=reply_to_id, user_id=user_id
+        )
+
+    async def container_status(self, creation_id: str) -> GraphResponse:
+        """查詢媒體容器的狀態，不經過快取"""
+        return await asyncio.to_thread(self.client.container_status, creation_id)
+
+    async def publish(self, creation_id: str, user_id: Optional[str] = None) -> GraphResponse:
+        """發佈媒體容器"""
+        return await asyncio.to_thread(self.client.publish, creation_id, user_id=user_id)
+
+    def invalidate(self, *kinds: str) -> None:
+        """使指定類型（未指定時為全部）的讀取快取失效，只操作記憶體，不需要工作執行緒"""
+        self.client.invalidate(*kinds)
+
+    async def paginate(self, method_name: str, *args: Any, start_after: Optional[str] = None,
+                       **kwargs: Any) -> AsyncIterator[Tuple[Optional[str], List[GraphResponse]]]:
+        """非同步地逐頁取出資料，method_name 為列表方法的名稱，例如 "posts\""""
+        pages = self.client.paginate(getattr(self.client, method_name), *args, start_after=start_after, **kwargs)
+        while True:
+            page = await asyncio.to_thread(next, pages, None)
+            if page is None:
+                return
+            yield page
+
+
+# 整個行程共用的用戶端
+threads_client = ThreadsClient()
+async_threads_client = AsyncThreadsClient(threads_client)
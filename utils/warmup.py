@@ -0,0 +1,177 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.responses import JSONResponse
+from dotenv import load_dotenv
+from utils.structured_log import get_logger
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# 設為 0 可略過啟動暖機（例如壓測時使用假的上游呼叫）
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+# 失敗的暖機步驟在背景以指數退避重試：第一次重試前最多等待的秒數與單次等待上限
+WARMUP_RETRY_BASE_DELAY = float(os.getenv("WARMUP_RETRY_BASE_DELAY", "5"))
+WARMUP_RETRY_MAX_DELAY = float(os.getenv("WARMUP_RETRY_MAX_DELAY", "300"))
+
+logger = get_logger("warmup")
+
+# 暖機狀態，由 /api/ready 回報；status 為 starting、ready、degraded（非必要步驟失敗，仍可服務）
+# 或 unavailable（必要步驟失敗）
+readiness = {"ready": False, "status": "starting", "started_at": None, "finished_at": None, "steps": {}}
+
+
+def _warm_graph():
+    # 取得帳號 ID 會建立到 graph.threads.net 的連線池並寫入帳號快取
+    from utils.list_threads_posts import get_threads_user_id
+    if not get_threads_user_id():
+        raise RuntimeError("無法獲取 Threads 帳號")
+
+
+def _warm_publishing_limit():
+    from utils.threads_api import get_publishing_limit
+    result = get_publishing_limit()
+    if "error" in result:
+        raise RuntimeError(result["error"])
+
+
+def _warm_openai():
+    from utils.openai_client import warm_up_openai
+    warm_up_openai()
+
+
+def _load_dead_letters():
+    from utils.dead_letter import load_dead_letters
+    return {"pending": len(load_dead_letters())}
+
+
+def _load_reply_ledger():
+    from utils.reply_ledger import load_handled
+    return {"handled": load_handled()}
+
+
+WARMUP_STEPS = {
+    "graph": _warm_graph,
+    "publishing_limit": _warm_publishing_limit,
+    "openai": _warm_openai,
+    "dead_letters": _load_dead_letters,
+    "reply_ledger": _load_reply_ledger,
+}
+
+# 失敗時無法服務的步驟；其他步驟只是預先建立連線與快取，失敗時第一個請求會自行補上
+CRITICAL_STEPS = {"graph"}
+
+
+def _run_step(name, step, attempts=1):
+    start = time.perf_counter()
+    try:
+        detail = step()
+        result = {"ok": True}
+        if detail:
+            result.update(detail)
+    except Exception as e:
+        result = {"ok": False, "error": str(e)}
+    result["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    result["attempts"] = attempts
+    result["critical"] = name in CRITICAL_STEPS
+    return name, result
+
+
+def _update_status():
+    """依各步驟結果更新整體狀態，回傳失敗的步驟名稱"""
+    failed = [name for name, result in readiness["steps"].items() if not result["ok"]]
+    critical_failed = [name for name in failed if name in CRITICAL_STEPS]
+    readiness["ready"] = not critical_failed
+    readiness["status"] = "unavailable" if critical_failed else "degraded" if failed else "ready"
+    return failed
+
+
+def _retry_failed(stop):
+    """
+    在背景以指數退避加隨機抖動重試失敗的步驟，直到全部成功或 stop 被設定
+
+    帳號查詢仍失敗時，依賴帳號 ID 的發文限制步驟留到下一輪再試。
+    """
+    attempt = 1
+    while True:
+        failed = _update_status()
+        if not failed:
+            logger.info("暖機步驟重試成功", extra={"steps": readiness["steps"]})
+            return
+        delay = random.uniform(0, min(WARMUP_RETRY_MAX_DELAY, WARMUP_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+        if stop.wait(delay):
+            return
+        attempt += 1
+        for name in failed:
+            if name == "publishing_limit" and not readiness["steps"]["graph"]["ok"]:
+                continue
+            attempts = readiness["steps"][name].get("attempts", 1) + 1
+            name, result = _run_step(name, WARMUP_STEPS[name], attempts)
+            readiness["steps"][name] = result
+            if not result["ok"]:
+                logger.warning("暖機步驟重試失敗", extra={"step": name, "attempts": attempts, "error": result["error"]})
+
+
+def run_warmup(stop=None):
+    """
+    並行執行所有暖機步驟，失敗的步驟在背景持續重試
+
+    單一步驟失敗不會中止其他步驟；結果會記錄在 readiness 中。只有必要步驟（帳號查詢）失敗時
+    才回報未就緒，其他步驟失敗時狀態為 degraded，仍回報就緒。
+
+    Args:
+        stop: 設定後停止重試的 threading.Event (None 表示不重試)
+    """
+    readiness["started_at"] = time.time()
+    # 發文限制需要帳號 ID，先完成帳號查詢再並行其餘步驟
+    name, result = _run_step("graph", WARMUP_STEPS["graph"])
+    readiness["steps"][name] = result
+    with ThreadPoolExecutor(max_workers=len(WARMUP_STEPS)) as executor:
+        futures = [executor.submit(_run_step, name, step) for name, step in WARMUP_STEPS.items() if name != "graph"]
+        for future in futures:
+            name, result = future.result()
+            readiness["steps"][name] = result
+    readiness["finished_at"] = time.time()
+    failed = _update_status()
+    if not failed:
+        logger.info("暖機完成", extra={"steps": readiness["steps"]})
+        return
+    logger.warning("暖機完成，但部分步驟失敗，將在背景重試", extra={"failed": failed, "steps": readiness["steps"]})
+    if stop is not None:
+        _retry_failed(stop)
+
+
+@asynccontextmanager
+async def warmup_lifespan(app):
+    """在背景暖機，伺服器可立即接受請求，/api/ready 在必要步驟完成前回應 503"""
+    task = None
+    stop = threading.Event()
+    if WARMUP_ENABLED:
+        task = asyncio.create_task(asyncio.to_thread(run_warmup, stop))
+    else:
+        readiness["ready"] = True
+        readiness["status"] = "ready"
+    yield
+    # 停止背景重試；正在執行的步驟結束後執行緒即會退出
+    stop.set()
+    if task and not task.done():
+        task.cancel()
+
+
+def install_warmup(app):
+    """
+    為 FastAPI 應用程式加上啟動暖機與 /api/ready 就緒檢查
+
+    Args:
+        app: FastAPI 應用程式
+    """
+    app.router.lifespan_context = warmup_lifespan
+
+    @app.get("/api/ready")
+    async def ready():
+        """必要步驟成功就回應 200（非必要步驟失敗時 status 為 degraded）；暖機中或必要步驟失敗時回應 503"""
+        return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
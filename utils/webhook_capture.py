@@ -0,0 +1,26 @@
+import os
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from utils.local_store import append_jsonl
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# 設定後會把收到的 webhook 內容逐筆記錄到此 JSONL 檔，供 tools/webhook_load.py 重播
+WEBHOOK_CAPTURE_FILE = os.getenv("WEBHOOK_CAPTURE_FILE")
+
+def capture_webhook_payload(path, body):
+    """
+    記錄一筆收到的 webhook 內容（未設定 WEBHOOK_CAPTURE_FILE 時不做任何事）
+
+    Args:
+        path: 收到請求的路徑
+        body: 解析後的 JSON 內容
+    """
+    if not WEBHOOK_CAPTURE_FILE:
+        return
+    append_jsonl(WEBHOOK_CAPTURE_FILE, {
+        "received_at": datetime.now(timezone.utc).isoformat(),
+        "path": path,
+        "body": body
+    })
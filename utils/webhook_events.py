@@ -0,0 +1,151 @@
+from typing import NamedTuple, Optional
+
+# orjson 解析速度約為標準 json 的數倍；未安裝時退回標準函式庫
+try:
+    import orjson
+
+    def loads(raw):
+        return orjson.loads(raw)
+except ImportError:
+    import json
+
+    def loads(raw):
+        return json.loads(raw)
+
+SHAPE_ENTRY_VALUE = "entry/changes/value"
+SHAPE_ENTRY_REPLIES = "entry/changes/value.replies"
+SHAPE_VALUES_VALUE = "values/value"
+
+# entry/changes 結構中會帶有留言的訂閱欄位：Threads 的 replies 與 mentions，以及舊版測試內容使用的 threads；
+# 其他欄位（例如 publish、delete）的通知不是留言
+THREADS_FIELDS = frozenset({"replies", "mentions", "threads"})
+
+
+class WebhookEvent(NamedTuple):
+    """從 webhook 內容取出、需要回覆的一則留言"""
+    reply_to_id: str            # 回覆時使用的 reply_to_id
+    text: str                   # 留言內容
+    user_id: Optional[str]      # 留言者 ID（部分結構沒有提供）
+    username: Optional[str]     # 留言者帳號
+    timestamp: Optional[str]    # 留言時間 (ISO 格式)
+    shape: str                  # 來源的 webhook 結構
+    parent_id: Optional[str] = None     # 留言回覆的對象 (replied_to)
+    root_post_id: Optional[str] = None  # 留言所在的原貼文 (root_post)
+
+
+def _ref_id(value, key):
+    # replied_to / root_post 是帶 id 的物件，部分結構沒有提供
+    ref = value.get(key)
+    return ref.get("id") if isinstance(ref, dict) else None
+
+
+def _from_value(value, shape):
+    text = value.get("text")
+    reply_id = value.get("id")
+    if not isinstance(text, str) or not isinstance(reply_id, str) or not text or not reply_id:
+        return None
+    sender = value.get("from")
+    if not isinstance(sender, dict):
+        sender = None
+    return WebhookEvent(
+        reply_id, text,
+        sender.get("id") if sender else None,
+        value.get("username") or (sender.get("username") if sender else None),
+        value.get("timestamp"),
+        shape,
+        _ref_id(value, "replied_to"),
+        _ref_id(value, "root_post")
+    )
+
+
+def _from_replies(replies):
+    # value.replies 結構以 thread_id 作為回覆對象
+    text = replies.get("text")
+    thread_id = replies.get("thread_id")
+    if not isinstance(text, str) or not isinstance(thread_id, str) or not text or not thread_id:
+        return None
+    sender = replies.get("from")
+    if not isinstance(sender, dict):
+        sender = None
+    return WebhookEvent(
+        thread_id, text,
+        sender.get("id") if sender else None,
+        sender.get("username") if sender else replies.get("username"),
+        replies.get("timestamp"),
+        SHAPE_ENTRY_REPLIES,
+        _ref_id(replies, "replied_to"),
+        _ref_id(replies, "root_post")
+    )
+
+
+def extract_events(body):
+    """
+    依 webhook 結構一次判斷後取出所有需要回覆的留言
+
+    支援三種結構：
+        - entry[].changes[].value（value 直接包含 id / text）
+        - entry[].changes[].value.replies（以 thread_id 作為回覆對象）
+        - values.value
+
+    entry/changes 結構只處理 field 為 replies、mentions 或 threads 的變更；entry、changes、value
+    不是預期的型別時略過該項目，不會讓整個請求失敗。
+
+    Args:
+        body: 解析後的 webhook 內容
+
+    Returns:
+        WebhookEvent 列表，缺少文字或回覆對象的項目會被略過
+    """
+    events = []
+    if not isinstance(body, dict):
+        return events
+
+    entries = body.get("entry")
+    if entries:
+        if not isinstance(entries, list):
+            return events
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            changes = entry.get("changes")
+            if not isinstance(changes, list):
+                continue
+            for change in changes:
+                if not isinstance(change, dict) or not isinstance(change.get("field"), str):
+                    continue
+                if change["field"] not in THREADS_FIELDS:
+                    continue
+                value = change.get("value")
+                if not value or not isinstance(value, dict):
+                    continue
+                replies = value.get("replies")
+                if replies and isinstance(replies, dict):
+                    event = _from_replies(replies)
+                else:
+                    event = _from_value(value, SHAPE_ENTRY_VALUE)
+                if event:
+                    events.append(event)
+        return events
+
+    values = body.get("values")
+    if values and isinstance(values, dict):
+        value = values.get("value")
+        if value and isinstance(value, dict):
+            event = _from_value(value, SHAPE_VALUES_VALUE)
+            if event:
+                events.append(event)
+    return events
+
+
+def parse_webhook_body(raw):
+    """
+    解析原始 webhook 內容
+
+    Args:
+        raw: 請求的原始位元組
+
+    Returns:
+        (解析後的內容, WebhookEvent 列表)；JSON 格式錯誤時拋出 ValueError
+    """
+    body = loads(raw)
+    return body, extract_events(body)
@@ -0,0 +1,123 @@
+import os
+import hmac
+import hashlib
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from dotenv import load_dotenv
+from utils.rate_limit import KeyedRateLimiter
+from utils.structured_log import get_logger
+
+# 載入 .env 檔案中的環境變數
+load_dotenv()
+
+# Meta App 密鑰，用來驗證 X-Hub-Signature-256
+THREADS_APP_SECRET = os.getenv("THREADS_APP_SECRET", "")
+# 僅供本地開發：允許沒有簽章的 webhook
+WEBHOOK_ALLOW_UNSIGNED = os.getenv("WEBHOOK_ALLOW_UNSIGNED") == "1"
+# webhook 內容大小上限（位元組）
+WEBHOOK_MAX_BODY_BYTES = int(os.getenv("WEBHOOK_MAX_BODY_BYTES", str(64 * 1024)))
+# 每個來源每秒可容許的無效請求數與突發量，超過後直接拒絕該來源
+WEBHOOK_BAD_REQUEST_RATE = float(os.getenv("WEBHOOK_BAD_REQUEST_RATE", "1"))
+WEBHOOK_BAD_REQUEST_BURST = int(os.getenv("WEBHOOK_BAD_REQUEST_BURST", "10"))
+# 伺服器前方受信任的代理層數；0 表示不採信 X-Forwarded-For，直接使用連線位址。
+# 在 Vercel 上（平台會設定 VERCEL=1）連線位址都是代理本身，預設為 1
+WEBHOOK_TRUSTED_PROXY_HOPS = int(os.getenv("WEBHOOK_TRUSTED_PROXY_HOPS", "1" if os.getenv("VERCEL") else "0"))
+
+logger = get_logger("webhook_guard")
+
+# 只對驗證失敗的請求計數，正常的 Meta 流量不受影響
+_bad_sources = KeyedRateLimiter(WEBHOOK_BAD_REQUEST_RATE, WEBHOOK_BAD_REQUEST_BURST)
+
+if not THREADS_APP_SECRET and not WEBHOOK_ALLOW_UNSIGNED:
+    logger.warning("未設定 THREADS_APP_SECRET，所有 webhook 請求都會被拒絕")
+
+
+def verify_signature(raw_body: bytes, signature_header: str, secret: str = None) -> bool:
+    """
+    以固定時間比較驗證 X-Hub-Signature-256
+
+    Args:
+        raw_body: 請求的原始內容
+        signature_header: X-Hub-Signature-256 標頭，格式為 sha256=<hex>
+        secret: App 密鑰，預設為 THREADS_APP_SECRET
+
+    Returns:
+        簽章是否正確
+    """
+    secret = secret if secret is not None else THREADS_APP_SECRET
+    if not secret or not signature_header or not signature_header.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), raw_body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature_header[len("sha256="):])
+
+
+def request_source(request: Request, trusted_hops: int = None) -> str:
+    """
+    取得請求來源 IP
+
+    X-Forwarded-For 的前段可由用戶端任意填寫，只有受信任的代理附加在最後的位址可信。
+    設定 WEBHOOK_TRUSTED_PROXY_HOPS=N 時取倒數第 N 個位址，未設定時只使用連線位址。
+
+    Args:
+        request: FastAPI 請求
+        trusted_hops: 受信任的代理層數，預設為 WEBHOOK_TRUSTED_PROXY_HOPS
+    """
+    trusted_hops = WEBHOOK_TRUSTED_PROXY_HOPS if trusted_hops is None else trusted_hops
+    forwarded = request.headers.get("x-forwarded-for")
+    if trusted_hops > 0 and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            return hops[-min(trusted_hops, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+def _reject(source, status_code, error):
+    _bad_sources.try_acquire(source)
+    logger.warning("拒絕 webhook 請求", extra={"source": source, "status": status_code, "reason": error})
+    return JSONResponse({"error": error}, status_code=status_code)
+
+
+async def read_verified_body(request: Request):
+    """
+    在解析 JSON 之前檢查 webhook 請求
+
+    依序檢查：Content-Length 是否超過上限、實際讀取的內容是否超過上限、X-Hub-Signature-256
+    是否正確。簽章正確的請求一律接受；簽章錯誤時，來源若因過多無效請求被暫時封鎖則回應 429。
+    來源位址無法區分用戶端時（例如代理層數設定錯誤），也不會因此擋下 Meta 的正常請求。
+
+    Args:
+        request: FastAPI 請求
+
+    Returns:
+        (原始內容, None) 或 (None, 錯誤回應)
+    """
+    source = request_source(request)
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        if not content_length.isdigit():
+            return None, _reject(source, 400, "無效的 Content-Length")
+        if int(content_length) > WEBHOOK_MAX_BODY_BYTES:
+            return None, _reject(source, 413, "內容過大")
+
+    # 分段讀取，避免沒有 Content-Length 的請求塞入超大內容
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > WEBHOOK_MAX_BODY_BYTES:
+            return None, _reject(source, 413, "內容過大")
+        chunks.append(chunk)
+    raw_body = b"".join(chunks)
+
+    if WEBHOOK_ALLOW_UNSIGNED and not THREADS_APP_SECRET:
+        return raw_body, None
+    if verify_signature(raw_body, request.headers.get("x-hub-signature-256", "")):
+        return raw_body, None
+    if not _bad_sources.has_tokens(source):
+        return None, JSONResponse({"error": "請求過多"}, status_code=429)
+    return None, _reject(source, 401, "簽章驗證失敗")
+
+
+def reject_malformed(request: Request):
+    """簽章正確但內容無法解析時，同樣計入來源的無效請求"""
+    return _reject(request_source(request), 400, "無效的 JSON 內容")